@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# The tracker modules live at the top of the repository
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
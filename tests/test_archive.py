@@ -0,0 +1,126 @@
+from datetime import date
+
+import pytest
+
+from tracker_core import TaskTracker, TrackerError
+from tracker_storage import open_store
+
+
+@pytest.fixture
+def tracker(tmp_path):
+    data_dir = tmp_path / "data"
+    data_dir.mkdir()
+    tracker = TaskTracker(data_dir, store=open_store(data_dir, 'journal'))
+    tracker.load()
+    yield tracker
+    tracker.close()
+
+
+def log_history(tracker):
+    """Two tasks in an old month and one in the current month"""
+    old = [tracker.log_task("Coaching notes", "Coaching", "9:00 AM", "9:30 AM",
+                            date="01/05/2024"),
+           tracker.log_task("Budget paperwork", "Other", "1:00 PM", "1:45 PM",
+                            date="01/09/2024")]
+    recent = tracker.log_task("Coaching session", "Coaching", "9:00 AM", "10:00 AM")
+    return old, recent
+
+
+def test_archived_tasks_leave_the_store(tracker):
+    old, recent = log_history(tracker)
+    assert sorted(tracker.archive_old_tasks(12)) == sorted(task.task_id for task in old)
+    assert list(tracker.tasks) == [recent.task_id]
+    assert tracker.archive.months() == ["2024_01"]
+
+    assert len(list(tracker.iter_tasks())) == 1
+    assert len(list(tracker.iter_tasks(archived=True))) == 3
+    assert [task.task for task in tracker.iter_tasks(start=date(2024, 1, 6))] == [
+        "Budget paperwork", "Coaching session"]
+    rollups = tracker.all_rollups()
+    assert (rollups.task_count, rollups.total_minutes) == (3, 135)
+
+
+def test_monthly_reports_cover_archived_months(tracker, tmp_path):
+    pytest.importorskip("openpyxl")
+    reports = tmp_path / "reports"
+    old, recent = log_history(tracker)
+    tracker.archive_old_tasks(12)
+
+    # An archived month without a workbook is read from its segment
+    written = tracker.export_period_reports(reports)
+    assert sorted(rows for _, rows in written) == [1, 2]
+    assert tracker.export_period_reports(reports) == []
+
+    # Archiving does not change a month's tasks, so nothing is rewritten
+    newer = tracker.log_task("Lesson planning", "Tutoring", "9:00 AM", "9:30 AM",
+                             date="02/01/2024")
+    assert [rows for _, rows in tracker.export_period_reports(reports)] == [1]
+    tracker.archive_old_tasks(12)
+    assert newer.task_id not in tracker.tasks
+    assert tracker.export_period_reports(reports) == []
+
+    # Losing a workbook brings it back
+    workbook = next(reports.glob("*_2024_01.xlsx"))
+    workbook.unlink()
+    assert [rows for _, rows in tracker.export_period_reports(reports)] == [2]
+    assert workbook.exists()
+
+
+def test_search_reaches_archived_months(tracker):
+    old, recent = log_history(tracker)
+    tracker.archive_old_tasks(12)
+
+    assert tracker.search("coach") == [recent]
+    assert [task.task for task in tracker.search("coach", archived=True)] == [
+        "Coaching notes", "Coaching session"]
+    assert [task.task for task in tracker.search("paper", start=date(2024, 1, 1))] == [
+        "Budget paperwork"]
+    assert tracker.search("paper", end=date(2024, 1, 8)) == []
+
+
+def test_archived_tasks_can_be_edited_and_deleted(tracker):
+    (notes, paperwork), recent = log_history(tracker)
+    tracker.archive_old_tasks(12)
+
+    edited = tracker.edit_task(notes.task_id, "Coaching plan", "Coaching", "9:00 AM",
+                               "10:00 AM")
+    assert (edited.task, edited.minutes_worked) == ("Coaching plan", 60)
+    assert notes.task_id not in tracker.tasks
+    assert [task.task for task in tracker.iter_tasks(end=date(2024, 1, 31))] == [
+        "Coaching plan", "Budget paperwork"]
+
+    assert tracker.delete_tasks([paperwork.task_id, recent.task_id, "missing"]) == [
+        recent.task_id, paperwork.task_id]
+    assert [task.task_id for task in tracker.iter_tasks(archived=True)] == [notes.task_id]
+    rollups = tracker.all_rollups()
+    assert (rollups.task_count, rollups.total_minutes) == (1, 60)
+    with pytest.raises(TrackerError):
+        tracker.edit_task(paperwork.task_id, "Gone", "Other", "1:00 PM", "2:00 PM")
+
+
+def test_report_tasks_read_the_archive_when_iterated(tracker):
+    old, recent = log_history(tracker)
+    tracker.archive_old_tasks(12)
+
+    tasks, rows = tracker.report_tasks("coach")
+    # Progress counts every task of the archived months in range
+    assert rows == 3
+    assert [task.task for task in tasks] == ["Coaching notes", "Coaching session"]
+    # The segments are read without the cache, which belongs to this thread
+    assert not tracker.archive._cache
+    assert tracker.report_tasks("coach", start=date(2024, 2, 1))[1] == 1
+    assert tracker.report_tasks("nothing")[1] == 2
+
+
+def test_overlapping_archive_runs_keep_the_archive(tracker):
+    (notes, paperwork), recent = log_history(tracker)
+    first, second = tracker.prepare_archive(12), tracker.prepare_archive(12)
+    written = first(), second()
+    # Deleted while the segments were written: taken back out
+    tracker.delete_tasks([paperwork.task_id])
+    assert tracker.finish_archive(written[0]) == [notes.task_id]
+    # The second run finds the tasks already gone from the store
+    assert tracker.finish_archive(written[1]) == []
+    assert [task.task_id for task in tracker.iter_tasks(archived=True)] == [
+        notes.task_id, recent.task_id]
+    assert (tracker.archives_pending, tracker.archive_deletions) == (0, set())
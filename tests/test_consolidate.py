@@ -0,0 +1,65 @@
+import json
+
+from tracker_consolidate import consolidate, read_source
+from tracker_core import TaskTracker
+from tracker_storage import open_store
+
+LEGACY_TASKS = {
+    'completed_tasks': [
+        {'task': "Paperwork", 'project_id': "Administrative", 'date': "12/02/2024",
+         'start_time': "09:00 AM", 'end_time': "10:30 AM", 'duration': "1:30"},
+        {'task': "Coaching", 'project_id': "Student", 'date': "12/03/2024",
+         'start_time': "01:00 PM", 'end_time': "01:45 PM", 'duration': "0:45"},
+    ],
+    'current_task': {}}
+
+
+def snapshot(directory):
+    return {path.name: path.read_bytes() for path in directory.iterdir()}
+
+
+def test_legacy_folder_is_read_without_changes(tmp_path):
+    data_dir = tmp_path / "ana" / "WorkTrackerData"
+    data_dir.mkdir(parents=True)
+    (data_dir / "tasks.json").write_text(json.dumps(LEGACY_TASKS))
+    before = snapshot(data_dir)
+
+    user, records, error = read_source(data_dir)
+    assert (user, error) == ("ana", None)
+    assert sorted(record['task'] for record in records) == ["Coaching", "Paperwork"]
+    assert snapshot(data_dir) == before
+    # Ids come from the content, so a second read gives the same ones
+    assert [record['task_id'] for record in read_source(data_dir)[1]] == \
+        [record['task_id'] for record in records]
+
+
+def test_copies_of_a_legacy_history_are_merged(tmp_path):
+    data_dir = tmp_path / "ana" / "WorkTrackerData"
+    data_dir.mkdir(parents=True)
+    (data_dir / "tasks.json").write_text(json.dumps(LEGACY_TASKS))
+    (tmp_path / "ana" / "tasks.json").write_text(json.dumps(LEGACY_TASKS))
+
+    result = consolidate([tmp_path], jobs=1)
+    assert result.sources == 2
+    assert len(result.tasks) == 2
+    assert result.duplicates == 2
+
+
+def test_open_sqlite_folder_is_read_without_changes(tmp_path):
+    data_dir = tmp_path / "ben"
+    data_dir.mkdir()
+    tracker = TaskTracker(data_dir, store=open_store(data_dir, 'sqlite'))
+    tracker.load()
+    tracker.log_task("Tutoring", "Tutoring", "9:00 AM", "10:00 AM", "03/02/2026")
+    before = set(snapshot(data_dir))
+
+    # Still open, so its changes are in the WAL
+    user, records, error = read_source(data_dir)
+    assert error is None
+    assert [record['task'] for record in records] == ["Tutoring"]
+    assert set(snapshot(data_dir)) == before
+
+    tracker.close()
+    before = snapshot(data_dir)
+    assert [record['task'] for record in read_source(data_dir)[1]] == ["Tutoring"]
+    assert snapshot(data_dir) == before
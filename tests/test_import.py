@@ -0,0 +1,63 @@
+import json
+
+import pytest
+
+from tracker_core import TaskTracker
+from tracker_storage import open_store
+
+LEGACY_TASKS = {
+    'completed_tasks': [
+        {'task': "Paperwork", 'project_id': "Administrative", 'date': "12/02/2024",
+         'start_time': "09:00 AM", 'end_time': "10:30 AM", 'duration': "1:30"},
+        {'task': "Coaching", 'project_id': "Student", 'date': "12/03/2024",
+         'start_time': "01:00 PM", 'end_time': "01:45 PM", 'duration': "0:45"},
+    ],
+    'current_task': {}}
+
+CSV_ROWS = """Date,Task,Project,Start,End
+12/04/2024,Lesson planning,Tutoring,9:00 AM,10:00 AM
+12/05/2024,Student email,,2:00 PM,2:15 PM
+not a date,Broken row,Other,1:00 PM,2:00 PM
+"""
+
+
+@pytest.fixture
+def tracker(tmp_path):
+    data_dir = tmp_path / "data"
+    data_dir.mkdir()
+    tracker = TaskTracker(data_dir, store=open_store(data_dir, 'journal'))
+    tracker.load()
+    yield tracker
+    tracker.close()
+
+
+def counts(result):
+    return result.imported, result.duplicates, len(result.rejects)
+
+
+def test_importing_a_file_twice_adds_nothing(tracker, tmp_path):
+    legacy = tmp_path / "tasks.json"
+    legacy.write_text(json.dumps(LEGACY_TASKS))
+    csv_file = tmp_path / "timesheet.csv"
+    csv_file.write_text(CSV_ROWS)
+
+    assert counts(tracker.import_tasks(legacy)) == (2, 0, 0)
+    assert counts(tracker.import_tasks(legacy)) == (0, 2, 0)
+    assert counts(tracker.import_tasks(csv_file)) == (2, 0, 1)
+    assert counts(tracker.import_tasks(csv_file)) == (0, 2, 1)
+    assert len(tracker.tasks) == 4
+
+
+def test_importing_a_folder_leaves_it_unchanged(tracker, tmp_path):
+    source = tmp_path / "ana"
+    source.mkdir()
+    (source / "tasks.json").write_text(json.dumps(LEGACY_TASKS))
+    before = {path.name: path.read_bytes() for path in source.iterdir()}
+
+    assert counts(tracker.import_tasks(source, dry_run=True)) == (2, 0, 0)
+    assert counts(tracker.import_tasks(source)) == (2, 0, 0)
+    assert counts(tracker.import_tasks(source)) == (0, 2, 0)
+    # The same tasks in a loose tasks.json get the same ids
+    (tmp_path / "copy.json").write_text(json.dumps(LEGACY_TASKS))
+    assert counts(tracker.import_tasks(tmp_path / "copy.json")) == (0, 2, 0)
+    assert {path.name: path.read_bytes() for path in source.iterdir()} == before
@@ -0,0 +1,95 @@
+import pytest
+
+from tracker_core import TaskTracker
+from tracker_storage import open_store
+
+
+@pytest.fixture(params=['journal', 'sqlite'])
+def open_tracker(request, tmp_path):
+    trackers = []
+
+    def open_tracker():
+        tracker = TaskTracker(tmp_path, store=open_store(tmp_path, request.param))
+        tracker.load()
+        trackers.append(tracker)
+        return tracker
+
+    yield open_tracker
+    for tracker in trackers:
+        tracker.close()
+
+
+def texts(tracker):
+    return sorted(task.task for task in tracker.tasks.values())
+
+
+def test_refresh_merges_another_instances_changes(open_tracker):
+    first, second = open_tracker(), open_tracker()
+    seen = []
+    second.on_external_change = seen.append
+
+    task = first.log_task("From first", "Other", "9:00 AM", "9:30 AM")
+    assert second.store.changed()
+    changes = second.refresh()
+    assert changes.added == [task.task_id]
+    assert seen == [changes]
+    assert texts(second) == ["From first"]
+
+    first.edit_task(task.task_id, "Edited", "Other", "9:00 AM", "10:00 AM")
+    changes = second.refresh()
+    assert changes.updated == [task.task_id]
+    assert second.tasks[task.task_id].minutes_worked == 60
+
+    first.delete_tasks([task.task_id])
+    assert second.refresh().deleted == [task.task_id]
+    assert second.tasks == {}
+    assert not second.store.changed()
+
+
+def test_concurrent_writes_are_both_kept(open_tracker):
+    first, second = open_tracker(), open_tracker()
+    first.log_task("One", "Other", "9:00 AM", "9:30 AM")
+    # second has not looked yet; its write picks up first's change
+    second.log_task("Two", "Other", "10:00 AM", "10:30 AM")
+    assert texts(second) == ["One", "Two"]
+    first.refresh()
+    assert texts(first) == ["One", "Two"]
+    assert texts(open_tracker()) == ["One", "Two"]
+
+
+def test_queued_local_change_wins_over_an_external_one(open_tracker):
+    first, second = open_tracker(), open_tracker()
+    task = first.log_task("Shared", "Other", "9:00 AM", "9:30 AM")
+    second.refresh()
+
+    second.defer_flush = lambda: None
+    second.edit_task(task.task_id, "Local edit", "Other", "9:00 AM", "9:45 AM")
+    first.delete_tasks([task.task_id])
+    second.flush()
+
+    assert texts(second) == ["Local edit"]
+    first.refresh()
+    assert texts(first) == ["Local edit"]
+
+
+def test_clear_reaches_the_other_instance(open_tracker):
+    first, second = open_tracker(), open_tracker()
+    first.log_task("One", "Other", "9:00 AM", "9:30 AM")
+    second.refresh()
+    first.clear()
+    first.flush()
+
+    changes = second.refresh()
+    assert changes.reloaded
+    assert second.tasks == {}
+
+
+def test_reload_after_the_other_instance_compacts(open_tracker):
+    first, second = open_tracker(), open_tracker()
+    for index in range(3):
+        first.log_task(f"Task {index}", "Other", "9:00 AM", "9:30 AM")
+    first.store.compact(list(first.tasks.values()), first.current_task_data())
+    first.log_task("After", "Other", "11:00 AM", "11:30 AM")
+
+    second.refresh()
+    assert texts(second) == ["After", "Task 0", "Task 1", "Task 2"]
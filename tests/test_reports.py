@@ -0,0 +1,148 @@
+import pytest
+
+from tracker_core import Task, new_task_id
+
+openpyxl = pytest.importorskip("openpyxl")
+
+from tracker_reports import write_xlsx_report  # noqa: E402
+
+
+def make_tasks(count, start=1767261600):
+    projects = ["Coaching", "Tutoring", "Administrative"]
+    return [Task(new_task_id(), f"Task {index}", projects[index % 3],
+                 "Administrative Task" if index % 3 == 2 else "Other",
+                 start + index * 7200, start + index * 7200 + 1800, 30)
+            for index in range(count)]
+
+
+def sheet_rows(path, title):
+    wb = openpyxl.load_workbook(path, read_only=True)
+    try:
+        return [row for row in wb[title].iter_rows(values_only=True)]
+    finally:
+        wb.close()
+
+
+def test_xlsx_summaries_from_a_generator(tmp_path):
+    tracker_analytics = pytest.importorskip("tracker_analytics")
+    tasks = make_tasks(1200)
+    path = tmp_path / "report.xlsx"
+    # A generator can only be read once, so the summaries come from the
+    # columns collected while the rows were written
+    assert write_xlsx_report(path, (task for task in tasks)) == 1200
+
+    expected = dict((title, rows) for title, _, rows in
+                    tracker_analytics.summary_sheets(tasks))
+    by_project = sheet_rows(path, "By Project")[1:]
+    assert [row[:3] for row in by_project] == [row[:3] for row in expected["By Project"]]
+    assert len(sheet_rows(path, "Sheet")) == 1201
+
+
+def test_team_report_totals_by_user(tmp_path):
+    pytest.importorskip("tracker_analytics")
+    tasks = make_tasks(10)
+    users = {task.task_id: "ana" if index < 4 else "ben" for index, task in enumerate(tasks)}
+    path = tmp_path / "team.xlsx"
+    write_xlsx_report(path, iter(tasks), users=users)
+
+    assert sheet_rows(path, "Sheet")[0][0] == "User"
+    by_user = {row[0]: row[1] for row in sheet_rows(path, "By User")[1:]}
+    assert by_user == {"ana": 4, "ben": 6}
+
+
+def test_monthly_reports_rewrite_only_changed_months(tmp_path):
+    from tracker_core import TaskTracker
+    from tracker_storage import open_store
+
+    data_dir, reports = tmp_path / "data", tmp_path / "reports"
+    data_dir.mkdir()
+    tracker = TaskTracker(data_dir, store=open_store(data_dir, 'journal'))
+    tracker.load()
+    tracker.log_task("Coaching", "Coaching", "9:00 AM", "9:30 AM", date="01/05/2026")
+    february = tracker.log_task("Paperwork", "Other", "1:00 PM", "1:45 PM",
+                                date="02/03/2026")
+    assert len(tracker.export_period_reports(reports)) == 2
+    assert tracker.export_period_reports(reports) == []
+
+    tracker.edit_task(february.task_id, "Paperwork", "Other", "1:00 PM", "2:00 PM")
+    written = tracker.export_period_reports(reports)
+    assert [filename.rsplit("_", 2)[-2:] for filename, _ in written] == [["2026", "02.xlsx"]]
+    tracker.close()
+
+    # The month fingerprints are saved with the rollups
+    tracker = TaskTracker(data_dir, store=open_store(data_dir, 'journal'))
+    tracker.load()
+    assert tracker.export_period_reports(reports) == []
+    tracker.delete_tasks([february.task_id])
+    assert tracker.export_period_reports(reports) == []
+    assert [path.name.rsplit("_", 2)[-2:] for path in reports.glob("*.xlsx")] == [
+        ["2026", "01.xlsx"]]
+    tracker.close()
+
+
+def test_csv_report_matches_the_workbook_columns(tmp_path):
+    import csv
+
+    from tracker_reports import REPORT_COLUMNS, report_row, write_csv_report
+    tasks = make_tasks(3)
+    seen = []
+    path = tmp_path / "report.csv"
+    assert write_csv_report(path, iter(tasks), progress=seen.append) == 3
+    with open(path, newline='', encoding='utf-8') as f:
+        rows = list(csv.reader(f))
+    assert rows[0] == [name for name, _ in REPORT_COLUMNS]
+    assert rows[1:] == [['' if value is None else str(value) for value in report_row(task)]
+                        for task in tasks]
+    assert seen == [3]
+
+
+def test_jsonl_report_with_users(tmp_path):
+    import json
+
+    from tracker_reports import write_jsonl_report
+    tasks = make_tasks(2)
+    path = tmp_path / "team.jsonl"
+    write_jsonl_report(path, tasks, users={tasks[0].task_id: "ana", tasks[1].task_id: "ben"})
+    lines = [json.loads(line) for line in path.read_text(encoding='utf-8').splitlines()]
+    assert [line["User"] for line in lines] == ["ana", "ben"]
+    assert [line["Task ID"] for line in lines] == [task.task_id for task in tasks]
+    assert lines[0]["Minutes Worked"] == 30
+
+
+def test_parquet_report_types_and_row_groups(tmp_path, monkeypatch):
+    pq = pytest.importorskip("pyarrow.parquet")
+    import tracker_reports
+    monkeypatch.setattr(tracker_reports, "PARQUET_BATCH_ROWS", 2)
+    tasks = make_tasks(5)
+    path = tmp_path / "report.parquet"
+    assert tracker_reports.write_parquet_report(path, iter(tasks)) == 5
+
+    parquet = pq.ParquetFile(path)
+    assert parquet.metadata.num_row_groups == 3
+    table = parquet.read()
+    assert str(table.schema.field("Date").type) == "date32[day]"
+    assert table.column("Minutes Worked").to_pylist() == [30] * 5
+    assert table.column("Task ID").to_pylist() == [task.task_id for task in tasks]
+
+
+def test_cancelled_export_leaves_the_old_file(tmp_path, monkeypatch):
+    import threading
+
+    import tracker_reports
+    monkeypatch.setattr(tracker_reports, "PROGRESS_INTERVAL", 2)
+    path = tmp_path / "report.csv"
+    path.write_text("old")
+    cancel = threading.Event()
+    cancel.set()
+    with pytest.raises(tracker_reports.ExportCancelled):
+        tracker_reports.write_csv_report(path, make_tasks(5), cancel=cancel)
+    assert path.read_text() == "old"
+    assert list(tmp_path.iterdir()) == [path]
+
+
+def test_report_writer_by_format():
+    from tracker_core import TrackerError
+    from tracker_reports import REPORT_WRITERS, report_writer
+    assert report_writer("csv") is REPORT_WRITERS["csv"]
+    with pytest.raises(TrackerError):
+        report_writer("pdf")
@@ -0,0 +1,74 @@
+from datetime import date
+
+import pytest
+
+from tracker_core import Task, TaskTracker, new_task_id
+from tracker_search import SearchIndex, parse_query, task_matches_query
+from tracker_storage import open_store
+
+
+def make_task(text, project="Other"):
+    return Task(new_task_id(), text, project, "Other", 1767261600, 1767263400, 30)
+
+
+@pytest.fixture
+def tracker(tmp_path):
+    tracker = TaskTracker(tmp_path, store=open_store(tmp_path, 'journal'))
+    tracker.load()
+    yield tracker
+    tracker.close()
+
+
+def test_parse_query():
+    assert parse_query('Coach* "student  email" lassi, "x"') == (
+        ["coach", "lassi", "x"], [("student", "email")])
+    assert parse_query('"unclosed phrase') == ([], [("unclosed", "phrase")])
+    assert parse_query("-- !!") == ([], [])
+
+
+def test_prefixes_and_phrases():
+    coaching = make_task("Student coaching: email follow-up", "Coaching")
+    email = make_task("Email the student", "Administrative")
+    lassi = make_task("Lassi workshop", "Tutoring")
+    index = SearchIndex([coaching, email, lassi])
+
+    def found(query):
+        ids = index.search(query)
+        # The index agrees with the unindexed check used for archived tasks
+        assert ids == {task.task_id for task in (coaching, email, lassi)
+                       if task_matches_query(task, query)}
+        return [task.task for task in index.in_order(ids)]
+
+    assert found("coach") == ["Student coaching: email follow-up"]
+    assert found("STUDENT em") == ["Student coaching: email follow-up", "Email the student"]
+    assert found('"student coaching"') == ["Student coaching: email follow-up"]
+    assert found('"student email"') == []
+    assert found("follow-up") == ["Student coaching: email follow-up"]
+    assert found("tutor") == ["Lassi workshop"]
+    assert found("zzz") == []
+    assert index.search("...") == set()
+
+
+def test_remove_drops_unused_words():
+    task = make_task("Quarterly budget")
+    index = SearchIndex()
+    index.add(task)
+    assert index.prefix_ids("quart") == {task.task_id}
+    index.remove(task)
+    index.remove(task)
+    assert index.terms == [] and len(index) == 0
+
+
+def test_tracker_search_follows_edits(tracker):
+    first = tracker.log_task("Coaching session", "Coaching", "9:00 AM", "9:30 AM",
+                             date="01/05/2026")
+    second = tracker.log_task("Paperwork", "Other", "1:00 PM", "1:45 PM",
+                              date="01/06/2026")
+    # The index is built on the first search and then kept current
+    assert tracker.search("coach") == [first]
+    tracker.edit_task(second.task_id, "Coaching notes", "Coaching", "1:00 PM", "1:45 PM")
+    assert tracker.search("coach") == [first, second]
+    assert tracker.search("coach", start=date(2026, 1, 6)) == [second]
+    tracker.delete_tasks([first.task_id])
+    assert tracker.search("session") == []
+    assert tracker.search("") == [second]
@@ -0,0 +1,185 @@
+import json
+import os
+from datetime import date
+
+from tracker_core import TaskTracker
+from tracker_storage import JournalStore, SqliteStore, new_task_id, open_store
+
+
+def record(text, start=36000):
+    return {'task_id': new_task_id(), 'task': text, 'project_id': 'Other',
+            'category': 'Other', 'start': start, 'end': start + 1800, 'minutes_worked': 30,
+            'breaks': '', 'faculty_student_staff': ''}
+
+
+def journal(data_dir):
+    return data_dir / "tasks.journal.0.jsonl"
+
+
+def test_journal_round_trip(tmp_path):
+    store = JournalStore(tmp_path)
+    first, second = record("first"), record("second")
+    store.add_task(first)
+    store.add_task(second)
+    store.update_task(dict(first, task="edited"))
+    store.delete_task(second['task_id'])
+    store.close()
+
+    tasks, current = JournalStore(tmp_path).load()
+    assert [task['task'] for task in tasks] == ["edited"]
+    assert current == {}
+
+
+def test_torn_final_line_is_trimmed_in_place(tmp_path):
+    store = JournalStore(tmp_path)
+    store.add_task(record("kept"))
+    store.close()
+    path = journal(tmp_path)
+    inode = os.stat(path).st_ino
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write('{"op":"add","task":{"task_id":"tor')
+
+    tasks, _ = JournalStore(tmp_path).load()
+    assert [task['task'] for task in tasks] == ["kept"]
+    assert path.read_text(encoding='utf-8').endswith("\n")
+    # Trimmed, not replaced, so other writers' handles stay valid
+    assert os.stat(path).st_ino == inode
+
+
+def test_bad_line_keeps_the_entries_after_it(tmp_path):
+    store = JournalStore(tmp_path)
+    store.add_task(record("before"))
+    store.close()
+    with open(journal(tmp_path), 'a', encoding='utf-8') as f:
+        f.write('{"op":"add","task":\n')
+        f.write(json.dumps({'op': 'add', 'task': record("after")}) + "\n")
+
+    tasks, _ = JournalStore(tmp_path).load()
+    assert sorted(task['task'] for task in tasks) == ["after", "before"]
+
+
+def test_fragment_is_cut_before_the_next_append(tmp_path):
+    writer = JournalStore(tmp_path)
+    writer.load()
+    writer.add_task(record("first"))
+    with open(journal(tmp_path), 'a', encoding='utf-8') as f:
+        f.write('{"op":"add","ta')
+    writer.add_task(record("second"))
+    writer.close()
+
+    lines = journal(tmp_path).read_text(encoding='utf-8').splitlines()
+    assert all(json.loads(line)['op'] == 'add' for line in lines)
+    tasks, _ = JournalStore(tmp_path).load()
+    assert sorted(task['task'] for task in tasks) == ["first", "second"]
+
+
+def test_compaction_keeps_changes_made_while_the_snapshot_is_written(tmp_path):
+    store = JournalStore(tmp_path)
+    tasks = [record(f"task {index}") for index in range(5)]
+    for task in tasks:
+        store.add_task(task)
+    write_snapshot = store.prepare_compaction(tasks, {})
+    # Appends go to the next generation while the snapshot is written
+    store.add_task(record("during"))
+    write_snapshot()
+    store.close()
+
+    assert json.loads((tmp_path / "tasks.json").read_text())['journal_generation'] == 1
+    assert store.generation == 1
+    loaded, _ = JournalStore(tmp_path).load()
+    assert len(loaded) == 6
+    assert loaded[-1]['task'] == "during"
+
+
+def test_interrupted_compaction_replays_both_generations(tmp_path):
+    store = JournalStore(tmp_path)
+    tasks = [record("old")]
+    store.add_task(tasks[0])
+    # The snapshot writer is never run, as if the app crashed first
+    store.prepare_compaction(tasks, {})
+    store.add_task(record("new"))
+    store.close()
+
+    loaded, _ = JournalStore(tmp_path).load()
+    assert sorted(task['task'] for task in loaded) == ["new", "old"]
+
+
+def write_legacy_snapshot(data_dir):
+    (data_dir / "tasks.json").write_text(json.dumps({
+        'completed_tasks': [
+            {'task': "Paperwork", 'project_id': "Administrative", 'date': "12/02/2024",
+             'start_time': "09:00 AM", 'end_time': "10:30 AM", 'duration': "1:30"},
+            {'task': "Coaching", 'project_id': "Student", 'date': "12/03/2024",
+             'start_time': "01:00 PM", 'end_time': "01:45 PM", 'duration': "0:45"},
+        ],
+        'current_task': {}}))
+
+
+def test_legacy_snapshot_is_migrated(tmp_path):
+    write_legacy_snapshot(tmp_path)
+
+    tracker = TaskTracker(tmp_path, store=JournalStore(tmp_path))
+    tracker.load()
+    tasks = sorted(tracker.tasks.values(), key=lambda task: task.start)
+    tracker.close()
+    assert [task.task for task in tasks] == ["Paperwork", "Coaching"]
+    assert [task.minutes_worked for task in tasks] == [90, 45]
+    assert all(task.task_id for task in tasks)
+
+    # Ids and timestamps were saved, so a second load sees the same tasks
+    again = TaskTracker(tmp_path, store=JournalStore(tmp_path))
+    again.load()
+    assert set(again.tasks) == {task.task_id for task in tasks}
+    again.close()
+
+
+def test_sqlite_imports_the_json_store_once(tmp_path):
+    write_legacy_snapshot(tmp_path)
+    tracker = TaskTracker(tmp_path, store=SqliteStore(tmp_path))
+    tracker.load()
+    assert sorted(task.task for task in tracker.tasks.values()) == ["Coaching", "Paperwork"]
+    tracker.log_task("Email", "Other", "9:00 AM", "9:15 AM", "12/04/2024")
+    tracker.close()
+
+    reopened = TaskTracker(tmp_path, store=SqliteStore(tmp_path))
+    reopened.load()
+    assert len(reopened.tasks) == 3
+    reopened.close()
+
+
+def test_sqlite_range_queries_use_the_indexes(tmp_path):
+    store = SqliteStore(tmp_path)
+    store.add_task(dict(record("early", start=1000), project_id="Coaching"))
+    store.add_task(dict(record("late", start=5000), project_id="Coaching"))
+    store.add_task(dict(record("other", start=5000), project_id="Tutoring"))
+    ids = {task['task']: task['task_id'] for task in store.load()[0]}
+
+    assert store.query(low=2000) == [ids["late"], ids["other"]]
+    assert store.query(high=2000) == [ids["early"]]
+    assert store.query(project="Coaching", low=2000, high=9000) == [ids["late"]]
+    plan = " ".join(row[-1] for row in store.conn.execute(
+        "EXPLAIN QUERY PLAN SELECT task_id FROM tasks WHERE start_ts >= 2000"))
+    assert "tasks_start" in plan
+    store.close()
+
+
+def test_tracker_filters_agree_between_backends(tmp_path):
+    results = []
+    for backend in ('journal', 'sqlite'):
+        data_dir = tmp_path / backend
+        data_dir.mkdir()
+        tracker = TaskTracker(data_dir, store=open_store(data_dir, backend))
+        tracker.load()
+        tracker.archive_months = 0
+        for day in (1, 2, 3):
+            tracker.log_task(f"Coach {day}", "Coaching", "9:00 AM", "10:00 AM",
+                             f"03/0{day}/2026")
+            tracker.log_task(f"Tutor {day}", "Tutoring", "9:00 AM", "10:00 AM",
+                             f"03/0{day}/2026")
+        start, end = date(2026, 3, 2), date(2026, 3, 3)
+        results.append([[task.task for task in tracker.iter_tasks(start, end)],
+                        [task.task for task in tracker.iter_tasks(project="Tutoring")],
+                        [task.task for task in tracker.iter_tasks(end, end, "Coaching")]])
+        tracker.close()
+    assert results[0] == results[1]
+    assert results[1][2] == ["Coach 3"]
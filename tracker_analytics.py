@@ -0,0 +1,215 @@
+"""Time-by-project analytics over task histories, computed with NumPy
+
+Tasks are loaded once into integer columns (minutes, day number, project
+and category codes) and every summary is a bincount or cumulative sum over
+those arrays, so totals over a long history need no per-task Python loop.
+"""
+from array import array
+from datetime import timedelta
+
+import numpy as np
+
+from tracker_core import DAY_SECONDS, EPOCH
+from tracker_rollups import week_key
+
+WEEKDAYS = ("Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday")
+
+# Hours in a full working week, the basis for utilization
+WEEK_HOURS = 40
+
+# Window sizes for rolling averages
+DAILY_WINDOW = 7
+WEEKLY_WINDOW = 4
+
+# Number formats for summary columns
+PERCENT = '0.0%'
+DECIMAL = '0.0'
+DATE = 'mm/dd/yyyy'
+
+
+def _day_date(day):
+    return EPOCH.date() + timedelta(days=int(day))
+
+
+def _codes(values):
+    """Encode values as integer codes; return (codes, names)"""
+    lookup = {}
+    codes = np.fromiter((lookup.setdefault(value, len(lookup)) for value in values),
+                        dtype=np.int32, count=len(values))
+    return codes, list(lookup)
+
+
+def rolling_mean(values, window):
+    """Trailing mean over up to window values, for each position"""
+    values = np.asarray(values, dtype=np.float64)
+    if not len(values):
+        return values
+    sums = np.cumsum(values)
+    sums[window:] = sums[window:] - sums[:-window]
+    counts = np.minimum(np.arange(1, len(values) + 1), window)
+    return sums / counts
+
+
+class TaskColumns:
+    """Tasks as parallel NumPy arrays
+
+    day is the day number since 1970-01-01 (-1 for tasks without a start);
+    project and category are codes into the projects and categories lists.
+    """
+
+    def __init__(self, tasks):
+        tasks = list(tasks)
+        count = len(tasks)
+        self.minutes = np.fromiter((task.minutes_worked for task in tasks),
+                                   dtype=np.int64, count=count)
+        self.day = np.fromiter(
+            (task.start // DAY_SECONDS if task.start is not None else -1 for task in tasks),
+            dtype=np.int64, count=count)
+        self.project, self.projects = _codes([task.project_id or '' for task in tasks])
+        self.category, self.categories = _codes([task.category or '' for task in tasks])
+        self.dated = self.day >= 0
+
+    @classmethod
+    def from_builder(cls, builder):
+        """Columns collected by a ColumnBuilder"""
+        columns = cls.__new__(cls)
+        columns.minutes = np.array(builder.minutes, dtype=np.int64)
+        columns.day = np.array(builder.day, dtype=np.int64)
+        columns.project = np.array(builder.project, dtype=np.int32)
+        columns.projects = list(builder.projects)
+        columns.category = np.array(builder.category, dtype=np.int32)
+        columns.categories = list(builder.categories)
+        columns.dated = columns.day >= 0
+        return columns
+
+    def __len__(self):
+        return len(self.minutes)
+
+    def _totals(self, codes, names):
+        minutes = np.bincount(codes, weights=self.minutes, minlength=len(names))
+        counts = np.bincount(codes, minlength=len(names))
+        return minutes.astype(np.int64), counts
+
+    def by_project(self):
+        """Return [(project, tasks, minutes, share)] sorted by minutes, largest first"""
+        return self._ranked(*self._totals(self.project, self.projects), self.projects)
+
+    def by_category(self):
+        """Return [(category, tasks, minutes, share)] sorted by minutes, largest first"""
+        return self._ranked(*self._totals(self.category, self.categories), self.categories)
+
+    def by_label(self, labels):
+        """Like by_project, for any label per task (e.g. the user it came from)"""
+        codes, names = _codes(labels)
+        return self._ranked(*self._totals(codes, names), names)
+
+    def _ranked(self, minutes, counts, names):
+        total = minutes.sum()
+        order = np.argsort(-minutes, kind='stable')
+        share = minutes / total if total else np.zeros(len(minutes))
+        return [(names[i], int(counts[i]), int(minutes[i]), float(share[i])) for i in order]
+
+    def by_weekday(self):
+        """Return [(weekday, tasks, minutes, average minutes per day worked)]"""
+        day = self.day[self.dated]
+        # Day 0 (1970-01-01) was a Thursday
+        weekday = (day + 3) % 7
+        minutes = np.bincount(weekday, weights=self.minutes[self.dated], minlength=7)
+        counts = np.bincount(weekday, minlength=7)
+        worked_days = np.bincount((np.unique(day) + 3) % 7, minlength=7)
+        average = np.divide(minutes, worked_days, out=np.zeros(7), where=worked_days > 0)
+        return [(WEEKDAYS[i], int(counts[i]), int(minutes[i]), float(average[i]))
+                for i in range(7)]
+
+    def daily(self, window=DAILY_WINDOW):
+        """Return [(date, minutes, rolling average)] for every day in the range"""
+        day = self.day[self.dated]
+        if not len(day):
+            return []
+        first = day.min()
+        minutes = np.bincount(day - first, weights=self.minutes[self.dated])
+        average = rolling_mean(minutes, window)
+        return [(_day_date(first + i), int(minutes[i]), float(average[i]))
+                for i in range(len(minutes))]
+
+    def weekly(self, week_hours=WEEK_HOURS, window=WEEKLY_WINDOW):
+        """Return [(ISO week, tasks, minutes, utilization, rolling average minutes)]
+
+        Every week between the first and last task is listed, so weeks with
+        no work count towards the rolling average. Utilization is the share
+        of a week_hours working week that was logged.
+        """
+        day = self.day[self.dated]
+        if not len(day):
+            return []
+        week_start = day - (day + 3) % 7
+        first = week_start.min()
+        index = (week_start - first) // 7
+        minutes = np.bincount(index, weights=self.minutes[self.dated])
+        counts = np.bincount(index)
+        utilization = minutes / (week_hours * 60)
+        average = rolling_mean(minutes, window)
+        return [(week_key(_day_date(first + 7 * i)), int(counts[i]), int(minutes[i]),
+                 float(utilization[i]), float(average[i]))
+                for i in range(len(minutes))]
+
+
+class ColumnBuilder:
+    """Collect TaskColumns one task at a time, e.g. while a report streams
+
+    Only the four integer columns are kept, in compact arrays, so the tasks
+    themselves can be dropped as soon as they are written.
+    """
+
+    def __init__(self):
+        self.minutes = array('q')
+        self.day = array('q')
+        self.project = array('i')
+        self.category = array('i')
+        self.projects = {}
+        self.categories = {}
+
+    def add(self, task):
+        self.minutes.append(task.minutes_worked)
+        self.day.append(task.start // DAY_SECONDS if task.start is not None else -1)
+        projects = self.projects
+        self.project.append(projects.setdefault(task.project_id or '', len(projects)))
+        categories = self.categories
+        self.category.append(categories.setdefault(task.category or '', len(categories)))
+
+    def build(self):
+        return TaskColumns.from_builder(self)
+
+
+def summary_sheets(tasks, users=None):
+    """Summary tables for a report
+
+    tasks is a sequence of tasks or their TaskColumns. Returns [(title,
+    [(header, width, number_format)], rows)], with None for columns that
+    need no number format. users, a user name per task, adds a By User
+    sheet.
+    """
+    columns = tasks if isinstance(tasks, TaskColumns) else TaskColumns(tasks)
+    sheets = []
+    if users is not None:
+        sheets.append(("By User", [('User', 20, None), ('Tasks', 10, None),
+                                   ('Minutes Worked', 15, None), ('Share', 10, PERCENT)],
+                       columns.by_label(users)))
+    return sheets + [
+        ("By Project", [('Project ID', 25, None), ('Tasks', 10, None),
+                        ('Minutes Worked', 15, None), ('Share', 10, PERCENT)],
+         columns.by_project()),
+        ("By Category", [('Category', 25, None), ('Tasks', 10, None),
+                         ('Minutes Worked', 15, None), ('Share', 10, PERCENT)],
+         columns.by_category()),
+        ("By Week", [('Week', 12, None), ('Tasks', 10, None), ('Minutes Worked', 15, None),
+                     ('Utilization', 12, PERCENT),
+                     (f'{WEEKLY_WINDOW}-Week Average', 15, DECIMAL)],
+         columns.weekly()),
+        ("By Weekday", [('Weekday', 12, None), ('Tasks', 10, None),
+                        ('Minutes Worked', 15, None), ('Average per Day Worked', 15, DECIMAL)],
+         columns.by_weekday()),
+        ("Daily", [('Date', 12, DATE), ('Minutes Worked', 15, None),
+                   (f'{DAILY_WINDOW}-Day Average', 15, DECIMAL)],
+         columns.daily()),
+    ]
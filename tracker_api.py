@@ -0,0 +1,453 @@
+"""Local HTTP/JSON API, so editor plugins, shell hooks and scripts can log time
+
+    GET  /current                          task in progress, or null
+    GET  /tasks?from=&to=&project=&limit=  latest tasks (limit 0 for all)
+    GET  /search?q=&from=&to=&project=&limit=&archived=
+    POST /start     {"task", "project"?, "at"?, "date"?}
+    POST /complete  {"at"?}
+    POST /log       {"task", "start", "end", "project"?, "date"?}
+    POST /report    {"from"?, "to"?, "project"?, "q"?, "output"?, "format"?}
+    POST /batch     {"requests": [{"method", "path", "body"?}, ...]}
+
+Dates are MM/DD/YYYY and times HH:MM [AM/PM], as everywhere else. Archived
+months are searched when "from" reaches back into them, or all of them with
+archived=1. A report is written as xlsx, csv, jsonl or parquet, by "format"
+or else the extension of "output". A batch runs its requests in order inside
+one TaskTracker.batch(), so a burst of automated logging costs one write to
+the store.
+
+The server is asyncio-based and only listens on the loopback interface.
+Connections are served concurrently, but every tracker call is handed to
+submit(), which runs it on the thread that owns the tracker: the Tk thread
+in the GUI (see CallQueue), or the server's own loop when run headless by
+``tracker_cli.py serve``. Requests that set an Origin header (i.e. come
+from a web page) are refused, POST bodies must be JSON, and if a token is
+configured it must be sent as ``Authorization: Bearer <token>``.
+"""
+import asyncio
+import json
+import queue
+import signal
+import threading
+import time
+from concurrent.futures import Future
+from pathlib import Path
+from urllib.parse import parse_qsl, urlsplit
+
+from tracker_core import (ExternalChanges, TrackerError, current_time, format_date,
+                          format_time, guess_report_format, parse_date, report_filename)
+from tracker_storage import task_dict
+
+HOST = "127.0.0.1"
+API_PORT = 8765
+
+# Largest request body accepted, in bytes
+MAX_BODY = 1024 * 1024
+
+# Tasks returned by /tasks and /search unless a limit is given
+DEFAULT_LIMIT = 100
+
+# Longest the owner thread spends on queued API calls per CallQueue.run_pending()
+RUN_BUDGET = 0.02
+
+REASONS = {200: "OK", 400: "Bad Request", 401: "Unauthorized", 403: "Forbidden",
+           404: "Not Found", 405: "Method Not Allowed", 413: "Payload Too Large",
+           500: "Internal Server Error"}
+
+
+class ApiError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def task_json(task):
+    """A task as returned by the API: stored fields plus display strings"""
+    data = task_dict(task)
+    data['date'] = format_date(task.start)
+    data['start_time'] = format_time(task.start)
+    data['end_time'] = format_time(task.end)
+    return data
+
+
+class CallQueue:
+    """Calls from other threads, run when the owning thread polls
+
+    submit() is thread-safe and returns a concurrent.futures.Future.
+    run_pending() runs queued calls on the calling thread for up to budget
+    seconds, leaving the rest for the next poll so a flood of requests
+    cannot freeze the window.
+    """
+
+    def __init__(self):
+        self.calls = queue.SimpleQueue()
+
+    def submit(self, func, *args):
+        future = Future()
+        self.calls.put((future, func, args))
+        return future
+
+    def run_pending(self, budget=RUN_BUDGET):
+        """Run queued calls; return how many ran"""
+        deadline = time.perf_counter() + budget
+        count = 0
+        while True:
+            try:
+                future, func, args = self.calls.get_nowait()
+            except queue.Empty:
+                return count
+            if future.set_running_or_notify_cancel():
+                try:
+                    future.set_result(func(*args))
+                except BaseException as e:
+                    future.set_exception(e)
+            count += 1
+            if time.perf_counter() >= deadline:
+                return count
+
+
+def _run_inline(func, *args):
+    future = Future()
+    try:
+        future.set_result(func(*args))
+    except BaseException as e:
+        future.set_exception(e)
+    return future
+
+
+class ApiServer:
+    """HTTP/JSON front end to a TaskTracker
+
+    submit(func, *args) must run func on the tracker's thread and return a
+    Future; by default calls run directly on the server's event loop, which
+    is right when nothing else uses the tracker. on_change(changes), if
+    given, is called on the tracker's thread after every request that
+    changed tasks, with an ExternalChanges listing what it changed.
+    With flush_delay (seconds), used when serving headless, changes are
+    written once requests pause for that long instead of after each one.
+    """
+
+    def __init__(self, tracker, host=HOST, port=API_PORT, submit=None, on_change=None,
+                 token=None, flush_delay=None):
+        if host not in ("127.0.0.1", "::1", "localhost"):
+            raise ValueError(f"The API only listens on localhost, not {host}")
+        self.tracker = tracker
+        self.host = host
+        self.port = port
+        self.submit = submit or _run_inline
+        self.on_change = on_change
+        self.token = token
+        self.flush_delay = flush_delay
+        self.flush_handle = None
+        # What the running request changed, for on_change
+        self.changes = ExternalChanges()
+        self.routes = {
+            ('GET', '/current'): self.get_current,
+            ('GET', '/tasks'): self.list_tasks,
+            ('GET', '/search'): self.search,
+            ('POST', '/start'): self.start_task,
+            ('POST', '/complete'): self.complete_task,
+            ('POST', '/log'): self.log_task,
+        }
+        self.loop = None
+        self.server = None
+        self.thread = None
+
+    # Endpoints; these run on the tracker's thread
+
+    def get_current(self, params, body):
+        tracker = self.tracker
+        if not tracker.current_task:
+            return None
+        return {'task': tracker.current_task, 'project': tracker.current_project,
+                'start': tracker.current_start, 'date': format_date(tracker.current_start),
+                'start_time': format_time(tracker.current_start)}
+
+    def _filter(self, params):
+        start = parse_date(params['from']) if params.get('from') else None
+        end = parse_date(params['to']) if params.get('to') else None
+        return start, end, params.get('project') or None
+
+    def _limited(self, tasks, params):
+        try:
+            limit = int(params.get('limit', DEFAULT_LIMIT))
+        except ValueError:
+            raise TrackerError("limit must be a number")
+        shown = tasks[-limit:] if limit > 0 else tasks
+        return {'total': len(tasks), 'tasks': [task_json(task) for task in shown]}
+
+    def list_tasks(self, params, body):
+        return self._limited(list(self.tracker.iter_tasks(*self._filter(params))), params)
+
+    def search(self, params, body):
+        archived = params.get('archived', '').lower() in ('1', 'true', 'yes')
+        return self._limited(self.tracker.search(params.get('q', ''), *self._filter(params),
+                                                 archived=archived), params)
+
+    @staticmethod
+    def _field(body, name, required=False):
+        """A text field of a request body, raising TrackerError if it is invalid"""
+        value = body.get(name)
+        if value is None or value == '':
+            if required:
+                raise TrackerError(f"Missing \"{name}\"")
+            return None
+        if not isinstance(value, str):
+            raise TrackerError(f"\"{name}\" must be a string")
+        return value
+
+    def start_task(self, params, body):
+        task = self._field(body, 'task', required=True)
+        project = self._field(body, 'project') or self.tracker.suggest_project(task)
+        self.tracker.start_task(task, self._field(body, 'at') or current_time(), project,
+                                self._field(body, 'date'))
+        self.changes.current = True
+        return self.get_current(params, body)
+
+    def complete_task(self, params, body):
+        task = self.tracker.complete_task(self._field(body, 'at'))
+        self.changes.current = True
+        self.changes.added.append(task.task_id)
+        return task_json(task)
+
+    def log_task(self, params, body):
+        field = self._field
+        task = self.tracker.log_task(
+            field(body, 'task', required=True), field(body, 'project'),
+            field(body, 'start', required=True), field(body, 'end', required=True),
+            field(body, 'date'))
+        self.changes.added.append(task.task_id)
+        return task_json(task)
+
+    def run_batch(self, requests):
+        """Run several requests in order, storing their changes in one write"""
+        results = []
+        self._catch_up()
+        self.changes = ExternalChanges()
+        with self.tracker.batch():
+            for request in requests:
+                if not isinstance(request, dict):
+                    results.append({'status': 400, 'error': "Expected an object"})
+                    continue
+                method = str(request.get('method', 'POST')).upper()
+                handler = self.routes.get((method, request.get('path')))
+                if handler is None:
+                    results.append({'status': 404, 'error': "No such endpoint in a batch"})
+                    continue
+                body = request.get('body') or {}
+                if not isinstance(body, dict):
+                    results.append({'status': 400, 'error': "Expected a JSON object body"})
+                    continue
+                # Every request gets its own status; a failure never stops the batch
+                try:
+                    params = {key: str(value) for key, value in body.items()}
+                    results.append({'status': 200, 'result': handler(params, body)})
+                except TrackerError as e:
+                    results.append({'status': 400, 'error': str(e)})
+                except Exception as e:
+                    results.append({'status': 500, 'error': f"{type(e).__name__}: {e}"})
+        if self.changes and self.on_change is not None:
+            self.on_change(self.changes)
+        return {'results': results}
+
+    def _catch_up(self):
+        # Another instance may share the data directory; a stat tells
+        # whether there is anything to merge before answering
+        if self.tracker.store.changed():
+            self.tracker.refresh()
+
+    def _call(self, handler, params, body):
+        self._catch_up()
+        self.changes = ExternalChanges()
+        result = handler(params, body)
+        if self.changes and self.on_change is not None:
+            self.on_change(self.changes)
+        return result
+
+    def _report_tasks(self, body):
+        self._catch_up()
+        params = {key: str(value) for key, value in body.items()}
+        # A copy, so the writer never reads tracker.tasks while it changes;
+        # archived months are read by the writer
+        return self.tracker.report_tasks(params.get('q', ''), *self._filter(params))
+
+    # HTTP
+
+    async def dispatch(self, method, path, params, body):
+        if path == '/report':
+            if method != 'POST':
+                raise ApiError(405, "Use POST")
+            return await self.report(body)
+        if path == '/batch':
+            if method != 'POST':
+                raise ApiError(405, "Use POST")
+            requests = body.get('requests')
+            if not isinstance(requests, list):
+                raise ApiError(400, "Expected {\"requests\": [...]}")
+            return await asyncio.wrap_future(self.submit(self.run_batch, requests))
+        route = self.routes.get((method, path))
+        if route is None:
+            if any(route_path == path for _, route_path in self.routes):
+                raise ApiError(405, f"{method} is not supported on {path}")
+            raise ApiError(404, f"No such endpoint: {path}")
+        return await asyncio.wrap_future(self.submit(self._call, route, params, body))
+
+    async def report(self, body):
+        """Write a work summary into the reports folder"""
+        from tracker_reports import report_writer
+
+        output = self._field(body, 'output')
+        report_format = (self._field(body, 'format') or guess_report_format(output)).lower()
+        writer = report_writer(report_format)
+        tasks, rows = await asyncio.wrap_future(self.submit(self._report_tasks, body))
+        if not rows:
+            raise TrackerError("No tasks match the filter")
+        directory = self.tracker.report_dir()
+        # Only a file name is taken from the request, never a path
+        filename = directory / Path(output or report_filename(report_format=report_format)).name
+        if filename.suffix.lower() != f'.{report_format}':
+            filename = filename.with_name(f"{filename.name}.{report_format}")
+        directory.mkdir(parents=True, exist_ok=True)
+        rows = await asyncio.get_running_loop().run_in_executor(None, writer, filename, tasks)
+        return {'filename': str(filename), 'format': report_format, 'rows': rows}
+
+    async def handle(self, reader, writer):
+        """Serve requests on one connection until it is closed"""
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line.strip():
+                    break
+                keep_alive = await self._serve_one(request_line, reader, writer)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        except asyncio.CancelledError:
+            # The server is shutting down with this connection still open
+            pass
+        finally:
+            writer.close()
+
+    async def _serve_one(self, request_line, reader, writer):
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+        try:
+            method, target, version = request_line.decode('latin-1').split()
+        except ValueError:
+            await self._respond(writer, 400, {'error': "Malformed request line"}, False)
+            return False
+        connection = headers.get('connection', '').lower()
+        keep_alive = connection == 'keep-alive' or (version == 'HTTP/1.1' and connection != 'close')
+        try:
+            length = int(headers.get('content-length') or 0)
+        except ValueError:
+            length = -1
+        if length < 0 or length > MAX_BODY:
+            await self._respond(writer, 413 if length > 0 else 400,
+                                {'error': "Bad Content-Length"}, False)
+            return False
+        data = await reader.readexactly(length) if length else b''
+
+        try:
+            status, payload = 200, await self._process(method.upper(), target, headers, data)
+        except ApiError as e:
+            status, payload = e.status, {'error': str(e)}
+        except TrackerError as e:
+            status, payload = 400, {'error': str(e)}
+        except Exception as e:
+            status, payload = 500, {'error': f"{type(e).__name__}: {e}"}
+        await self._respond(writer, status, payload, keep_alive)
+        return keep_alive
+
+    async def _process(self, method, target, headers, data):
+        if 'origin' in headers:
+            raise ApiError(403, "Requests from web pages are not accepted")
+        if self.token and headers.get('authorization') != f"Bearer {self.token}":
+            raise ApiError(401, "Missing or wrong API token")
+        url = urlsplit(target)
+        params = dict(parse_qsl(url.query))
+        body = {}
+        if method == 'POST':
+            if not headers.get('content-type', '').startswith('application/json'):
+                raise ApiError(400, "POST bodies must be application/json")
+            try:
+                body = json.loads(data or b'{}')
+            except ValueError as e:
+                raise ApiError(400, f"Invalid JSON: {e}")
+            if not isinstance(body, dict):
+                raise ApiError(400, "Expected a JSON object")
+        return await self.dispatch(method, url.path.rstrip('/') or '/', params, body)
+
+    async def _respond(self, writer, status, payload, keep_alive):
+        data = json.dumps(payload).encode('utf-8')
+        writer.write(
+            (f"HTTP/1.1 {status} {REASONS.get(status, '')}\r\n"
+             f"Content-Type: application/json\r\n"
+             f"Content-Length: {len(data)}\r\n"
+             f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n").encode('latin-1')
+            + data)
+        await writer.drain()
+
+    # Running
+
+    def _defer_flush(self):
+        if self.flush_handle is not None:
+            self.flush_handle.cancel()
+        self.flush_handle = self.loop.call_later(self.flush_delay, self.tracker.flush)
+
+    async def serve(self, ready=None):
+        self.loop = asyncio.get_running_loop()
+        if self.flush_delay:
+            self.tracker.defer_flush = self._defer_flush
+        self.server = await asyncio.start_server(self.handle, self.host, self.port)
+        self.port = self.server.sockets[0].getsockname()[1]
+        if ready is not None:
+            ready.set()
+        else:
+            # Serving from the command line: stop cleanly on SIGTERM too
+            try:
+                self.loop.add_signal_handler(signal.SIGTERM, self.server.close)
+            except (NotImplementedError, AttributeError, RuntimeError):
+                pass
+        async with self.server:
+            await self.server.serve_forever()
+
+    def serve_forever(self):
+        """Run the server on this thread until Ctrl+C or SIGTERM"""
+        try:
+            asyncio.run(self.serve())
+        except (KeyboardInterrupt, asyncio.CancelledError):
+            pass
+
+    def start(self):
+        """Run the server on a daemon thread; return once it is listening"""
+        ready = threading.Event()
+        errors = []
+
+        def run():
+            try:
+                asyncio.run(self.serve(ready))
+            except asyncio.CancelledError:
+                pass
+            except Exception as e:
+                errors.append(e)
+                ready.set()
+
+        self.thread = threading.Thread(target=run, name="work-tracker-api", daemon=True)
+        self.thread.start()
+        ready.wait()
+        if errors:
+            raise errors[0]
+
+    def stop(self):
+        if self.loop is not None and self.server is not None:
+            self.loop.call_soon_threadsafe(self.server.close)
+        if self.thread is not None:
+            self.thread.join(timeout=5)
+            self.thread = None
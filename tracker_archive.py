@@ -0,0 +1,158 @@
+"""Compressed monthly archive of old tasks
+
+Tasks older than the active period are moved out of the task store into
+one gzip-compressed JSON Lines segment per month
+(archive/tasks_<YYYY_MM>.jsonl.gz), so startup only reads the recent
+history however many years have accumulated. Segments are opened lazily,
+when a report, search or filter reaches back into their month, and the
+most recently used ones are cached.
+
+archive/index.json keeps the task count and rollup totals of every
+segment, so all-time totals never need to open one.
+"""
+import gzip
+import json
+import os
+import re
+from collections import OrderedDict
+from pathlib import Path
+
+from tracker_metrics import count_io
+from tracker_storage import StoreLock, atomic_write
+
+ARCHIVE_DIR = "archive"
+
+SEGMENT = re.compile(r"tasks_(\d{4}_\d{2})\.jsonl\.gz$")
+
+# Decompressed segments kept in memory
+CACHED_SEGMENTS = 24
+
+
+class Archive:
+    """Monthly gzip segments of archived task records
+
+    load_task turns a stored record into the object read() returns, and
+    summarize(records) gives the totals kept for a segment in the index.
+    Both default to returning their input unchanged.
+    """
+
+    def __init__(self, directory, load_task=None, summarize=None):
+        self.directory = Path(directory)
+        self.index_file = self.directory / "index.json"
+        self.load_task = load_task or (lambda record: record)
+        self.summarize = summarize or (lambda records: {'task_count': len(records)})
+        # Several instances may archive into the same folder
+        self.lock = StoreLock(self.directory / "archive.lock")
+        # month -> (segment mtime, tasks), least recently used first
+        self._cache = OrderedDict()
+
+    def segment_file(self, month):
+        return self.directory / f"tasks_{month}.jsonl.gz"
+
+    def months(self):
+        """Archived months ('YYYY_MM'), oldest first"""
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return []
+        return sorted(match.group(1) for match in map(SEGMENT.match, names) if match)
+
+    def index(self):
+        """{month: segment totals} for every archived month"""
+        try:
+            with open(self.index_file, 'r', encoding='utf-8') as f:
+                return json.load(f).get('months', {})
+        except (OSError, ValueError):
+            return {}
+
+    def _read_records(self, month):
+        path = self.segment_file(month)
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            records = [json.loads(line) for line in f if line.strip()]
+        count_io('read', path.stat().st_size)
+        return records
+
+    def records(self, months=None):
+        """Yield the stored records of the given months (default: all), uncached"""
+        for month in self.months() if months is None else months:
+            yield from self._read_records(month)
+
+    def read(self, month):
+        """Tasks of one archived month, cached until its segment changes"""
+        try:
+            mtime = self.segment_file(month).stat().st_mtime_ns
+        except FileNotFoundError:
+            self._cache.pop(month, None)
+            return []
+        cached = self._cache.get(month)
+        if cached is not None and cached[0] == mtime:
+            self._cache.move_to_end(month)
+            return cached[1]
+        tasks = [self.load_task(record) for record in self._read_records(month)]
+        self._cache[month] = (mtime, tasks)
+        if len(self._cache) > CACHED_SEGMENTS:
+            self._cache.popitem(last=False)
+        return tasks
+
+    def add(self, records_by_month):
+        """Merge {month: [record, ...]} into the segments
+
+        A record replaces any archived record with the same task_id. Each
+        segment is rewritten atomically, then the index.
+        """
+        self.directory.mkdir(parents=True, exist_ok=True)
+        with self.lock:
+            index = self.index()
+            for month, records in sorted(records_by_month.items()):
+                merged = {}
+                if self.segment_file(month).exists():
+                    merged = {record['task_id']: record
+                              for record in self._read_records(month)}
+                merged.update((record['task_id'], record) for record in records)
+                self._write_segment(month, merged.values())
+                index[month] = self.summarize(list(merged.values()))
+            atomic_write(self.index_file, json.dumps({'months': index}, separators=(',', ':')))
+
+    def discard(self, task_ids_by_month):
+        """Remove {month: [task_id, ...]} from the segments"""
+        with self.lock:
+            index = self.index()
+            for month, task_ids in sorted(task_ids_by_month.items()):
+                if not self.segment_file(month).exists():
+                    continue
+                task_ids = set(task_ids)
+                records = [record for record in self._read_records(month)
+                           if record['task_id'] not in task_ids]
+                if records:
+                    self._write_segment(month, records)
+                    index[month] = self.summarize(records)
+                else:
+                    self.segment_file(month).unlink()
+                    index.pop(month, None)
+            atomic_write(self.index_file, json.dumps({'months': index}, separators=(',', ':')))
+
+    def clear(self):
+        """Delete every segment and the index"""
+        if not self.directory.exists():
+            return
+        with self.lock:
+            for month in self.months():
+                self.segment_file(month).unlink(missing_ok=True)
+            self.index_file.unlink(missing_ok=True)
+        self._cache.clear()
+
+    def _write_segment(self, month, records):
+        path = self.segment_file(month)
+        tmp_path = path.with_name(path.name + ".tmp")
+        with open(tmp_path, 'wb') as raw:
+            with gzip.GzipFile(fileobj=raw, mode='wb', mtime=0) as f:
+                for record in records:
+                    f.write(json.dumps(record, separators=(',', ':')).encode('utf-8') + b"\n")
+            raw.flush()
+            os.fsync(raw.fileno())
+            count_io('write', raw.tell())
+        os.replace(tmp_path, path)
+
+    def close(self):
+        self._cache.clear()
+        self.lock.close()
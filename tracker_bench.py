@@ -0,0 +1,439 @@
+"""Benchmarks for the tracker's load, save, view, suggestion and report paths
+
+    python tracker_bench.py --sizes 1000 10000 100000 -o bench.json
+    python tracker_bench.py --sizes 10000 --compare bench.json
+
+Each case runs against a synthetic history in a temporary data directory.
+Timings are taken first; with --memory every case is then run again under
+tracemalloc to record its peak allocation. Results are written as JSON so
+runs from different versions can be compared with --compare.
+
+The populate and startup cases drive the real window and are skipped when
+Tk cannot open a display; run it under a virtual display, e.g.
+``xvfb-run python tracker_bench.py``.
+"""
+import argparse
+import csv
+import gc
+import importlib.util
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from tracker_core import (DAY_SECONDS, PROJECT_CATEGORIES, Task, TaskTracker, day_start,
+                          format_date, format_time, new_task_id, task_category,
+                          timestamp_day)
+from tracker_storage import open_store
+
+DEFAULT_SIZES = [1000, 10000, 100000]
+
+# Reports beyond this many rows are skipped unless --report-limit says otherwise
+REPORT_LIMIT = 100000
+
+# Text used to build task descriptions
+WORDS = ["meeting", "student", "coaching", "tutor", "review", "paperwork", "team",
+         "onboarding", "lassi", "recruit", "follow-up", "email", "planning", "notes"]
+
+
+def synthetic_tasks(count, seed=0):
+    """Return count tasks spread over working days, newest last"""
+    rng = random.Random(seed)
+    projects = list(PROJECT_CATEGORIES) + ["Other"]
+    # About six tasks a day, ending today
+    days = max(1, count // 6)
+    first_day = day_start(datetime.now().date()) // DAY_SECONDS - days
+    tasks = []
+    for index in range(count):
+        day = first_day + index * days // count
+        start = day * DAY_SECONDS + rng.randrange(7 * 3600, 17 * 3600, 60)
+        minutes = rng.randrange(5, 180)
+        text = " ".join(rng.sample(WORDS, rng.randrange(1, 4)))
+        tasks.append(Task(new_task_id(), text, rng.choice(projects), task_category(text),
+                          start, start + minutes * 60, minutes))
+    return tasks
+
+
+def seed_data_dir(data_dir, tasks, backend):
+    """Write tasks into a fresh data directory with the given store backend"""
+    data_dir.mkdir(parents=True, exist_ok=True)
+    store = open_store(data_dir, backend)
+    try:
+        store.replace_all(tasks, {})
+    finally:
+        store.close()
+
+
+def open_tracker(data_dir, backend):
+    tracker = TaskTracker(data_dir, store=open_store(data_dir, backend))
+    tracker.load()
+    return tracker
+
+
+class Bench:
+    """Benchmark cases for one history size
+
+    Each case_* method prepares what it needs and returns a callable that
+    runs the measured work once; a close attribute on it, if set, is called
+    when the case is done.
+    """
+
+    def __init__(self, size, backend, workdir, report_limit=REPORT_LIMIT):
+        self.size = size
+        self.backend = backend
+        self.workdir = Path(workdir)
+        self.report_limit = report_limit
+        self.tasks = synthetic_tasks(size)
+        self.data_dir = self.workdir / "data"
+        seed_data_dir(self.data_dir, self.tasks, backend)
+
+    def case_load(self):
+        def run():
+            open_tracker(self.data_dir, self.backend).close()
+        return run
+
+    def case_save(self):
+        """1000 changes queued and flushed as one batch"""
+        tracker = open_tracker(self.data_dir, self.backend)
+
+        def run():
+            with tracker.batch():
+                for index in range(1000):
+                    tracker.log_task(f"bench task {index}", "Other", "9:00 AM", "9:30 AM")
+            tracker.delete_tasks([task_id for task_id, task in tracker.tasks.items()
+                                  if task.task.startswith("bench task")])
+
+        run.close = tracker.close
+        return run
+
+    def case_compact(self):
+        tracker = open_tracker(self.data_dir, self.backend)
+
+        def run():
+            tracker.store.compact(list(tracker.tasks.values()), tracker.current_task_data())
+
+        run.close = tracker.close
+        return run
+
+    def archived_data_dir(self):
+        """A copy of the history with everything but the last 12 months archived"""
+        data_dir = self.workdir / "archived"
+        if not data_dir.exists():
+            seed_data_dir(data_dir, self.tasks, self.backend)
+            tracker = open_tracker(data_dir, self.backend)
+            tracker.archive_old_tasks(12)
+            tracker.close()
+        return data_dir
+
+    def case_load_archived(self):
+        """Startup when all but the last 12 months are archived"""
+        data_dir = self.archived_data_dir()
+
+        def run():
+            open_tracker(data_dir, self.backend).close()
+        return run
+
+    def case_archive_query(self):
+        """A 90-day range two years back, read from cold archive segments"""
+        tracker = open_tracker(self.archived_data_dir(), self.backend)
+        end = datetime.now().date() - timedelta(days=730)
+        start = end - timedelta(days=90)
+
+        def run():
+            tracker.archive.close()
+            return sum(1 for _ in tracker.iter_tasks(start, end))
+
+        run.close = tracker.close
+        return run
+
+    def case_filter(self):
+        """Tasks in the last 30 days of the history"""
+        tracker = open_tracker(self.data_dir, self.backend)
+        end = timestamp_day(max(task.start for task in self.tasks))
+        start = end - timedelta(days=30)
+
+        def run():
+            return sum(1 for _ in tracker.iter_tasks(start, end))
+
+        run.close = tracker.close
+        return run
+
+    def case_search(self):
+        """A prefix, a two-word and a phrase query, after the index is built"""
+        tracker = open_tracker(self.data_dir, self.backend)
+        tracker.search(WORDS[0])
+
+        def run():
+            for query in ("coach", "stud rev", '"team meeting"'):
+                tracker.search(query)
+
+        run.close = tracker.close
+        return run
+
+    def case_import(self):
+        """Dry-run import of the history from a CSV file with no project column"""
+        path = self.workdir / "import.csv"
+        with open(path, 'w', encoding='utf-8', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(["Date", "Task", "Start", "End"])
+            for task in self.tasks:
+                writer.writerow([format_date(task.start), task.task, format_time(task.start),
+                                 format_time(task.end)])
+        tracker = TaskTracker(self.workdir / "import")
+
+        def run():
+            tracker.import_tasks(path, dry_run=True)
+
+        run.close = tracker.close
+        return run
+
+    def case_refresh(self):
+        """Another instance saves 100 tasks, then deletes them; both are merged"""
+        tracker = open_tracker(self.data_dir, self.backend)
+        other = open_tracker(self.data_dir, self.backend)
+
+        def run():
+            with other.batch():
+                added = [other.log_task(f"other task {index}", "Other", "9:00 AM", "9:30 AM")
+                         for index in range(100)]
+            tracker.refresh()
+            other.delete_tasks([task.task_id for task in added])
+            tracker.refresh()
+
+        def close():
+            other.close()
+            tracker.close()
+
+        run.close = close
+        return run
+
+    def case_suggest_project(self):
+        """One suggestion per task description (at most 10000)"""
+        tracker = TaskTracker(self.workdir / "suggest")
+        texts = [task.task for task in self.tasks[:10000]]
+
+        def run():
+            for text in texts:
+                tracker.suggest_project(text)
+        return run
+
+    def case_rollups(self):
+        tracker = open_tracker(self.data_dir, self.backend)
+
+        def run():
+            tracker.rollups.rebuild(tracker.tasks.values())
+
+        run.close = tracker.close
+        return run
+
+    def case_analytics(self):
+        try:
+            import tracker_analytics
+        except ImportError:
+            return "NumPy is not installed"
+
+        def run():
+            tracker_analytics.summary_sheets(self.tasks)
+        return run
+
+    def case_report(self):
+        if self.size > self.report_limit:
+            return f"more than {self.report_limit} rows (see --report-limit)"
+        from tracker_reports import write_xlsx_report
+        filename = self.workdir / "report.xlsx"
+
+        def run():
+            write_xlsx_report(filename, self.tasks)
+        return run
+
+    def _streamed_report(self, report_format):
+        """Same rows as the report case, in a streaming format"""
+        from tracker_reports import report_writer
+        filename = self.workdir / f"report.{report_format}"
+        writer = report_writer(report_format)
+
+        def run():
+            writer(filename, self.tasks)
+        return run
+
+    def case_report_csv(self):
+        return self._streamed_report('csv')
+
+    def case_report_jsonl(self):
+        return self._streamed_report('jsonl')
+
+    def case_report_parquet(self):
+        if importlib.util.find_spec("pyarrow") is None:
+            return "pyarrow is not installed"
+        return self._streamed_report('parquet')
+
+    def case_populate(self):
+        """Open the window on the history, then re-filter and page through it"""
+        try:
+            import tkinter as tk
+            root = tk.Tk()
+        except Exception as e:
+            return f"Tk is not available ({e})"
+        root.withdraw()
+        from work_tracker import WorkTracker
+        app = WorkTracker(root, data_dir=self.data_dir)
+        # Keep the whole history in the window, as the other cases do
+        app.tracker.archive_months = 0
+        # The window loads tasks from an idle callback (on_first_frame); run
+        # it and wait for the background work it starts before timing
+        root.update_idletasks()
+        app.executor.submit(lambda: None).result()
+
+        def run():
+            app.populate_treeview()
+            for _ in range(20):
+                app.task_list.page(-1)
+            root.update_idletasks()
+
+        run.close = app.on_close
+        return run
+
+    def case_startup(self):
+        """A fresh interpreter opening the window on the history, until tasks are shown"""
+        try:
+            import tkinter as tk
+            tk.Tk().destroy()
+        except Exception as e:
+            return f"Tk is not available ({e})"
+        script = ("import sys, tkinter as tk\n"
+                  "from work_tracker import WorkTracker\n"
+                  "root = tk.Tk()\n"
+                  "WorkTracker(root, data_dir=sys.argv[1])\n"
+                  "root.mainloop()\n")
+        env = dict(os.environ, WORK_TRACKER_STARTUP_REPORT="exit",
+                   WORK_TRACKER_ARCHIVE_MONTHS="0")
+
+        def run():
+            subprocess.run([sys.executable, "-c", script, str(self.data_dir)], env=env,
+                           cwd=Path(__file__).parent, check=True, capture_output=True)
+        return run
+
+    CASES = ["load", "load_archived", "save", "compact", "filter", "archive_query", "search",
+             "import", "refresh", "suggest_project", "rollups", "analytics", "report",
+             "report_csv", "report_jsonl", "report_parquet", "populate", "startup"]
+
+    def prepare(self, case):
+        return getattr(self, f"case_{case}")()
+
+
+def measure(prepare, repeat, memory):
+    """Return (best seconds, peak bytes, reason skipped) for a case
+
+    prepare() returns the callable to measure, or a string saying why the
+    case cannot run here.
+    """
+    run = prepare()
+    if isinstance(run, str):
+        return None, None, run
+    try:
+        times = []
+        for _ in range(repeat):
+            gc.collect()
+            started = time.perf_counter()
+            run()
+            times.append(time.perf_counter() - started)
+        peak = None
+        if memory:
+            gc.collect()
+            tracemalloc.start()
+            try:
+                run()
+                peak = tracemalloc.get_traced_memory()[1]
+            finally:
+                tracemalloc.stop()
+    finally:
+        close = getattr(run, "close", None)
+        if close is not None:
+            close()
+    return min(times), peak, None
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "describe", "--always", "--dirty"],
+                              capture_output=True, text=True, check=True,
+                              cwd=Path(__file__).parent).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmarks(sizes, cases, backend, repeat=3, memory=True, report_limit=REPORT_LIMIT,
+                   log=print):
+    results = []
+    for size in sizes:
+        with tempfile.TemporaryDirectory() as workdir:
+            bench = Bench(size, backend, workdir, report_limit)
+            for case in cases:
+                seconds, peak, skipped = measure(lambda: bench.prepare(case), repeat, memory)
+                result = {'case': case, 'size': size, 'seconds': seconds, 'peak_bytes': peak}
+                if skipped:
+                    result['skipped'] = skipped
+                    log(f"{case:>16} {size:>8}  skipped: {skipped}")
+                else:
+                    memory_text = f"  peak {peak / 2 ** 20:8.1f} MiB" if peak is not None else ""
+                    log(f"{case:>16} {size:>8}  {seconds * 1000:10.1f} ms{memory_text}")
+                results.append(result)
+    return {
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'revision': git_revision(),
+        'python': sys.version.split()[0],
+        'platform': platform.platform(),
+        'backend': backend,
+        'results': results
+    }
+
+
+def compare(baseline, current, log=print):
+    """Print the time and memory ratio of each case against a baseline run"""
+    previous = {(r['case'], r['size']): r for r in baseline['results']}
+    log(f"Compared with {baseline.get('revision') or 'baseline'} ({baseline['created']}):")
+    for result in current['results']:
+        old = previous.get((result['case'], result['size']))
+        if not old or old.get('seconds') is None or result.get('seconds') is None:
+            continue
+        line = f"{result['case']:>16} {result['size']:>8}  time x{result['seconds'] / old['seconds']:.2f}"
+        if old.get('peak_bytes') and result.get('peak_bytes') is not None:
+            line += f"  memory x{result['peak_bytes'] / old['peak_bytes']:.2f}"
+        log(line)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the work tracker")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES,
+                        help="History sizes to generate (default: 1000 10000 100000)")
+    parser.add_argument("--cases", nargs="+", choices=Bench.CASES, default=Bench.CASES)
+    parser.add_argument("--backend", choices=["journal", "sqlite"], default="journal")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs per case (best is kept)")
+    parser.add_argument("--no-memory", dest="memory", action="store_false",
+                        help="Skip the tracemalloc pass")
+    parser.add_argument("--report-limit", type=int, default=REPORT_LIMIT,
+                        help="Largest history to export to Excel")
+    parser.add_argument("-o", "--output", help="Write results to this JSON file")
+    parser.add_argument("--compare", help="Earlier results to compare against")
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(args.sizes, args.cases, args.backend, args.repeat, args.memory,
+                             args.report_limit)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            compare(json.load(f), results)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,253 @@
+"""Command line interface to the work tracker
+
+    python tracker_cli.py start "Coaching session" --at "9:00 AM"
+    python tracker_cli.py stop
+    python tracker_cli.py log "Paperwork" --start 13:00 --end 13:45
+    python tracker_cli.py summary
+    python tracker_cli.py search '"student coaching" lassi' --from 12/01/2024
+    python tracker_cli.py report --from 12/01/2024 --to 12/31/2024
+    python tracker_cli.py report --format parquet -o history.parquet
+    python tracker_cli.py import old/tasks.json other/WorkTrackerData
+    python tracker_cli.py import --dry-run timesheet.csv calendar.ics
+    python tracker_cli.py consolidate team/ -o Team_Work_Summary.xlsx
+    python tracker_cli.py archive --months 12
+    python tracker_cli.py serve --port 8765
+
+Only tracker_core is imported up front, so commands start without loading
+tkinter or openpyxl.
+"""
+import argparse
+import os
+import sys
+from datetime import date
+
+from tracker_core import (REPORT_FORMATS, TaskTracker, TrackerError, current_time,
+                          filter_tasks, format_date, format_duration, format_time,
+                          guess_report_format, parse_date, report_filename)
+
+# Idle time before changes received by `serve` are written, in seconds
+SERVE_FLUSH_DELAY = 0.5
+
+
+def cmd_start(tracker, args):
+    project = args.project or tracker.suggest_project(args.task)
+    tracker.start_task(args.task, args.at or current_time(), project)
+    print(f"Task '{args.task}' started at {format_time(tracker.current_start)} ({project})")
+
+
+def cmd_stop(tracker, args):
+    task = tracker.complete_task(args.at)
+    print(f"Task '{task.task}' completed: {format_duration(task.minutes_worked)}")
+
+
+def cmd_log(tracker, args):
+    task = tracker.log_task(args.task, args.project, args.start, args.end, args.date)
+    print(f"Logged '{task.task}' on {format_date(task.start)} ({task.project_id}): "
+          f"{format_duration(task.minutes_worked)}")
+
+
+def cmd_report(tracker, args):
+    if args.monthly:
+        if args.format not in (None, 'xlsx'):
+            raise TrackerError("Monthly reports are always Excel workbooks")
+        written = tracker.export_period_reports(args.output)
+        for filename, count in written:
+            print(f"{count} tasks saved as: {filename}")
+        if not written:
+            print("Monthly reports are up to date")
+        return
+    start = parse_date(args.start) if args.start else None
+    end = parse_date(args.end) if args.end else None
+    filename, count = tracker.export_report(args.output, start, end, args.project,
+                                            report_format=args.format)
+    print(f"{count} tasks saved as: {filename}")
+
+
+def cmd_search(tracker, args):
+    start = parse_date(args.start) if args.start else None
+    end = parse_date(args.end) if args.end else None
+    tasks = tracker.search(args.query, start, end, args.project, args.archived)
+    for task in tasks[-args.limit:] if args.limit else tasks:
+        print(f"{format_date(task.start)}  {format_time(task.start):>11}  "
+              f"{format_duration(task.minutes_worked):>8}  {task.project_id}: {task.task}")
+    print(f"{len(tasks)} matching tasks")
+    if not (args.archived or start or end) and tracker.archive.months():
+        print("Archived months were not searched; use --from or --archived",
+              file=sys.stderr)
+
+
+def cmd_serve(tracker, args):
+    from tracker_api import ApiServer
+
+    server = ApiServer(tracker, port=args.port, flush_delay=SERVE_FLUSH_DELAY,
+                       token=args.token or os.environ.get("WORK_TRACKER_API_TOKEN"))
+    print(f"Serving the work tracker API on http://{server.host}:{args.port} "
+          f"(Ctrl+C to stop)", file=sys.stderr)
+    server.serve_forever()
+
+
+def format_minutes(minutes):
+    return f"{minutes // 60}h {minutes % 60:02d}m"
+
+
+def cmd_summary(tracker, args):
+    rollups = tracker.all_rollups()
+    day = parse_date(args.date) if args.date else date.today()
+    print(f"{day.strftime('%m/%d/%Y')}: {format_minutes(rollups.day_minutes(day))}")
+    print(f"Week of {day.strftime('%m/%d/%Y')}: {format_minutes(rollups.week_minutes(day))}")
+    print(f"All time ({rollups.task_count} tasks): {format_minutes(rollups.total_minutes)}")
+    for project, minutes in rollups.by_project.most_common():
+        if minutes:
+            print(f"  {project}: {format_minutes(minutes)}")
+
+
+def cmd_archive(tracker, args):
+    archived = tracker.archive_old_tasks(args.months)
+    months = args.months if args.months is not None else tracker.archive_months
+    print(f"Archived {len(archived)} tasks older than {months} months; "
+          f"{len(tracker.archive.months())} months in {tracker.archive.directory}")
+
+
+def cmd_import(tracker, args):
+    failed = False
+    for path in args.files:
+        result = tracker.import_tasks(path, dry_run=args.dry_run)
+        verb = "would import" if args.dry_run else "imported"
+        print(f"{path}: {verb} {result.imported} tasks, skipped {result.duplicates} "
+              f"already known, rejected {len(result.rejects)}")
+        for location, reason in result.rejects[:args.show_rejects]:
+            print(f"  {location}: {reason}", file=sys.stderr)
+        if len(result.rejects) > args.show_rejects:
+            print(f"  ... and {len(result.rejects) - args.show_rejects} more", file=sys.stderr)
+        failed = failed or bool(result.rejects)
+    return 1 if failed else 0
+
+
+def cmd_consolidate(tracker, args):
+    # Imported here so other commands do not pay for the process pool
+    from tracker_consolidate import consolidate
+    from tracker_reports import report_writer
+
+    merged = consolidate(args.paths, args.jobs)
+    for path, error in merged.errors:
+        print(f"{path}: skipped ({error})", file=sys.stderr)
+    start = parse_date(args.start) if args.start else None
+    end = parse_date(args.end) if args.end else None
+    report_format = args.format or guess_report_format(args.output)
+    filename = args.output or report_filename("Team", report_format)
+    count = report_writer(report_format)(
+        filename, filter_tasks(merged.tasks, start, end, args.project), users=merged.users)
+    print(f"{merged.sources} sources, {len(merged.users)} unique tasks "
+          f"({merged.duplicates} duplicates dropped)")
+    print(f"{count} tasks saved as: {filename}")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="work-tracker",
+                                     description="Log hours and generate work summaries")
+    parser.add_argument("--data-dir", help="Task data directory (default ~/WorkTrackerData)")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    start = commands.add_parser("start", help="Start timing a task")
+    start.add_argument("task")
+    start.add_argument("--project", help="Project ID (suggested from the task if omitted)")
+    start.add_argument("--at", help="Start time, HH:MM AM/PM (default now)")
+    start.set_defaults(func=cmd_start)
+
+    stop = commands.add_parser("stop", help="Complete the task in progress")
+    stop.add_argument("--at", help="End time, HH:MM AM/PM (default now)")
+    stop.set_defaults(func=cmd_stop)
+
+    log = commands.add_parser("log", help="Record a finished task")
+    log.add_argument("task")
+    log.add_argument("--start", required=True, help="Start time, HH:MM AM/PM")
+    log.add_argument("--end", required=True, help="End time, HH:MM AM/PM")
+    log.add_argument("--project", help="Project ID (suggested from the task if omitted)")
+    log.add_argument("--date", help="MM/DD/YYYY (default today)")
+    log.set_defaults(func=cmd_log)
+
+    report = commands.add_parser("report", help="Write a work summary")
+    report.add_argument("--from", dest="start", help="First date, MM/DD/YYYY")
+    report.add_argument("--to", dest="end", help="Last date, MM/DD/YYYY")
+    report.add_argument("--project", help="Only include this Project ID")
+    report.add_argument("-o", "--output",
+                        help="File to write (with --monthly, the report directory)")
+    report.add_argument("--format", choices=REPORT_FORMATS,
+                        help="Report format (default: from the output extension, else xlsx)")
+    report.add_argument("--monthly", action="store_true",
+                        help="Keep one workbook per month, rewriting only months "
+                             "that changed since the last run")
+    report.set_defaults(func=cmd_report)
+
+    summary = commands.add_parser("summary", help="Show day, week and project totals")
+    summary.add_argument("--date", help="Day to summarise, MM/DD/YYYY (default today)")
+    summary.set_defaults(func=cmd_summary)
+
+    search = commands.add_parser("search", help="Find tasks by words in their description "
+                                                "or project")
+    search.add_argument("query", help='Words or word prefixes, and "quoted phrases"')
+    search.add_argument("--from", dest="start", help="First date, MM/DD/YYYY")
+    search.add_argument("--to", dest="end", help="Last date, MM/DD/YYYY")
+    search.add_argument("--project", help="Only include this Project ID")
+    search.add_argument("--archived", action="store_true",
+                        help="Also search every archived month, not only those "
+                             "after --from")
+    search.add_argument("-n", "--limit", type=int, default=50,
+                        help="Show only the latest N matches (0 for all; default 50)")
+    search.set_defaults(func=cmd_search)
+
+    import_ = commands.add_parser("import",
+                                  help="Merge tasks from tasks.json, CSV, XLSX or ICS files "
+                                       "or data directories")
+    import_.add_argument("files", nargs="+")
+    import_.add_argument("--dry-run", action="store_true",
+                         help="Check the files and report rejects without storing anything")
+    import_.add_argument("--show-rejects", type=int, default=20,
+                         help="Rejected rows to list per file (default 20)")
+    import_.set_defaults(func=cmd_import)
+
+    consolidate = commands.add_parser(
+        "consolidate", help="Merge the team's data directories, tasks.json files and "
+                            "Work_Summary workbooks into one report")
+    consolidate.add_argument("paths", nargs="+")
+    consolidate.add_argument("--from", dest="start", help="First date, MM/DD/YYYY")
+    consolidate.add_argument("--to", dest="end", help="Last date, MM/DD/YYYY")
+    consolidate.add_argument("--project", help="Only include this Project ID")
+    consolidate.add_argument("-j", "--jobs", type=int, help="Worker processes (default: CPUs)")
+    consolidate.add_argument("-o", "--output", help="Report to write")
+    consolidate.add_argument("--format", choices=REPORT_FORMATS,
+                             help="Report format (default: from the output extension, else xlsx)")
+    consolidate.set_defaults(func=cmd_consolidate)
+
+    archive = commands.add_parser(
+        "archive", help="Move old tasks into compressed monthly files that are only "
+                        "read when a report or search reaches them")
+    archive.add_argument("--months", type=int,
+                         help="Months of history to keep, counting this one "
+                              "(default $WORK_TRACKER_ARCHIVE_MONTHS or 12)")
+    archive.set_defaults(func=cmd_archive)
+
+    serve = commands.add_parser("serve", help="Serve the local HTTP/JSON API (see tracker_api)")
+    serve.add_argument("--port", type=int, default=8765)
+    serve.add_argument("--token", help="Require this bearer token "
+                                       "(default $WORK_TRACKER_API_TOKEN, if set)")
+    serve.set_defaults(func=cmd_serve)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    tracker = TaskTracker(args.data_dir)
+    try:
+        tracker.load()
+        status = args.func(tracker, args)
+    except (ValueError, OSError) as e:
+        print(f"work-tracker: {e}", file=sys.stderr)
+        return 1
+    finally:
+        tracker.close()
+    return status or 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
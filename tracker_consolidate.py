@@ -0,0 +1,194 @@
+"""Merge the task histories of a whole team into one report
+
+Sources are tracker data directories, tasks.json files and exported
+*_Work_Summary_*.xlsx workbooks, found by walking the given paths. Each
+source is parsed in a worker process, tasks are deduplicated by task_id
+(first source in path order wins) and every task keeps the user it came
+from for the team report's User column.
+"""
+import hashlib
+import json
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime, time
+from pathlib import Path
+
+from tracker_archive import ARCHIVE_DIR, Archive
+from tracker_core import Task, TrackerError, normalize_task
+from tracker_storage import journal_generations, read_data_dir
+
+# Report headers mapped to legacy task record keys
+WORKBOOK_FIELDS = {
+    'Date': 'date',
+    'Project ID': 'project_id',
+    'Task ID': 'task_id',
+    'Faculty Student or Staff': 'faculty_student_staff',
+    'Administrative Task or Other': 'category',
+    'Start Time': 'start_time',
+    'Breaks (minutes)': 'breaks',
+    'End Time': 'end_time',
+    'Minutes Worked': 'minutes_worked'
+}
+
+WORKBOOK_PATTERN = re.compile(r"(.+?)_Work_Summary_.*\.xlsx$", re.IGNORECASE)
+
+# File and directory names that say nothing about whose data it is
+GENERIC_NAMES = {'tasks', 'WorkTrackerData'}
+
+# Sources handed to each worker process at a time
+CHUNK_SIZE = 4
+
+
+def is_data_dir(path):
+    return ((path / "tasks.json").exists() or bool(journal_generations(path))
+            or (path / "tasks.sqlite3").exists())
+
+
+def find_sources(paths):
+    """Yield data directories, JSON files and report workbooks under paths"""
+    for path in map(Path, paths):
+        if path.is_file():
+            yield path
+            continue
+        if not path.is_dir():
+            raise TrackerError(f"No such file or directory: {path}")
+        data_dir = is_data_dir(path)
+        if data_dir:
+            # The store reads its own files; only look for more users below it
+            yield path
+        for child in sorted(path.iterdir()):
+            if child.is_dir():
+                if data_dir and child.name == ARCHIVE_DIR:
+                    # Read along with its data directory
+                    continue
+                yield from find_sources([child])
+            elif data_dir or child.name.startswith('~$'):
+                continue
+            elif child.suffix == '.json' or WORKBOOK_PATTERN.match(child.name):
+                yield child
+
+
+def source_user(path):
+    """Name of the user a source belongs to, taken from its path"""
+    match = WORKBOOK_PATTERN.match(path.name)
+    if match:
+        return match.group(1)
+    name = path.stem if path.is_file() else path.name
+    while name in GENERIC_NAMES and path.parent != path:
+        path = path.parent
+        name = path.name
+    return name
+
+
+def content_task_id(user, record):
+    """Stable id for a task saved without one, so copies of it dedupe"""
+    key = json.dumps([user, record.get('start'), record.get('end'),
+                      record.get('project_id'), record.get('minutes_worked'),
+                      record.get('task', '')])
+    return hashlib.sha1(key.encode('utf-8')).hexdigest()[:32]
+
+
+def _cell_text(value, time_format):
+    if isinstance(value, datetime):
+        return value.strftime("%m/%d/%Y" if time_format is None else time_format)
+    if isinstance(value, date):
+        return value.strftime("%m/%d/%Y")
+    if isinstance(value, time):
+        return value.strftime(time_format or "%I:%M:%S %p")
+    return '' if value is None else str(value)
+
+
+def read_workbook(path):
+    """Return legacy task records from an exported work summary"""
+    import openpyxl
+
+    wb = openpyxl.load_workbook(path, read_only=True)
+    try:
+        rows = wb.worksheets[0].iter_rows(values_only=True)
+        header = next(rows, ())
+        fields = [WORKBOOK_FIELDS.get(name) for name in header]
+        records = []
+        for row in rows:
+            if not any(value not in (None, '') for value in row):
+                continue
+            record = {'task': ''}
+            for field, value in zip(fields, row):
+                if field == 'minutes_worked':
+                    record[field] = int(value) if isinstance(value, (int, float)) else None
+                elif field in ('start_time', 'end_time'):
+                    record[field] = _cell_text(value, "%I:%M:%S %p")
+                elif field:
+                    record[field] = _cell_text(value, None)
+            records.append(record)
+        return records
+    finally:
+        wb.close()
+
+
+def read_source(path):
+    """Return (user, task records, error) for one source; runs in a worker"""
+    user = source_user(path)
+    try:
+        if path.is_dir():
+            # Read only: other people's folders are never locked or rewritten
+            records, _ = read_data_dir(path)
+            records.extend(Archive(path / ARCHIVE_DIR).records())
+        elif path.suffix == '.xlsx':
+            records = read_workbook(path)
+        else:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            records = data.get('completed_tasks', []) if isinstance(data, dict) else data
+        for record in records:
+            normalize_task(record)
+            if not record.get('task_id'):
+                record['task_id'] = content_task_id(user, record)
+    except Exception as e:
+        return user, [], f"{type(e).__name__}: {e}"
+    return user, records, None
+
+
+class Consolidation:
+    """Tasks merged from many sources
+
+    tasks is in source order, users maps each task_id to its user, and
+    errors lists (path, message) for sources that could not be read.
+    """
+
+    def __init__(self):
+        self.tasks = []
+        self.users = {}
+        self.sources = 0
+        self.duplicates = 0
+        self.errors = []
+
+    def add(self, path, user, records, error):
+        self.sources += 1
+        if error:
+            self.errors.append((path, error))
+            return
+        for record in records:
+            if record['task_id'] in self.users:
+                self.duplicates += 1
+                continue
+            self.users[record['task_id']] = user
+            self.tasks.append(Task.from_dict(record))
+
+
+def consolidate(paths, jobs=None):
+    """Read every source under paths in parallel and merge their tasks
+
+    jobs is the number of worker processes (default: one per CPU).
+    """
+    sources = list(find_sources(paths))
+    result = Consolidation()
+    if not sources:
+        return result
+    jobs = min(jobs or os.cpu_count() or 1, len(sources))
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        # map() yields in source order, so the first copy of a task wins
+        for path, loaded in zip(sources, executor.map(read_source, sources,
+                                                      chunksize=CHUNK_SIZE)):
+            result.add(path, *loaded)
+    return result
@@ -0,0 +1,1228 @@
+"""Work tracker domain model: tasks, timers, categories, storage and reports
+
+Nothing in here imports tkinter, so the tracker can be driven from scripts,
+cron jobs and tracker_cli as well as from the GUI in work_tracker.py.
+"""
+import getpass
+import hashlib
+import json
+import os
+import re
+import sys
+from bisect import bisect_right
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+from functools import lru_cache
+from itertools import chain
+from operator import attrgetter
+from pathlib import Path
+
+from tracker_archive import ARCHIVE_DIR, Archive
+from tracker_rollups import Rollups
+from tracker_search import SearchIndex, has_terms, task_matches_query
+from tracker_storage import (EPOCH, atomic_write, lock_file, new_task_id, open_store,
+                             read_data_dir, unlock_file)
+
+DATA_DIR = Path.home() / "WorkTrackerData"
+
+# Queued changes that force a flush even inside a batch
+FLUSH_THRESHOLD = 256
+
+# Months of history kept in the task store, counting the current one; older
+# tasks are moved to the compressed archive ($WORK_TRACKER_ARCHIVE_MONTHS,
+# 0 to keep everything)
+ARCHIVE_MONTHS = 12
+
+# Report formats, by file extension; the writers are in tracker_reports
+REPORT_FORMATS = ('xlsx', 'csv', 'jsonl', 'parquet')
+
+# Project categories and their keywords
+PROJECT_CATEGORIES = {
+    "GSU meeting/Training": ["gsu", "meeting", "training"],
+    "Onboarding": ["onboard", "orientation"],
+    "Life Review": ["life", "review"],
+    "LASSI Review": ["lassi"],
+    "Recruitment": ["recruit", "admission"],
+    "Student": ["student"],
+    "Coaching": ["coach"],
+    "Tutoring": ["tutor"],
+    "Trio Project Assistance": ["trio", "project", "assist"],
+    "Administrative": ["admin", "paperwork", "documentation"],
+    "Trio Team Meeting": ["team", "meeting"],
+    "Work Assistance": ["work", "assist"],
+    "Group Coaching": ["group", "coach"],
+    "Cultural Events": ["cultural", "event"],
+    "Team Collaboration": ["collaboration", "collab"],
+    "Success Workshop": ["success", "workshop"],
+    "Trio Training": ["trio", "training"],
+    "Other": []
+}
+
+# Tasks keep their start and end as whole seconds since 1970-01-01 in local
+# wall-clock time, so date maths, sorting and range checks are integer
+# operations; date and time strings are only produced for display (EPOCH
+# comes from tracker_storage)
+DAY_SECONDS = 86400
+
+# HH:MM or HH:MM:SS, in 24-hour time or followed by AM/PM
+CLOCK_PATTERN = re.compile(r"\s*(\d{1,2}):(\d{2})(?::(\d{2}))?\s*([AaPp][Mm])?\s*$")
+
+
+class TrackerError(ValueError):
+    """A user-facing problem with a tracker operation"""
+
+
+@lru_cache(maxsize=1024)
+def parse_clock(time_str):
+    """Return the seconds after midnight for a HH:MM[:SS] [AM/PM] time"""
+    match = CLOCK_PATTERN.match(time_str)
+    if match:
+        hour, minute, second, meridiem = match.groups()
+        hour, minute, second = int(hour), int(minute), int(second or 0)
+        if meridiem:
+            valid = 1 <= hour <= 12
+            hour = hour % 12 + (12 if meridiem.lower() == 'pm' else 0)
+        else:
+            valid = hour <= 23
+        if valid and minute <= 59 and second <= 59:
+            return hour * 3600 + minute * 60 + second
+
+    raise TrackerError("Invalid time format! Please use HH:MM AM/PM or HH:MM:SS AM/PM")
+
+
+def parse_date(date_str):
+    """Parse a MM/DD/YYYY date, raising TrackerError if it is malformed"""
+    try:
+        return datetime.strptime(date_str, "%m/%d/%Y").date()
+    except ValueError:
+        raise TrackerError("Invalid date! Please use MM/DD/YYYY")
+
+
+def day_start(day):
+    """Timestamp of midnight at the start of a date"""
+    return (day - EPOCH.date()).days * DAY_SECONDS
+
+
+def timestamp_day(timestamp):
+    """Date a timestamp falls on"""
+    return EPOCH.date() + timedelta(days=timestamp // DAY_SECONDS)
+
+
+def month_key(timestamp):
+    """Month of a timestamp as used by archive segments and reports, e.g. '2024_12'"""
+    return timestamp_day(timestamp).strftime("%Y_%m")
+
+
+def archive_cutoff(months, today=None):
+    """Timestamp before which tasks are archived, keeping months of history"""
+    today = today or datetime.now().date()
+    index = today.year * 12 + today.month - 1 - (months - 1)
+    return day_start(date(index // 12, index % 12 + 1, 1))
+
+
+def now_timestamp():
+    return int((datetime.now() - EPOCH).total_seconds())
+
+
+def span(day, start_time, end_time):
+    """Return (start, end) timestamps for two times on a day
+
+    An end time earlier than the start time is taken to be after midnight.
+    """
+    start = day_start(day) + parse_clock(start_time)
+    end = day_start(day) + parse_clock(end_time)
+    if end < start:
+        end += DAY_SECONDS
+    return start, end
+
+
+def current_time():
+    return datetime.now().strftime("%I:%M %p")
+
+
+def format_date(timestamp):
+    return timestamp_day(timestamp).strftime("%m/%d/%Y") if timestamp is not None else ''
+
+
+def format_time(timestamp):
+    """HH:MM AM/PM, with seconds only when there are some"""
+    if timestamp is None:
+        return ''
+    seconds = timestamp % DAY_SECONDS
+    hour, minute, second = seconds // 3600, seconds % 3600 // 60, seconds % 60
+    clock = f"{hour % 12 or 12:02d}:{minute:02d}"
+    if second:
+        clock += f":{second:02d}"
+    return f"{clock} {'AM' if hour < 12 else 'PM'}"
+
+
+def format_duration(minutes):
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+
+def task_day(task):
+    """Return the calendar date of a task, or None if it has no start"""
+    return timestamp_day(task.start) if task.start is not None else None
+
+
+def normalize_task(task):
+    """Convert a task saved with date/time strings to timestamps in place
+
+    Returns True if the task needed converting.
+    """
+    if 'start' in task:
+        return False
+    try:
+        start, end = span(parse_date(task.get('date', '')),
+                          task.get('start_time', ''), task.get('end_time', ''))
+        minutes = (end - start) // 60
+    except TrackerError:
+        start = end = None
+        minutes = task.get('minutes_worked')
+        if not isinstance(minutes, int):
+            try:
+                hours, minutes = task.get('duration', '').split(':')
+                minutes = int(hours) * 60 + int(minutes)
+            except ValueError:
+                minutes = 0
+    for key in ('date', 'start_time', 'end_time', 'duration'):
+        task.pop(key, None)
+    task['start'] = start
+    task['end'] = end
+    task['minutes_worked'] = minutes
+    return True
+
+
+def intern_text(value):
+    """Share one copy of repeated strings such as project names"""
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+class Task:
+    """A completed task
+
+    Tasks are slotted objects rather than dicts, and their text fields are
+    interned, so the thousands of rows that share a project, category or
+    empty column share one string. A dict is only built by to_dict() when a
+    task is written to storage.
+    """
+
+    __slots__ = ('task_id', 'task', 'project_id', 'category', 'start', 'end',
+                 'minutes_worked', 'breaks', 'faculty_student_staff')
+
+    def __init__(self, task_id, task, project_id, category, start, end, minutes_worked,
+                 breaks='', faculty_student_staff=''):
+        self.task_id = task_id
+        self.task = intern_text(task)
+        self.project_id = intern_text(project_id)
+        self.category = intern_text(category)
+        self.start = start
+        self.end = end
+        self.minutes_worked = minutes_worked
+        self.breaks = intern_text(breaks)
+        self.faculty_student_staff = intern_text(faculty_student_staff)
+
+    @classmethod
+    def from_dict(cls, data):
+        """Build a task from a stored record (see normalize_task)"""
+        return cls(data['task_id'], data.get('task', ''), data.get('project_id', ''),
+                   data.get('category', ''), data.get('start'), data.get('end'),
+                   data.get('minutes_worked', 0), data.get('breaks', ''),
+                   data.get('faculty_student_staff', ''))
+
+    def to_dict(self):
+        return {field: getattr(self, field) for field in self.__slots__}
+
+    def __repr__(self):
+        return f"Task({self.task_id!r}, {self.task!r}, {self.project_id!r})"
+
+
+# Every stored field of a task, which together decide its report row
+task_fields = attrgetter(*Task.__slots__)
+
+
+def task_digest(task):
+    """128-bit digest of every stored field of a task, for month fingerprints"""
+    digest = hashlib.sha1(repr(task_fields(task)).encode('utf-8')).digest()
+    return int.from_bytes(digest[:16], 'big')
+
+
+def month_bounds(month):
+    """Timestamp bounds [low, high) of a 'YYYY_MM' month"""
+    year, month = int(month[:4]), int(month[5:])
+    index = year * 12 + month
+    return (day_start(date(year, month, 1)),
+            day_start(date(index // 12, index % 12 + 1, 1)))
+
+
+def task_category(task_text):
+    """Category column for the report"""
+    return 'Administrative Task' if 'admin' in task_text.lower() else 'Other'
+
+
+class KeywordMatcher:
+    """Rank project categories by the keywords found in a piece of text
+
+    All keywords are compiled into one regular expression, so matching is a
+    single pass over the text however many categories there are. The regex
+    looks ahead at every position for the longest keyword starting there;
+    shorter keywords that are prefixes of it are credited as well, which
+    keeps the results identical to plain substring checks.
+    """
+
+    def __init__(self, categories):
+        self.priority = {category: index for index, category in enumerate(categories)}
+        self.keyword_categories = {}
+        for category, keywords in categories.items():
+            for keyword in keywords:
+                self.keyword_categories.setdefault(keyword.lower(), []).append(category)
+
+        keywords = sorted(self.keyword_categories, key=len, reverse=True)
+        self.implied = {keyword: [other for other in keywords if keyword.startswith(other)]
+                        for keyword in keywords}
+        self.pattern = None
+        if keywords:
+            alternatives = '|'.join(re.escape(keyword) for keyword in keywords)
+            self.pattern = re.compile(f"(?=({alternatives}))")
+
+    def match(self, text):
+        """Return matching categories, most distinct keyword hits first
+
+        Ties keep the order the categories were defined in.
+        """
+        if self.pattern is None:
+            return []
+        hits = {}
+        for found in self.pattern.finditer(text.lower()):
+            for keyword in self.implied[found.group(1)]:
+                for category in self.keyword_categories[keyword]:
+                    hits.setdefault(category, set()).add(keyword)
+        return sorted(hits, key=lambda category: (-len(hits[category]), self.priority[category]))
+
+
+def date_bounds(start=None, end=None):
+    """Timestamp bounds [low, high) for an inclusive date range"""
+    low = day_start(start) if start is not None else None
+    high = day_start(end) + DAY_SECONDS if end is not None else None
+    return low, high
+
+
+def task_matches(task, start=None, end=None, project=None):
+    """Check a task against an optional date range and project"""
+    return next(filter_tasks([task], start, end, project), None) is not None
+
+
+def filter_tasks(tasks, start=None, end=None, project=None):
+    """Lazily yield the tasks inside the date range and project"""
+    low, high = date_bounds(start, end)
+    dated = low is not None or high is not None
+    for task in tasks:
+        if project and task.project_id != project:
+            continue
+        if dated:
+            timestamp = task.start
+            if (timestamp is None or (low is not None and timestamp < low)
+                    or (high is not None and timestamp >= high)):
+                continue
+        yield task
+
+
+def report_user():
+    """Name used in report filenames: $WORK_TRACKER_USER, else the login name"""
+    try:
+        return os.environ.get("WORK_TRACKER_USER") or getpass.getuser()
+    except (KeyError, OSError):
+        return "User"
+
+
+def report_filename(user=None, report_format='xlsx'):
+    user = user or report_user()
+    return f"{user}_Work_Summary_{datetime.now().strftime('%m_%d_%Y')}.{report_format}"
+
+
+def guess_report_format(filename, default='xlsx'):
+    """Report format given by a file name's extension, else default"""
+    if not filename:
+        return default
+    suffix = Path(filename).suffix.lower().lstrip('.')
+    return suffix if suffix in REPORT_FORMATS else default
+
+
+def session_running(marker):
+    """Whether the process that wrote a session marker still holds its lock"""
+    try:
+        with open(marker, 'a+b') as f:
+            if lock_file(f, blocking=False):
+                unlock_file(f)
+                return False
+    except OSError:
+        pass
+    return True
+
+
+def archive_totals(records):
+    """Rollup counters of an archive segment's records"""
+    rollups = Rollups(lambda task: task.minutes_worked, task_day, task_digest)
+    rollups.rebuild(Task.from_dict(record) for record in records)
+    return rollups.to_dict()
+
+
+class ExternalChanges:
+    """What TaskTracker.merge changed after other processes saved tasks
+
+    added, updated and deleted are task ids; current is set if the task in
+    progress changed, and reloaded if the whole list was replaced (a clear,
+    or a reload when the individual changes were not available).
+    """
+
+    def __init__(self):
+        self.added = []
+        self.updated = []
+        self.deleted = []
+        self.current = False
+        self.reloaded = False
+
+    def __bool__(self):
+        return bool(self.added or self.updated or self.deleted or self.current
+                    or self.reloaded)
+
+    def __repr__(self):
+        return (f"ExternalChanges(added={len(self.added)}, updated={len(self.updated)}, "
+                f"deleted={len(self.deleted)}, current={self.current}, "
+                f"reloaded={self.reloaded})")
+
+
+class TaskTracker:
+    """Completed tasks plus the task in progress, backed by a task store
+
+    Every method that changes state records the change through the store
+    before returning. Validation problems raise TrackerError with a message
+    meant for the user.
+    """
+
+    def __init__(self, data_dir=None, store=None, categories=None):
+        self.data_dir = Path(data_dir) if data_dir else DATA_DIR
+        self.data_dir.mkdir(parents=True, exist_ok=True)
+        self.store = store or open_store(self.data_dir)
+        self.set_categories(categories or PROJECT_CATEGORIES)
+
+        # All tasks keyed by task_id, in insertion order
+        self.tasks = {}
+
+        # Per-day, per-week and per-project minute totals, and a fingerprint
+        # of each month's tasks for the per-month reports
+        self.rollups = Rollups(lambda task: task.minutes_worked, task_day, task_digest)
+        self.rollups_file = self.data_dir / "rollups.json"
+
+        # Word index over task text and project ids, built on the first
+        # search or in the background (prepare_search_index)
+        self.search_index = None
+        # Bumped whenever tasks are added, changed or removed
+        self.task_version = 0
+
+        # Monthly segments of old tasks, read only when a query reaches them
+        self.archive = Archive(self.data_dir / ARCHIVE_DIR, Task.from_dict, archive_totals)
+        self.archive_months = int(os.environ.get("WORK_TRACKER_ARCHIVE_MONTHS", ARCHIVE_MONTHS))
+        # Archive runs between prepare_archive() and finish_archive(), and
+        # the ids deleted here meanwhile
+        self.archives_pending = 0
+        self.archive_deletions = set()
+
+        # Current task tracking
+        self.current_task = None
+        self.current_start = None
+        self.current_project = None
+
+        # Runs the snapshot writer returned by a compaction; the GUI swaps
+        # this for one that uses its worker thread
+        self.run_compaction = lambda write_snapshot: write_snapshot()
+
+        # Write-behind queue of (store method, args) changes. Without a
+        # defer_flush hook every change is flushed at once; the GUI installs
+        # one that flushes after a short idle delay.
+        self.pending = []
+        self.defer_flush = None
+        self._batch_depth = 0
+
+        # Called with an ExternalChanges whenever changes saved by another
+        # process are merged in; the GUI uses it to update the affected rows
+        self.on_external_change = None
+
+        # Each running instance has its own locked marker (see begin_session)
+        self.session_file = self.data_dir / f"session.{os.getpid()}.{new_task_id()[:8]}.json"
+        self._session = None
+
+    def load(self):
+        """Load tasks and current task status from the task store"""
+        records, current_task = self.store.load()
+        current_task = current_task or {}
+        self._set_current(current_task)
+
+        # Convert tasks saved with date and time strings, once
+        converted = sum([normalize_task(record) for record in records])
+        if self.current_task and 'start' not in current_task:
+            try:
+                self.current_start = (day_start(parse_date(current_task.get('date', '')))
+                                      + parse_clock(current_task.get('start_time', '')))
+            except TrackerError:
+                self.current_start = now_timestamp()
+            converted += 1
+        if converted:
+            self.store.replace_all(records, self.current_task_data())
+
+        tasks = [Task.from_dict(record) for record in records]
+        self.tasks = {task.task_id: task for task in tasks}
+        self.rollups.load(self.rollups_file, tasks)
+        self.search_index = None
+        self.task_version += 1
+
+    def _set_current(self, current_task):
+        self.current_task = current_task.get('task')
+        self.current_start = current_task.get('start')
+        self.current_project = current_task.get('project')
+
+    def current_task_data(self):
+        """Return the in-progress task as stored on disk"""
+        return {
+            'task': self.current_task,
+            'start': self.current_start,
+            'project': self.current_project
+        } if self.current_task else {}
+
+    def persist(self, action, *args):
+        """Queue a single change for the task store"""
+        self.pending.append((action, args))
+        if len(self.pending) >= FLUSH_THRESHOLD:
+            self.flush()
+        elif not self._batch_depth:
+            self.request_flush()
+
+    def request_flush(self):
+        """Flush now, or leave it to the defer_flush hook"""
+        if self.defer_flush is not None:
+            self.defer_flush()
+        else:
+            self.flush()
+
+    @contextmanager
+    def batch(self):
+        """Group changes so they reach the store in one write"""
+        self._batch_depth += 1
+        try:
+            yield
+        finally:
+            self._batch_depth -= 1
+        if not self._batch_depth and self.pending:
+            self.request_flush()
+
+    def flush(self):
+        """Write every queued change to the store in one batch"""
+        if not self.pending:
+            return
+        changes, self.pending = self.pending, []
+        try:
+            external = self.store.apply(changes)
+        except Exception:
+            # Keep the changes so a later flush can retry them
+            self.pending[:0] = changes
+            raise
+        if external:
+            # Written before ours, so our changes win where they overlap
+            self.merge(external, changes)
+        if self.store.needs_compaction():
+            write_snapshot = self.store.prepare_compaction(
+                list(self.tasks.values()), self.current_task_data())
+            if write_snapshot is not None:
+                # Serialise the rollups now; the writer may run on another thread
+                rollups = json.dumps(self.rollups.to_dict(), separators=(',', ':'))
+
+                def compact():
+                    write_snapshot()
+                    atomic_write(self.rollups_file, rollups)
+
+                self.run_compaction(compact)
+
+    def refresh(self):
+        """Merge changes other processes saved since the last flush or refresh
+
+        Returns an ExternalChanges (see merge).
+        """
+        return self.merge(self.store.refresh(), self.pending)
+
+    def merge(self, entries, local=()):
+        """Fold changes saved by another process into the loaded tasks
+
+        entries come from the store (see TaskStore.refresh). Tasks that have
+        a change of our own in local, queued or written after the entries,
+        are skipped: the later write wins. Only the affected tasks, rollups
+        and index entries are touched. Returns an ExternalChanges, which is
+        also passed to on_external_change if anything changed.
+        """
+        changes = ExternalChanges()
+        touched = set()
+        local_current = False
+        for action, args in local:
+            if action == 'clear':
+                # Our clear supersedes everything saved before it
+                return changes
+            if action == 'set_current':
+                local_current = True
+            elif action == 'delete_task':
+                touched.add(args[0])
+            elif action == 'delete_tasks':
+                touched.update(args[0])
+            elif action == 'add_tasks':
+                touched.update(task.task_id for task in args[0])
+            else:
+                touched.add(args[0].task_id)
+
+        for entry in entries:
+            op = entry['op']
+            if op in ('add', 'update'):
+                self._merge_record(entry['task'], touched, changes)
+            elif op == 'delete':
+                if entry['task_id'] not in touched:
+                    self._drop(entry['task_id'], changes)
+            elif op in ('clear', 'reload'):
+                records = entry.get('tasks', [])
+                keep = touched.union(record['task_id'] for record in records)
+                for task_id in [task_id for task_id in self.tasks if task_id not in keep]:
+                    self._drop(task_id, changes)
+                for record in records:
+                    self._merge_record(record, touched, changes)
+                if not local_current:
+                    self._set_current(entry.get('current') or {})
+                    changes.current = True
+                changes.reloaded = True
+            elif op == 'current' and not local_current:
+                self._set_current(entry['current'] or {})
+                changes.current = True
+
+        changes.added = [task_id for task_id in dict.fromkeys(changes.added)
+                         if task_id in self.tasks]
+        changes.updated = [task_id for task_id in dict.fromkeys(changes.updated)
+                           if task_id in self.tasks and task_id not in changes.added]
+        changes.deleted = list(dict.fromkeys(changes.deleted))
+        if changes and self.on_external_change is not None:
+            self.on_external_change(changes)
+        return changes
+
+    def _merge_record(self, record, touched, changes):
+        normalize_task(record)
+        if record['task_id'] in touched:
+            return
+        new = Task.from_dict(record)
+        task = self.tasks.get(new.task_id)
+        if task is None:
+            self.tasks[new.task_id] = new
+            self._index(new)
+            changes.added.append(new.task_id)
+        elif task.to_dict() != new.to_dict():
+            # Update in place, so anything holding the task sees the change
+            self._unindex(task)
+            for field in Task.__slots__:
+                setattr(task, field, getattr(new, field))
+            self._index(task)
+            changes.updated.append(task.task_id)
+
+    def _drop(self, task_id, changes):
+        task = self.tasks.pop(task_id, None)
+        if task is not None:
+            self._unindex(task)
+            changes.deleted.append(task_id)
+
+    def _index(self, task):
+        self.rollups.add(task)
+        self.task_version += 1
+        if self.search_index is not None:
+            self.search_index.add(task)
+
+    def _unindex(self, task):
+        self.rollups.remove(task)
+        self.task_version += 1
+        if self.search_index is not None:
+            self.search_index.remove(task)
+
+    def begin_session(self):
+        """Mark a long-running session, returning True if an earlier one crashed
+
+        Each instance keeps its own marker, session.<pid>.<n>.json, open and locked
+        until close() removes it. A marker nobody holds belongs to a session
+        that never closed cleanly: its last queued changes may be lost and
+        the saved rollups may be stale, so they are rebuilt from the tasks.
+        Markers of other instances that are still running are left alone.
+        """
+        crashed = False
+        for marker in self.data_dir.glob("session*.json"):
+            if marker != self.session_file and not session_running(marker):
+                crashed = True
+                marker.unlink(missing_ok=True)
+        if crashed:
+            self.rollups.rebuild(self.tasks.values())
+        self._session = open(self.session_file, 'w', encoding='utf-8')
+        self._session.write(json.dumps({
+            'pid': os.getpid(),
+            'started': datetime.now().isoformat(timespec='seconds')
+        }))
+        self._session.flush()
+        lock_file(self._session)
+        return crashed
+
+    def set_categories(self, categories):
+        """Replace the project categories and recompile the keyword matcher"""
+        self.project_categories = categories
+        self.matcher = KeywordMatcher(categories)
+
+    def suggest_projects(self, text):
+        """Return the projects whose keywords appear in text, best match first"""
+        return self.matcher.match(text)
+
+    def suggest_project(self, text):
+        """Return the best matching project, or "Other" if nothing matches"""
+        matches = self.matcher.match(text)
+        return matches[0] if matches else "Other"
+
+    def start_task(self, task, start_time, project, date=None):
+        """Begin timing a task at start_time on date (default today)"""
+        if self.current_task:
+            raise TrackerError(f"A task is already in progress: {self.current_task}\n"
+                               f"Please complete it first!")
+        if not task:
+            raise TrackerError("Please enter a task description!")
+        if not start_time:
+            raise TrackerError("Please enter start time!")
+        if not project:
+            raise TrackerError("Please select a Project ID!")
+        day = parse_date(date) if date else datetime.now().date()
+        start = day_start(day) + parse_clock(start_time)
+
+        self.current_task = task
+        self.current_start = start
+        self.current_project = project
+        self.persist('set_current', self.current_task_data())
+
+    def new_task(self, project, task, start, end):
+        """Build a completed task record from start and end timestamps"""
+        return Task(new_task_id(), task, project, task_category(task), start, end,
+                    (end - start) // 60)
+
+    def add_task(self, task_info):
+        """Store a completed task record"""
+        self.tasks[task_info.task_id] = task_info
+        self._index(task_info)
+        self.persist('add_task', task_info)
+        return task_info
+
+    def complete_task(self, end_time=None):
+        """Finish the task in progress and return its record
+
+        end_time is a time on the day the task started (or the day after, if
+        it is earlier than the start); without one the task ends now.
+        """
+        if not self.current_task:
+            raise TrackerError("No task is currently running!")
+        start = self.current_start
+        if end_time:
+            end = day_start(timestamp_day(start)) + parse_clock(end_time)
+            if end < start:
+                end += DAY_SECONDS
+        else:
+            end = max(now_timestamp(), start)
+
+        task_info = self.add_task(self.new_task(self.current_project, self.current_task,
+                                                start, end))
+
+        # Reset current task
+        self.current_task = None
+        self.current_start = None
+        self.current_project = None
+        self.persist('set_current', {})
+        return task_info
+
+    def log_task(self, task, project, start_time, end_time, date=None):
+        """Record a finished task without timing it"""
+        if not task:
+            raise TrackerError("Please enter a task description!")
+        day = parse_date(date) if date else datetime.now().date()
+        start, end = span(day, start_time, end_time)
+        project = project or self.suggest_project(task)
+        return self.add_task(self.new_task(project, task, start, end))
+
+    def edit_task(self, task_id, task, project, start_time, end_time):
+        """Change a completed task, keeping its date, and return it
+
+        An archived task is changed by rewriting its month's segment.
+        """
+        record = self.tasks.get(task_id)
+        archived = None
+        if record is None:
+            archived = self._find_archived([task_id]).get(task_id)
+            if archived is None:
+                raise TrackerError("Task not found")
+            record = archived[1]
+        day = task_day(record) or datetime.now().date()
+        try:
+            start, end = span(day, start_time, end_time)
+        except TrackerError as e:
+            raise TrackerError(f"Invalid time format: {str(e)}")
+
+        if archived is not None:
+            data = record.to_dict()
+            data.update(task=task, project_id=project, start=start, end=end,
+                        minutes_worked=(end - start) // 60)
+            # The date is kept, so the task stays in the same segment
+            self.archive.add({archived[0]: [data]})
+            return Task.from_dict(data)
+        self._unindex(record)
+        record.task = intern_text(task)
+        record.project_id = intern_text(project)
+        record.start = start
+        record.end = end
+        record.minutes_worked = (end - start) // 60
+        self._index(record)
+        self.persist('update_task', record)
+        return record
+
+    def delete_tasks(self, task_ids):
+        """Delete tasks by id and return the ids that existed
+
+        Archived tasks are removed from their months' segments.
+        """
+        deleted = []
+        missing = []
+        with self.batch():
+            for task_id in task_ids:
+                task = self.tasks.pop(task_id, None)
+                if task is not None:
+                    self._unindex(task)
+                    self.persist('delete_task', task_id)
+                    deleted.append(task_id)
+                    if self.archives_pending:
+                        self.archive_deletions.add(task_id)
+                else:
+                    missing.append(task_id)
+        if missing:
+            by_month = {}
+            for task_id, (month, _) in self._find_archived(missing).items():
+                by_month.setdefault(month, []).append(task_id)
+                deleted.append(task_id)
+            if by_month:
+                self.archive.discard(by_month)
+        return deleted
+
+    def _find_archived(self, task_ids):
+        """{task_id: (month, task)} for the given ids found in the archive
+
+        Months are searched newest first, through the segment cache, until
+        every id is found.
+        """
+        wanted = set(task_ids)
+        found = {}
+        for month in reversed(self.archive.months()):
+            for task in self.archive.read(month):
+                if task.task_id in wanted:
+                    found[task.task_id] = (month, task)
+                    wanted.discard(task.task_id)
+            if not wanted:
+                break
+        return found
+
+    def clear(self):
+        """Remove every task, archived ones and the one in progress included"""
+        self.archive.clear()
+        self.tasks = {}
+        self.rollups.clear()
+        self.task_version += 1
+        if self.search_index is not None:
+            self.search_index.clear()
+        self.current_task = None
+        self.current_start = None
+        self.current_project = None
+        self.persist('clear')
+
+    def iter_tasks(self, start=None, end=None, project=None, archived=False):
+        """Lazily yield tasks in a date range and/or for one project
+
+        Archived months are read when the range reaches back into them, or
+        with archived=True also for a range with no dates (e.g. a report of
+        the whole history).
+        """
+        tasks = self._live_tasks(start, end, project)
+        months = self._archived_months(start, end, archived)
+        if months:
+            tasks = chain(self._archived_tasks(months), tasks)
+        return filter_tasks(tasks, start, end, project)
+
+    def _live_tasks(self, start=None, end=None, project=None):
+        """Tasks in the store, narrowed by its indexes where it has them
+
+        The store only knows about flushed changes, so with changes queued
+        every task is returned for filter_tasks to check. The result may
+        still include tasks outside the filter (e.g. edited by another
+        process and not merged yet); callers filter it again.
+        """
+        if (start or end or project) and not self.pending:
+            task_ids = self.store.query(*date_bounds(start, end), project)
+            if task_ids is not None:
+                tasks = self.tasks
+                return [tasks[task_id] for task_id in task_ids if task_id in tasks]
+        return self.tasks.values()
+
+    def _archived_months(self, start, end, everything=False):
+        """Archived months overlapping a date range
+
+        A range with no dates at all only reaches the archive with everything.
+        """
+        if start is None and end is None and not everything:
+            return []
+        low = start.strftime("%Y_%m") if start else None
+        high = end.strftime("%Y_%m") if end else None
+        return [month for month in self.archive.months()
+                if (low is None or month >= low) and (high is None or month <= high)]
+
+    def _archived_tasks(self, months):
+        # The live copy of a task wins over an archived one
+        for month in months:
+            for task in self.archive.read(month):
+                if task.task_id not in self.tasks:
+                    yield task
+
+    def search(self, query, start=None, end=None, project=None, archived=False):
+        """Return the tasks matching a search query, date range and project
+
+        See tracker_search for the query syntax. Without a query this is
+        every task in the date range and project. Archived months are
+        searched, without an index, as in iter_tasks.
+        """
+        tasks = self._search_live(query, start, end, project)
+        months = self._archived_months(start, end, archived)
+        if not months:
+            return tasks
+        matches = self._archived_matches(self._archived_tasks(months), query, start, end,
+                                         project)
+        return list(matches) + tasks
+
+    def _search_live(self, query, start, end, project):
+        if not has_terms(query):
+            return list(filter_tasks(self._live_tasks(start, end, project), start, end,
+                                     project))
+        if self.search_index is None:
+            self.search_index = SearchIndex(self.tasks.values())
+        ids = self.search_index.search(query)
+        if len(ids) * 8 > len(self.tasks):
+            # Most tasks match: walking them in order beats sorting the ids
+            tasks = [task for task in self.tasks.values() if task.task_id in ids]
+        else:
+            tasks = self.search_index.in_order(ids)
+        return list(filter_tasks(tasks, start, end, project))
+
+    @staticmethod
+    def _archived_matches(tasks, query, start, end, project):
+        if has_terms(query):
+            tasks = (task for task in tasks if task_matches_query(task, query))
+        return filter_tasks(tasks, start, end, project)
+
+    def report_tasks(self, query='', start=None, end=None, project=None):
+        """Return (tasks, rows) for a report of a search over the whole history
+
+        The matching tasks in the store are copied here, but archived months
+        are only read, without the segment cache, as tasks is iterated, so
+        the report can be written on another thread without this one
+        decompressing anything. rows counts the store's matches plus every
+        task of those months, for progress; it is 0 only if nothing matches.
+        """
+        tasks = self._search_live(query, start, end, project)
+        months = self._archived_months(start, end, everything=True)
+        if not months:
+            return tasks, len(tasks)
+        archive_index = self.archive.index()
+        rows = len(tasks) + sum(archive_index.get(month, {}).get('task_count', 0)
+                                for month in months)
+        # The live copy of a task wins over an archived one
+        task_ids = set(self.tasks)
+        records = self.archive.records(months)
+        archived = (Task.from_dict(record) for record in records
+                    if record['task_id'] not in task_ids)
+        return chain(self._archived_matches(archived, query, start, end, project), tasks), rows
+
+    def prepare_search_index(self):
+        """Return a builder for the search index, or None if it is built
+
+        The builder may run on a worker thread; pass its result to
+        finish_search_index() on the tracker's thread. If tasks changed in
+        the meantime the index is dropped and the first search builds it.
+        """
+        if self.search_index is not None:
+            return None
+        tasks = list(self.tasks.values())
+        version = self.task_version
+        return lambda: (version, SearchIndex(tasks))
+
+    def finish_search_index(self, built):
+        """Install an index from prepare_search_index(); return whether it was current"""
+        version, index = built
+        if self.search_index is None and version == self.task_version:
+            self.search_index = index
+        return self.search_index is index
+
+    def has_tasks(self):
+        """Whether any task is stored, counting the archive"""
+        return bool(self.tasks) or bool(self.archive.months())
+
+    def all_rollups(self):
+        """Totals over the task store plus everything archived"""
+        rollups = Rollups(lambda task: task.minutes_worked, task_day, task_digest)
+        rollups.update(self.rollups.to_dict())
+        for totals in self.archive.index().values():
+            rollups.update(totals)
+        return rollups
+
+    def prepare_archive(self, months=None):
+        """Return a writer that archives tasks older than the active period, or None
+
+        The active period is the current month and the ones before it,
+        months (default archive_months) in all; 0 archives nothing. As with
+        a compaction, the writer does the slow part (compressing and
+        fsyncing the monthly segments) and may run on a worker thread; pass
+        its result to finish_archive() on the tracker's thread, or call
+        end_archive() there if it fails.
+        """
+        months = self.archive_months if months is None else months
+        if not months:
+            return None
+        cutoff = archive_cutoff(months)
+        by_month = {}
+        for task in self.tasks.values():
+            if task.start is not None and task.start < cutoff:
+                by_month.setdefault(month_key(task.start), []).append(task.to_dict())
+        if not by_month:
+            return None
+
+        def write_segments():
+            self.archive.add(by_month)
+            return by_month
+
+        self.archives_pending += 1
+        return write_segments
+
+    def finish_archive(self, by_month):
+        """Remove archived tasks from the store and return their ids
+
+        A task edited while the segments were written stays in the store,
+        where it takes precedence, until the next run archives it again; one
+        deleted here meanwhile is taken back out of the archive. A task that
+        is gone because another run or instance archived it stays archived.
+        """
+        try:
+            archived = []
+            gone = {}
+            for month, records in by_month.items():
+                for record in records:
+                    task = self.tasks.get(record['task_id'])
+                    if task is None:
+                        if record['task_id'] in self.archive_deletions:
+                            gone.setdefault(month, []).append(record['task_id'])
+                    elif task.to_dict() == record:
+                        del self.tasks[task.task_id]
+                        self._unindex(task)
+                        archived.append(task.task_id)
+            if gone:
+                self.archive.discard(gone)
+            if archived:
+                # One change, however many tasks, so it is written at once
+                self.persist('delete_tasks', archived)
+            return archived
+        finally:
+            self.end_archive()
+
+    def end_archive(self):
+        """Note that a run from prepare_archive() finished, or failed to write"""
+        self.archives_pending -= 1
+        if not self.archives_pending:
+            self.archive_deletions.clear()
+
+    def archive_old_tasks(self, months=None):
+        """Move tasks older than the active period into the archive; return their ids"""
+        write_segments = self.prepare_archive(months)
+        if write_segments is None:
+            return []
+        try:
+            written = write_segments()
+        except BaseException:
+            self.end_archive()
+            raise
+        return self.finish_archive(written)
+
+    def export_report(self, filename=None, start=None, end=None, project=None,
+                      progress=None, cancel=None, report_format=None):
+        """Write a work summary and return (filename, row count)
+
+        report_format is one of REPORT_FORMATS; by default it follows the
+        extension of filename, and is an Excel workbook otherwise. The
+        archive is included, so without a date range this is the whole
+        history.
+        """
+        # openpyxl is only loaded when a report is actually written
+        from tracker_reports import report_writer
+        report_format = report_format or guess_report_format(filename)
+        writer = report_writer(report_format)
+        filename = filename or report_filename(report_format=report_format)
+        count = writer(filename, self.iter_tasks(start, end, project, archived=True),
+                       progress, cancel)
+        return filename, count
+
+    def report_dir(self):
+        """Default directory for the per-month work summaries"""
+        return self.data_dir / "reports"
+
+    def export_period_reports(self, directory=None, progress=None, cancel=None):
+        """Bring the per-month workbooks in directory up to date
+
+        Only months whose tasks changed since the last run are written; see
+        tracker_reports.write_period_reports. Returns [(filename, rows)].
+        """
+        from tracker_reports import write_period_reports
+        directory = directory or self.report_dir()
+        prefix = f"{report_user()}_Work_Summary"
+        digests, tasks, keep, _ = self.period_reports(directory, prefix)
+        return write_period_reports(directory, tasks, progress, cancel, digests=digests,
+                                    prefix=prefix, keep=keep)
+
+    def period_reports(self, directory, prefix):
+        """Return (digests, tasks by month, keep, rows) for write_period_reports
+
+        The month fingerprints of the store and of the archive index are
+        kept up to date as tasks change, so only the months whose workbook
+        in directory is out of date have their tasks collected. Their store
+        tasks are copied here; archived ones are read from the segment when
+        the workbook is written, which may be on another thread. keep lists
+        archived months without a fingerprint (archived by an older
+        version), whose workbooks are left alone. rows is the number of
+        tasks to be written, for progress.
+        """
+        from tracker_reports import stale_periods
+        archive_index = self.archive.index()
+        digests = dict(self.all_rollups().month_digests)
+        stale = stale_periods(directory, digests, prefix)
+        tasks = self._tasks_by_month(stale)
+        rows = sum(len(month_tasks) for month_tasks in tasks.values())
+        for month, month_tasks in tasks.items():
+            if month in archive_index:
+                rows += archive_index[month].get('task_count', 0)
+                tasks[month] = self._segment_tasks(month, month_tasks)
+        keep = [month for month in self.archive.months() if month not in digests]
+        return digests, tasks, keep, rows
+
+    def _segment_tasks(self, month, tasks):
+        """Yield a month's archived tasks, read without the cache, then tasks
+
+        As in _archived_tasks, a task in tasks wins over its archived copy.
+        """
+        task_ids = {task.task_id for task in tasks}
+        for record in self.archive.records([month]):
+            if record['task_id'] not in task_ids:
+                yield Task.from_dict(record)
+        yield from tasks
+
+    def _tasks_by_month(self, months):
+        """Live tasks of the given months ('YYYY_MM' or 'undated'), in one pass"""
+        by_month = {month: [] for month in months}
+        if not by_month:
+            return by_month
+        undated = by_month.get("undated")
+        dated = sorted(month for month in by_month if month != "undated")
+        bounds = [month_bounds(month) for month in dated]
+        lows = [low for low, _ in bounds]
+        for task in self.tasks.values():
+            start = task.start
+            if start is None:
+                if undated is not None:
+                    undated.append(task)
+                continue
+            index = bisect_right(lows, start) - 1
+            if index >= 0 and start < bounds[index][1]:
+                by_month[dated[index]].append(task)
+        return by_month
+
+    def add_tasks(self, tasks):
+        """Store many completed tasks as a single change"""
+        for task_info in tasks:
+            self.tasks[task_info.task_id] = task_info
+            self._index(task_info)
+        self.persist('add_tasks', tasks)
+
+    def import_tasks(self, path, dry_run=False):
+        """Merge completed tasks from a file or another data directory
+
+        path is a data directory, a tasks.json file, or a CSV, Excel or
+        iCalendar file (see tracker_import). Tasks whose id is already known
+        are skipped, and the new ones are stored as one change. With dry_run
+        nothing is stored. Returns a tracker_import.ImportResult.
+        """
+        from tracker_import import ImportResult, read_tasks
+        path = Path(path)
+        result = ImportResult(path, dry_run)
+        if path.is_dir() or path.suffix.lower() == '.json':
+            rows = ((None, Task.from_dict(record), None) for record in self._read_records(path))
+        else:
+            rows = read_tasks(path, self.suggest_project)
+        seen = set()
+        for location, task_info, reason in rows:
+            if task_info is None:
+                result.rejects.append((location, reason))
+            elif task_info.task_id in self.tasks or task_info.task_id in seen:
+                result.duplicates += 1
+            else:
+                seen.add(task_info.task_id)
+                result.tasks.append(task_info)
+        self._drop_archived(result)
+        if result.tasks and not dry_run:
+            self.add_tasks(result.tasks)
+        return result
+
+    def _drop_archived(self, result):
+        """Count imported tasks that are already archived as duplicates"""
+        archived = set(self.archive.months())
+        months = {month_key(task.start) for task in result.tasks
+                  if task.start is not None} & archived
+        if not months:
+            return
+        known = {task.task_id for month in months for task in self.archive.read(month)}
+        tasks = [task for task in result.tasks if task.task_id not in known]
+        result.duplicates += len(result.tasks) - len(tasks)
+        result.tasks = tasks
+
+    def _read_records(self, path):
+        """Normalized task records from a data directory or tasks.json file
+
+        The source is only read: a data directory is not locked, migrated or
+        compacted. Tasks saved without an id get one from their content, so
+        importing the same source twice does not duplicate them.
+        """
+        from tracker_consolidate import content_task_id
+        if path.is_dir():
+            tasks, _ = read_data_dir(path)
+            tasks.extend(Archive(path / ARCHIVE_DIR).records())
+        else:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            tasks = data.get('completed_tasks', []) if isinstance(data, dict) else data
+        for record in tasks:
+            normalize_task(record)
+            if not record.get('task_id'):
+                record['task_id'] = content_task_id('', record)
+        return tasks
+
+    def close(self):
+        """Flush queued changes and end the session"""
+        try:
+            self.flush()
+            self.rollups.save(self.rollups_file)
+        finally:
+            self.store.close()
+            self.archive.close()
+        if self._session is not None:
+            # Closing the marker releases its lock
+            self._session.close()
+            self.session_file.unlink(missing_ok=True)
+            self._session = None
@@ -0,0 +1,305 @@
+"""Bulk import of task histories from CSV, Excel and iCalendar files
+
+Rows are streamed (the csv module, openpyxl's read-only mode and a
+line-by-line iCalendar reader) and checked one at a time, so a large file
+is never held in memory as cells. Accepted rows become tasks; rows that
+cannot be read are kept as rejects with the reason. TaskTracker.import_tasks
+then stores every new task as one change, i.e. a single journal write or
+SQLite transaction however many rows there are.
+
+Columns are matched by header, case-insensitively: the work summary headers
+(Date, Project ID, Start Time, ...) plus common names such as Task,
+Description, Project, Start, End and Minutes. Rows without a project get
+one suggested from their description, like tasks typed into the tracker.
+"""
+import csv
+import re
+from datetime import date, datetime, time, timedelta, timezone
+from functools import lru_cache
+
+from tracker_consolidate import WORKBOOK_FIELDS, content_task_id
+from tracker_core import (DAY_SECONDS, EPOCH, Task, TrackerError, day_start, parse_clock,
+                          task_category)
+
+# Lower-case column headers mapped to task fields
+COLUMN_FIELDS = {name.lower(): field for name, field in WORKBOOK_FIELDS.items()}
+COLUMN_FIELDS.update({
+    'task': 'task',
+    'description': 'task',
+    'summary': 'task',
+    'subject': 'task',
+    'project': 'project_id',
+    'category': 'category',
+    'start': 'start_time',
+    'end': 'end_time',
+    'minutes': 'minutes_worked',
+    'duration (minutes)': 'minutes_worked',
+    'breaks': 'breaks',
+})
+
+# Date formats accepted in text cells
+DATE_FORMATS = ("%m/%d/%Y", "%Y-%m-%d")
+
+# iCalendar DURATION values such as PT1H30M or P1DT2H
+ICS_DURATION = re.compile(r"P(?:(\d+)W)?(?:(\d+)D)?(?:T(?:(\d+)H)?(?:(\d+)M)?(?:(\d+)S)?)?$")
+
+class ImportResult:
+    """Outcome of importing one file
+
+    tasks are the new tasks (stored unless dry_run), duplicates counts rows
+    whose task was already known, and rejects lists (location, reason) for
+    rows that could not be read.
+    """
+
+    def __init__(self, path, dry_run=False):
+        self.path = path
+        self.dry_run = dry_run
+        self.tasks = []
+        self.duplicates = 0
+        self.rejects = []
+
+    @property
+    def imported(self):
+        return len(self.tasks)
+
+    def __repr__(self):
+        return (f"ImportResult({str(self.path)!r}, imported={self.imported}, "
+                f"duplicates={self.duplicates}, rejects={len(self.rejects)})")
+
+
+def _text(value):
+    if value is None:
+        return ''
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value).strip()
+
+
+def _fields(header):
+    return [COLUMN_FIELDS.get(_text(name).lower()) for name in header]
+
+
+def iter_csv(path):
+    """Yield (location, record) for each non-empty row of a CSV file"""
+    with open(path, 'r', encoding='utf-8-sig', newline='') as f:
+        reader = csv.reader(f)
+        fields = _fields(next(reader, ()))
+        for row in reader:
+            if any(value.strip() for value in row):
+                yield f"line {reader.line_num}", {
+                    field: value for field, value in zip(fields, row) if field}
+
+
+def iter_workbook(path):
+    """Yield (location, record) for each non-empty row of a workbook's first sheet"""
+    import openpyxl
+
+    wb = openpyxl.load_workbook(path, read_only=True)
+    try:
+        rows = wb.worksheets[0].iter_rows(values_only=True)
+        fields = _fields(next(rows, ()))
+        for number, row in enumerate(rows, start=2):
+            if any(value not in (None, '') for value in row):
+                yield f"row {number}", {
+                    field: value for field, value in zip(fields, row) if field}
+    finally:
+        wb.close()
+
+
+def _ics_lines(f):
+    """Unfold iCalendar content lines (continuations start with a space or tab)"""
+    line = None
+    for raw in f:
+        raw = raw.rstrip('\r\n')
+        if raw[:1] in (' ', '\t') and line is not None:
+            line += raw[1:]
+            continue
+        if line is not None:
+            yield line
+        line = raw
+    if line is not None:
+        yield line
+
+
+def _ics_text(value):
+    return re.sub(r"\\([\\;,nN])",
+                  lambda m: '\n' if m.group(1) in 'nN' else m.group(1), value).strip()
+
+
+def _ics_moment(params, value):
+    """Local wall-clock datetime of a DTSTART/DTEND value, or a date if all-day"""
+    if 'VALUE=DATE' in params or len(value) == 8:
+        return datetime.strptime(value, "%Y%m%d").date()
+    moment = datetime.strptime(value.rstrip('Z'), "%Y%m%dT%H%M%S")
+    if value.endswith('Z'):
+        return moment.replace(tzinfo=timezone.utc).astimezone().replace(tzinfo=None)
+    tzid = next((param[5:] for param in params if param.startswith('TZID=')), None)
+    if tzid:
+        try:
+            from zoneinfo import ZoneInfo
+            return moment.replace(tzinfo=ZoneInfo(tzid.strip('"'))).astimezone().replace(
+                tzinfo=None)
+        except (ImportError, KeyError, ValueError):
+            # Unknown zone: take the time as local
+            pass
+    return moment
+
+
+def _ics_duration(value):
+    match = ICS_DURATION.match(value.lstrip('+'))
+    if not match or not any(match.groups()):
+        raise TrackerError(f"Invalid duration: {value}")
+    weeks, days, hours, minutes, seconds = (int(part or 0) for part in match.groups())
+    return timedelta(weeks=weeks, days=days, hours=hours, minutes=minutes, seconds=seconds)
+
+
+def iter_calendar(path):
+    """Yield (location, record) for each event of an iCalendar (.ics) file"""
+    with open(path, 'r', encoding='utf-8-sig') as f:
+        event = None
+        for number, line in enumerate(_ics_lines(f), start=1):
+            name, _, value = line.partition(':')
+            name, *params = name.split(';')
+            name = name.upper()
+            if name == 'BEGIN' and value.upper() == 'VEVENT':
+                event, location, error = {}, f"event at line {number}", None
+            elif event is None:
+                continue
+            elif name == 'END' and value.upper() == 'VEVENT':
+                if error:
+                    event['error'] = error
+                yield location, event
+                event = None
+            else:
+                try:
+                    if name == 'SUMMARY':
+                        event['task'] = _ics_text(value)
+                    elif name == 'CATEGORIES':
+                        event['project_id'] = _ics_text(value.split(',')[0])
+                    elif name == 'DTSTART':
+                        event['start_at'] = _ics_moment(params, value)
+                    elif name == 'DTEND':
+                        event['end_at'] = _ics_moment(params, value)
+                    elif name == 'DURATION':
+                        event['duration'] = _ics_duration(value)
+                except ValueError as e:
+                    error = f"{name}: {e}"
+
+
+def read_rows(path):
+    """Yield (location, record) from a CSV, Excel or iCalendar file"""
+    suffix = path.suffix.lower()
+    if suffix == '.csv':
+        return iter_csv(path)
+    if suffix in ('.xlsx', '.xlsm'):
+        return iter_workbook(path)
+    if suffix == '.ics':
+        return iter_calendar(path)
+    raise TrackerError(f"Cannot import {path.name}: use CSV, XLSX, ICS or tasks.json")
+
+
+def _date(value):
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return _parse_date(_text(value))
+
+
+@lru_cache(maxsize=4096)
+def _parse_date(text):
+    # A history has many rows per day, so each date string is parsed once
+    for date_format in DATE_FORMATS:
+        try:
+            return datetime.strptime(text, date_format).date()
+        except ValueError:
+            pass
+    raise TrackerError(f"Invalid date: {text or 'missing'}")
+
+
+def _clock(value):
+    """Seconds after midnight of a time cell"""
+    if isinstance(value, (datetime, time)):
+        return value.hour * 3600 + value.minute * 60 + value.second
+    if isinstance(value, float) and 0 <= value < 1:
+        # Excel stores times as a fraction of a day
+        return round(value * DAY_SECONDS)
+    return parse_clock(_text(value))
+
+
+def _timestamp(moment):
+    return int((moment - EPOCH).total_seconds())
+
+
+def _span(record):
+    """Return (start, end) timestamps for a row"""
+    start_at = record.get('start_at')
+    if start_at is not None:
+        # iCalendar event
+        if not isinstance(start_at, datetime):
+            raise TrackerError("All-day event")
+        end_at = record.get('end_at')
+        if end_at is None and record.get('duration') is not None:
+            end_at = start_at + record['duration']
+        if not isinstance(end_at, datetime):
+            raise TrackerError("No end time")
+        start, end = _timestamp(start_at), _timestamp(end_at)
+        if end < start:
+            raise TrackerError("Ends before it starts")
+        return start, end
+
+    start_value = record.get('start_time')
+    if isinstance(start_value, datetime) and not _text(record.get('date')):
+        day = start_value.date()
+    else:
+        day = _date(record.get('date'))
+    start = day_start(day) + _clock(start_value)
+    if _text(record.get('end_time')):
+        end = day_start(day) + _clock(record['end_time'])
+        if end < start:
+            end += DAY_SECONDS
+        return start, end
+    minutes = _text(record.get('minutes_worked'))
+    if not minutes:
+        raise TrackerError("No end time or minutes worked")
+    try:
+        minutes = int(minutes)
+    except ValueError:
+        raise TrackerError(f"Invalid minutes worked: {minutes}")
+    if minutes < 0:
+        raise TrackerError(f"Invalid minutes worked: {minutes}")
+    return start, start + minutes * 60
+
+
+def row_task(record, suggest_project):
+    """Build a Task from an imported row, raising TrackerError if it is invalid"""
+    if record.get('error'):
+        raise TrackerError(record['error'])
+    start, end = _span(record)
+    text = _text(record.get('task'))
+    data = {
+        'task_id': _text(record.get('task_id')),
+        'task': text,
+        'project_id': _text(record.get('project_id')) or suggest_project(text),
+        'category': _text(record.get('category')) or task_category(text),
+        'start': start,
+        'end': end,
+        'minutes_worked': (end - start) // 60,
+        'breaks': _text(record.get('breaks')),
+        'faculty_student_staff': _text(record.get('faculty_student_staff')),
+    }
+    # Rows without an id get one from their content, so importing the same
+    # file twice does not duplicate them
+    data['task_id'] = data['task_id'] or content_task_id('', data)
+    return Task.from_dict(data)
+
+
+def read_tasks(path, suggest_project):
+    """Yield (location, task or None, reason) for each row of a file"""
+    # Descriptions repeat a lot in a long history; match each one once
+    suggest_project = lru_cache(maxsize=4096)(suggest_project)
+    for location, record in read_rows(path):
+        try:
+            yield location, row_task(record, suggest_project), None
+        except TrackerError as e:
+            yield location, None, str(e)
@@ -0,0 +1,204 @@
+"""Opt-in instrumentation: action latencies, I/O counters and profiling
+
+Everything here is off unless WORK_TRACKER_METRICS is set or the GUI's
+Diagnostics menu turns it on. While off, an instrumented call costs one
+attribute check, so the hooks can stay in place permanently.
+
+    WORK_TRACKER_METRICS=1   record latencies, I/O and Tk stalls
+    WORK_TRACKER_PROFILE=1   also capture cProfile and tracemalloc from startup
+"""
+import bisect
+import functools
+import json
+import os
+import time
+from datetime import datetime
+
+# Upper bounds of the latency histogram buckets, in milliseconds
+BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, float('inf'))
+
+# Rotating metrics log: size per file and number of old files kept
+LOG_MAX_BYTES = 1024 * 1024
+LOG_BACKUPS = 3
+
+
+def env_flag(name):
+    return os.environ.get(name, '').lower() not in ('', '0', 'false', 'no')
+
+
+class Histogram:
+    """Latency counts per bucket plus count, total and maximum"""
+
+    def __init__(self):
+        self.buckets = [0] * len(BUCKETS_MS)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, ms):
+        self.buckets[bisect.bisect_left(BUCKETS_MS, ms)] += 1
+        self.count += 1
+        self.total += ms
+        self.max = max(self.max, ms)
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else 0.0
+
+    def percentile(self, fraction):
+        """Upper bound of the bucket holding the given fraction of samples"""
+        wanted = fraction * self.count
+        seen = 0
+        for bound, count in zip(BUCKETS_MS, self.buckets):
+            seen += count
+            if count and seen >= wanted:
+                return min(bound, self.max)
+        return 0.0
+
+
+class Metrics:
+    """Latency histograms per action, I/O counters and event-loop stalls"""
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.reset()
+        self.log = None
+        self.profiler = None
+
+    def reset(self):
+        self.actions = {}
+        self.io = {}
+        self.stalls = Histogram()
+        self.started = time.time()
+        # Action running when a stall ends, to say what blocked the loop
+        self.current_action = None
+
+    def open_log(self, path):
+        """Also write every sample as a JSON line to a rotating log at path"""
+        # Imported here so startup does not pay for them while metrics are off
+        import logging
+        from logging.handlers import RotatingFileHandler
+
+        logger = logging.getLogger("work_tracker.metrics")
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+        handler = RotatingFileHandler(path, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUPS,
+                                      encoding='utf-8')
+        logger.addHandler(handler)
+        self.log = logger
+
+    def close_log(self):
+        if self.log is not None:
+            self._log('summary', **self.summary())
+            for handler in list(self.log.handlers):
+                handler.close()
+                self.log.removeHandler(handler)
+            self.log = None
+
+    def _log(self, kind, **fields):
+        if self.log is not None:
+            self.log.info(json.dumps(dict(fields, kind=kind,
+                                          at=datetime.now().isoformat(timespec='milliseconds'))))
+
+    def record(self, name, seconds):
+        ms = seconds * 1000
+        histogram = self.actions.get(name)
+        if histogram is None:
+            histogram = self.actions[name] = Histogram()
+        histogram.add(ms)
+        self._log('action', name=name, ms=round(ms, 3))
+
+    def record_io(self, kind, nbytes):
+        counter = self.io.setdefault(kind, [0, 0])
+        counter[0] += 1
+        counter[1] += nbytes
+
+    def record_stall(self, seconds):
+        ms = seconds * 1000
+        self.stalls.add(ms)
+        self._log('stall', ms=round(ms, 1), during=self.current_action)
+
+    def record_startup(self, **times):
+        self._log('startup', **times)
+
+    def timed(self, name, func):
+        """Wrap func so each call is timed under name while enabled"""
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not self.enabled:
+                return func(*args, **kwargs)
+            outer = self.current_action
+            self.current_action = name
+            started = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self.record(name, time.perf_counter() - started)
+                self.current_action = outer
+        return wrapper
+
+    def instrument(self, obj, names, prefix=''):
+        """Replace obj's methods with timed wrappers on the instance"""
+        for name in names:
+            setattr(obj, name, self.timed(prefix + name, getattr(obj, name)))
+
+    def summary(self):
+        """Plain data for the diagnostics window and the log"""
+        return {
+            'since': datetime.fromtimestamp(self.started).isoformat(timespec='seconds'),
+            'actions': {
+                name: {'count': h.count, 'mean_ms': round(h.mean, 2),
+                       'p50_ms': round(h.percentile(0.5), 2),
+                       'p95_ms': round(h.percentile(0.95), 2),
+                       'max_ms': round(h.max, 2)}
+                for name, h in sorted(self.actions.items())
+            },
+            'io': {kind: {'count': count, 'bytes': nbytes}
+                   for kind, (count, nbytes) in sorted(self.io.items())},
+            'stalls': {'count': self.stalls.count, 'max_ms': round(self.stalls.max, 1)}
+        }
+
+    @property
+    def profiling(self):
+        return self.profiler is not None
+
+    def start_profile(self):
+        """Start a cProfile and tracemalloc capture"""
+        import cProfile
+        import tracemalloc
+
+        if self.profiler is None:
+            self.profiler = cProfile.Profile()
+            tracemalloc.start()
+            self.profiler.enable()
+
+    def stop_profile(self, directory):
+        """Stop the capture and save it in directory; return the files written"""
+        if self.profiler is None:
+            return []
+        import tracemalloc
+
+        profiler, self.profiler = self.profiler, None
+        profiler.disable()
+        snapshot = tracemalloc.take_snapshot()
+        tracemalloc.stop()
+
+        os.makedirs(directory, exist_ok=True)
+        stamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        stats_file = os.path.join(directory, f"profile_{stamp}.prof")
+        profiler.dump_stats(stats_file)
+        memory_file = os.path.join(directory, f"memory_{stamp}.txt")
+        with open(memory_file, 'w', encoding='utf-8') as f:
+            for stat in snapshot.statistics('lineno')[:50]:
+                f.write(f"{stat}\n")
+        return [stats_file, memory_file]
+
+
+# Shared by the core, storage, reports and GUI
+METRICS = Metrics(enabled=env_flag("WORK_TRACKER_METRICS"))
+
+
+def count_io(kind, nbytes):
+    """Count one read or write of nbytes, if instrumentation is on"""
+    if METRICS.enabled:
+        METRICS.record_io(kind, nbytes)
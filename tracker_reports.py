@@ -0,0 +1,443 @@
+import csv
+import json
+import os
+import threading
+from contextlib import contextmanager
+from copy import copy
+from pathlib import Path
+
+import openpyxl
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Alignment, Font, NamedStyle, PatternFill
+from openpyxl.utils import get_column_letter
+
+from tracker_core import REPORT_FORMATS, TrackerError, format_date, format_time, timestamp_day
+from tracker_metrics import count_io
+from tracker_storage import atomic_write
+
+try:
+    import tracker_analytics
+except ImportError:  # NumPy is not installed
+    tracker_analytics = None
+
+# How many rows to write between progress updates and cancellation checks
+PROGRESS_INTERVAL = 500
+
+# Report columns and their widths
+REPORT_COLUMNS = [
+    ('Date', 12),
+    ('Project ID', 20),
+    ('Task ID', 15),
+    ('Faculty Student or Staff', 25),
+    ('Administrative Task or Other', 25),
+    ('Start Time', 15),
+    ('Breaks (minutes)', 15),
+    ('End Time', 15),
+    ('Minutes Worked', 15)
+]
+
+# Rows per Parquet row group
+PARQUET_BATCH_ROWS = 65536
+
+# Bookkeeping for per-month reports, kept next to the workbooks
+PERIOD_STATE_FILE = ".work_summary_state.json"
+
+# Consolidated team reports lead with the user each task came from
+TEAM_REPORT_COLUMNS = [('User', 15)] + REPORT_COLUMNS
+
+
+def report_row(task):
+    """Values for one report row, in REPORT_COLUMNS order"""
+    return (
+        format_date(task.start),
+        task.project_id,
+        task.task_id,
+        task.faculty_student_staff,
+        task.category,
+        format_time(task.start),
+        task.breaks,
+        format_time(task.end),
+        task.minutes_worked
+    )
+
+
+def _register_styles(wb):
+    """Add the shared header and cell styles to a workbook"""
+    header = NamedStyle(name="report_header")
+    header.font = Font(bold=True)
+    header.fill = PatternFill(start_color="CCE5FF", end_color="CCE5FF", fill_type="solid")
+    header.alignment = Alignment(horizontal="center", wrap_text=True)
+    wb.add_named_style(header)
+
+    cell = NamedStyle(name="report_cell")
+    cell.alignment = Alignment(horizontal="center")
+    wb.add_named_style(cell)
+
+
+class ExportCancelled(Exception):
+    """Raised by an export that was cancelled before it finished"""
+
+
+class _SheetWriter:
+    """Append styled rows to a write-only worksheet
+
+    Each (named style, number format) pair is resolved once on a template
+    cell, and new cells share a copy of its style array.
+    """
+
+    def __init__(self, wb, title, columns):
+        self.ws = wb.create_sheet(title)
+        self.templates = {}
+
+        # Column widths and header height must be set before any rows are written
+        for index, column in enumerate(columns, 1):
+            self.ws.column_dimensions[get_column_letter(index)].width = column[1]
+        self.ws.row_dimensions[1].height = 30
+        self.formats = [column[2] if len(column) > 2 else None for column in columns]
+        self.append([column[0] for column in columns], "report_header")
+
+    def _style_array(self, style, number_format):
+        key = (style, number_format)
+        if key not in self.templates:
+            template = WriteOnlyCell(self.ws)
+            template.style = style
+            if number_format:
+                template.number_format = number_format
+            self.templates[key] = template._style
+        return self.templates[key]
+
+    def append(self, values, style="report_cell"):
+        row = []
+        for value, number_format in zip(values, self.formats):
+            cell = WriteOnlyCell(self.ws, value=value)
+            cell._style = copy(self._style_array(style, number_format))
+            row.append(cell)
+        self.ws.append(row)
+
+    def close(self):
+        self.ws.close()
+
+
+def write_xlsx_report(filename, tasks, progress=None, cancel=None, summaries=True,
+                      users=None):
+    """Stream tasks into a work summary workbook and return the row count
+
+    The workbook is built in openpyxl's write-only mode, so rows are written
+    out as they are produced and tasks may be any iterable, including a
+    generator over a large history. progress(rows_written) is called every
+    PROGRESS_INTERVAL rows; if the cancel event gets set the export stops
+    with ExportCancelled and filename is left untouched.
+
+    With summaries, per-project, category, week, weekday and daily totals
+    from tracker_analytics follow the task rows on their own sheets; they
+    are left out if NumPy is not installed.
+
+    users maps task ids to user names for a team report: rows then start
+    with a User column and the summaries include totals by user.
+    """
+    wb = openpyxl.Workbook(write_only=True)
+    _register_styles(wb)
+    sheet = _SheetWriter(wb, "Sheet", TEAM_REPORT_COLUMNS if users else REPORT_COLUMNS)
+
+    # Only the columns the summaries need are kept, not the tasks, so a
+    # generator over a long history is never held in memory
+    summarize = summaries and tracker_analytics is not None
+    summary_columns = tracker_analytics.ColumnBuilder() if summarize else None
+    # User names are shared strings, so this is a pointer per row
+    task_users = [] if summarize and users else None
+    count = 0
+    for task in tasks:
+        row = report_row(task)
+        if users:
+            row = (users[task.task_id],) + row
+        sheet.append(row)
+        if summary_columns is not None:
+            summary_columns.add(task)
+            if task_users is not None:
+                task_users.append(row[0])
+        count += 1
+        if count % PROGRESS_INTERVAL == 0:
+            if cancel is not None and cancel.is_set():
+                # Finish the sheet's temporary file so nothing is left open
+                sheet.close()
+                raise ExportCancelled(f"Export cancelled after {count} rows")
+            if progress is not None:
+                progress(count)
+    if cancel is not None and cancel.is_set():
+        sheet.close()
+        raise ExportCancelled(f"Export cancelled after {count} rows")
+
+    if summary_columns is not None:
+        for title, columns, rows in tracker_analytics.summary_sheets(summary_columns.build(),
+                                                                     task_users):
+            summary = _SheetWriter(wb, title, columns)
+            for row in rows:
+                summary.append(row)
+
+    # Save next to the target and rename, so a failed save never leaves a
+    # half-written report behind
+    tmp_filename = f"{filename}.tmp"
+    wb.save(tmp_filename)
+    count_io('report', os.path.getsize(tmp_filename))
+    os.replace(tmp_filename, filename)
+    if progress is not None:
+        progress(count)
+    return count
+
+
+class _ReportRows:
+    """Iterate over the report rows of tasks for the streaming writers
+
+    Counts the rows produced, calls progress(rows) every PROGRESS_INTERVAL
+    rows and raises ExportCancelled there once cancel is set.
+    """
+
+    def __init__(self, tasks, progress=None, cancel=None, users=None, row=report_row):
+        self.tasks = tasks
+        self.progress = progress
+        self.cancel = cancel
+        self.users = users
+        self.row = row
+        self.count = 0
+        self.columns = [column[0] for column in
+                        (TEAM_REPORT_COLUMNS if users else REPORT_COLUMNS)]
+
+    def __iter__(self):
+        users, row = self.users, self.row
+        for task in self.tasks:
+            self.count += 1
+            yield (users[task.task_id],) + row(task) if users else row(task)
+            if self.count % PROGRESS_INTERVAL == 0:
+                if self.cancel is not None and self.cancel.is_set():
+                    raise ExportCancelled(f"Export cancelled after {self.count} rows")
+                if self.progress is not None:
+                    self.progress(self.count)
+
+
+@contextmanager
+def _output_file(filename, mode='w', **kwargs):
+    """Write to filename.tmp and move it into place once the block succeeds
+
+    If the block fails (or the export is cancelled) the temporary file is
+    removed and filename is left untouched.
+    """
+    tmp_filename = f"{filename}.tmp"
+    try:
+        with open(tmp_filename, mode, **kwargs) as f:
+            yield f
+    except BaseException:
+        try:
+            os.remove(tmp_filename)
+        except OSError:
+            pass
+        raise
+    count_io('report', os.path.getsize(tmp_filename))
+    os.replace(tmp_filename, filename)
+
+
+def write_csv_report(filename, tasks, progress=None, cancel=None, users=None):
+    """Stream tasks into a CSV work summary and return the row count
+
+    The header and values are the workbook's, so the file can also be
+    imported back. Arguments are as for write_xlsx_report.
+    """
+    rows = _ReportRows(tasks, progress, cancel, users)
+    with _output_file(filename, newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(rows.columns)
+        writer.writerows(rows)
+    if progress is not None:
+        progress(rows.count)
+    return rows.count
+
+
+def write_jsonl_report(filename, tasks, progress=None, cancel=None, users=None):
+    """Stream tasks into a JSON Lines work summary and return the row count
+
+    Each line is an object keyed by the report column names.
+    """
+    rows = _ReportRows(tasks, progress, cancel, users)
+    encode = json.JSONEncoder(ensure_ascii=False, separators=(',', ':')).encode
+    columns = rows.columns
+    with _output_file(filename, encoding='utf-8') as f:
+        f.writelines(encode(dict(zip(columns, row))) + "\n" for row in rows)
+    if progress is not None:
+        progress(rows.count)
+    return rows.count
+
+
+def parquet_row(task):
+    """Report row with the date as a date, for typed Parquet columns"""
+    return (timestamp_day(task.start) if task.start is not None else None,) + report_row(task)[1:]
+
+
+def write_parquet_report(filename, tasks, progress=None, cancel=None, users=None):
+    """Stream tasks into a Parquet work summary and return the row count
+
+    Needs pyarrow. Rows are written in row groups of PARQUET_BATCH_ROWS, so
+    memory stays bounded; Date is a date column and Minutes Worked an
+    integer, the other columns are text as in the workbook.
+    """
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise TrackerError("Parquet reports need pyarrow (pip install pyarrow)")
+
+    rows = _ReportRows(tasks, progress, cancel, users, row=parquet_row)
+    types = {'Date': pa.date32(), 'Minutes Worked': pa.int64()}
+    schema = pa.schema([(name, types.get(name, pa.string())) for name in rows.columns])
+
+    def write_batch(writer, batch):
+        columns = zip(*batch)
+        writer.write_batch(pa.record_batch(
+            [pa.array(column, type=field.type) for column, field in zip(columns, schema)],
+            schema=schema))
+
+    with _output_file(filename, 'wb') as f:
+        with pq.ParquetWriter(f, schema) as writer:
+            batch = []
+            for row in rows:
+                batch.append(row)
+                if len(batch) == PARQUET_BATCH_ROWS:
+                    write_batch(writer, batch)
+                    batch = []
+            if batch:
+                write_batch(writer, batch)
+    if progress is not None:
+        progress(rows.count)
+    return rows.count
+
+
+# Writer for each report format; all take (filename, tasks, progress, cancel, users)
+REPORT_WRITERS = {
+    'xlsx': write_xlsx_report,
+    'csv': write_csv_report,
+    'jsonl': write_jsonl_report,
+    'parquet': write_parquet_report,
+}
+
+
+def report_writer(report_format):
+    """Writer function for a report format, e.g. 'csv'"""
+    try:
+        return REPORT_WRITERS[report_format]
+    except KeyError:
+        raise TrackerError(f"Unknown report format: {report_format} "
+                           f"(use {', '.join(REPORT_FORMATS)})")
+
+
+def period_filename(prefix, period):
+    """Workbook name of one month in per-period reports"""
+    return f"{prefix}_{period}.xlsx"
+
+
+def period_digest(digest):
+    """A month fingerprint (see Rollups) as saved in the period state"""
+    return format(digest, '032x')
+
+
+def _load_period_state(state_file):
+    try:
+        with open(state_file, 'r', encoding='utf-8') as f:
+            return json.load(f).get('periods', {})
+    except (OSError, ValueError):
+        return {}
+
+
+def stale_periods(directory, digests, prefix="Work_Summary"):
+    """Months in digests whose workbook is missing or was written for other tasks"""
+    directory = Path(directory)
+    state = _load_period_state(directory / PERIOD_STATE_FILE)
+    stale = set()
+    for period, digest in digests.items():
+        saved = state.get(period)
+        if (not saved or saved['digest'] != period_digest(digest)
+                or not (directory / saved['file']).exists()):
+            stale.add(period)
+    return stale
+
+
+def write_period_reports(directory, tasks, progress=None, cancel=None, *, digests,
+                         prefix="Work_Summary", keep=()):
+    """Keep one workbook per month in directory, rewriting only changed months
+
+    digests maps every month with tasks ('YYYY_MM', or 'undated') to the
+    fingerprint the tracker keeps for it (see Rollups), and tasks maps the
+    months that stale_periods() found changed to their tasks (any iterable,
+    read once). Those months are written as <prefix>_<month>.xlsx; months
+    no longer in digests have their workbook removed, except those in keep
+    (archived months without a fingerprint). The fingerprints are saved
+    after every workbook, so a cancelled or failed export keeps the months
+    it finished. Returns [(filename, rows)] for the workbooks that were
+    written.
+
+    Nothing here looks at the tasks of unchanged months, so a run costs
+    O(months) plus writing the changed ones.
+    """
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    state_file = directory / PERIOD_STATE_FILE
+    state = _load_period_state(state_file)
+
+    def save_state():
+        atomic_write(state_file, json.dumps({'periods': state}, indent=1))
+
+    for period in set(state) - set(digests) - set(keep):
+        (directory / state.pop(period)['file']).unlink(missing_ok=True)
+        save_state()
+
+    written = []
+    done = 0
+    for period in sorted(tasks):
+        filename = period_filename(prefix, period)
+        digest = period_digest(digests[period])
+        saved = state.get(period)
+        if saved and saved['digest'] == digest and (directory / filename).exists():
+            continue
+        if cancel is not None and cancel.is_set():
+            # Months too small to reach a progress check stop here
+            raise ExportCancelled(f"Export cancelled after {len(written)} months")
+        offset = done
+        count = write_xlsx_report(
+            directory / filename, tasks[period], cancel=cancel,
+            progress=(lambda rows: progress(offset + rows)) if progress else None)
+        done += count
+        state[period] = {'digest': digest, 'file': filename, 'rows': count}
+        save_state()
+        written.append((str(directory / filename), count))
+    return written
+
+
+class ExportJob:
+    """A report export running on an executor
+
+    This is the headless API behind the GUI's progress dialog: submit an
+    export, poll rows_written or wait on result(), and call cancel() to stop
+    it early. tasks should be a list (or otherwise safe to read from the
+    worker thread); total is only used for progress display.
+    """
+
+    def __init__(self, executor, filename, tasks, total=None, writer=write_xlsx_report):
+        self.filename = filename
+        self.total = total
+        self.rows_written = 0
+        self._cancel = threading.Event()
+        self.future = executor.submit(writer, filename, tasks, self._progress, self._cancel)
+
+    def _progress(self, rows_written):
+        self.rows_written = rows_written
+
+    def cancel(self):
+        self._cancel.set()
+
+    @property
+    def cancelled(self):
+        return self._cancel.is_set()
+
+    def done(self):
+        return self.future.done()
+
+    def result(self, timeout=None):
+        """Return the writer's result, raising ExportCancelled or the export's error"""
+        return self.future.result(timeout)
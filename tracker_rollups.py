@@ -0,0 +1,137 @@
+import json
+from collections import Counter
+
+from tracker_storage import atomic_write
+
+
+# Month fingerprints are sums of 128-bit task digests modulo this
+DIGEST_MODULUS = 2 ** 128
+
+
+def week_key(day):
+    """ISO week of a date, e.g. '2024-W51'"""
+    year, week, weekday = day.isocalendar()
+    return f"{year}-W{week:02d}"
+
+
+class Rollups:
+    """Minute totals per day, ISO week and project, kept up to date incrementally
+
+    The tracker calls add() and remove() as tasks change, so totals are
+    dictionary lookups instead of a rescan of every task. The counters are
+    saved to rollups.json in the data directory along with a fingerprint
+    (task count and total minutes); if that no longer matches the loaded
+    tasks the counters are rebuilt.
+
+    With a task_digest function, each month ('YYYY_MM', or 'undated') also
+    gets a fingerprint of its tasks: the sum of their digests, so adding or
+    removing one task is enough to keep it current. Per-month reports use
+    these to find the months that changed without reading the others.
+    """
+
+    def __init__(self, task_minutes, task_day, task_digest=None):
+        self.task_minutes = task_minutes
+        self.task_day = task_day
+        self.task_digest = task_digest
+        self.clear()
+
+    def clear(self):
+        self.by_day = Counter()
+        self.by_week = Counter()
+        self.by_project = Counter()
+        self.month_digests = Counter()
+        self.task_count = 0
+        self.total_minutes = 0
+
+    def _apply(self, task, sign):
+        minutes = self.task_minutes(task) * sign
+        day = self.task_day(task)
+        if day is not None:
+            self.by_day[day.isoformat()] += minutes
+            self.by_week[week_key(day)] += minutes
+        self.by_project[task.project_id or ''] += minutes
+        self.task_count += sign
+        self.total_minutes += minutes
+        if self.task_digest is not None:
+            self._add_digest(day.strftime("%Y_%m") if day is not None else "undated",
+                             sign * self.task_digest(task))
+
+    def _add_digest(self, month, digest):
+        digest = (self.month_digests[month] + digest) % DIGEST_MODULUS
+        if digest:
+            self.month_digests[month] = digest
+        else:
+            del self.month_digests[month]
+
+    def add(self, task):
+        self._apply(task, 1)
+
+    def remove(self, task):
+        self._apply(task, -1)
+
+    def update(self, data):
+        """Add counters saved by to_dict(), e.g. the totals of archived tasks"""
+        self.by_day.update(data.get('by_day', {}))
+        self.by_week.update(data.get('by_week', {}))
+        self.by_project.update(data.get('by_project', {}))
+        self.task_count += data.get('task_count', 0)
+        self.total_minutes += data.get('total_minutes', 0)
+        if self.task_digest is not None:
+            for month, digest in data.get('month_digests', {}).items():
+                self._add_digest(month, digest)
+
+    def rebuild(self, tasks):
+        self.clear()
+        for task in tasks:
+            self.add(task)
+
+    def day_minutes(self, day):
+        return self.by_day[day.isoformat()]
+
+    def week_minutes(self, day):
+        return self.by_week[week_key(day)]
+
+    def project_minutes(self, project):
+        return self.by_project[project]
+
+    def to_dict(self):
+        data = {
+            'task_count': self.task_count,
+            'total_minutes': self.total_minutes,
+            # Drop counters that went back to zero
+            'by_day': {key: value for key, value in self.by_day.items() if value},
+            'by_week': {key: value for key, value in self.by_week.items() if value},
+            'by_project': {key: value for key, value in self.by_project.items() if value}
+        }
+        if self.task_digest is not None:
+            data['month_digests'] = dict(self.month_digests)
+        return data
+
+    def save(self, path):
+        """Atomically write the counters to path"""
+        atomic_write(path, json.dumps(self.to_dict(), separators=(',', ':')))
+
+    def load(self, path, tasks):
+        """Restore saved counters, rebuilding them if they do not match tasks"""
+        task_count = 0
+        total_minutes = 0
+        for task in tasks:
+            task_count += 1
+            total_minutes += self.task_minutes(task)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            data = {}
+        if (data.get('task_count') == task_count
+                and data.get('total_minutes') == total_minutes
+                and (self.task_digest is None or 'month_digests' in data)):
+            self.by_day = Counter(data['by_day'])
+            self.by_week = Counter(data['by_week'])
+            self.by_project = Counter(data['by_project'])
+            self.month_digests = Counter(data.get('month_digests', {}))
+            self.task_count = task_count
+            self.total_minutes = total_minutes
+            return True
+        self.rebuild(tasks)
+        return False
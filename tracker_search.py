@@ -0,0 +1,169 @@
+"""Full-text search over task descriptions and project ids
+
+SearchIndex is an inverted index from words to task ids, kept up to date by
+the tracker as tasks are added, edited and deleted. A query is a list of
+words and quoted phrases that must all match:
+
+    coach             tasks with a word starting with "coach"
+    coach*            the same; a trailing * is allowed but not needed
+    "student email"   tasks where these words appear next to each other
+
+Prefixes are looked up by bisecting a sorted list of the known words, and
+phrases are checked only against the tasks that contain all their words,
+so a query touches the matching tasks rather than the whole history. A
+query without any words (empty, or only punctuation) matches every task.
+"""
+import bisect
+import re
+
+WORD = re.compile(r"\w+")
+QUERY_TERM = re.compile(r'"([^"]*)"?|(\S+)')
+
+
+def words(text):
+    """Lower-case words of a piece of text"""
+    return WORD.findall(text.lower()) if text else []
+
+
+def parse_query(query):
+    """Split a query into (prefixes, phrases)
+
+    prefixes are single words matched against the start of task words;
+    phrases are tuples of two or more words that must appear in order.
+    """
+    prefixes, phrases = [], []
+    for phrase, term in QUERY_TERM.findall(query or ''):
+        terms = words(phrase if phrase else term)
+        if phrase and len(terms) > 1:
+            phrases.append(tuple(terms))
+        else:
+            prefixes.extend(terms)
+    return prefixes, phrases
+
+
+def has_terms(query):
+    """Whether a query has any words to match; one without matches everything"""
+    prefixes, phrases = parse_query(query)
+    return bool(prefixes or phrases)
+
+
+def task_matches_query(task, query):
+    """Check one task against a query without an index"""
+    prefixes, phrases = parse_query(query)
+    task_words = words(task.task)
+    project_words = words(task.project_id)
+    for prefix in prefixes:
+        if not any(word.startswith(prefix) for word in task_words + project_words):
+            return False
+    return all(_contains(task_words, phrase) or _contains(project_words, phrase)
+               for phrase in phrases)
+
+
+def _contains(sequence, phrase):
+    size = len(phrase)
+    first = phrase[0]
+    for index, word in enumerate(sequence[:len(sequence) - size + 1]):
+        if word == first and tuple(sequence[index:index + size]) == phrase:
+            return True
+    return False
+
+
+class SearchIndex:
+    """Inverted index over the description and project id of each task
+
+    postings maps each word to the ids of the tasks containing it. Like the
+    rollups, the index reads a task's words when it is added or removed, so
+    an edit is remove() before the task changes and add() after. positions
+    records the order tasks were first added in; a task keeps its position
+    through an edit, as it keeps its place among the tracker's tasks.
+    """
+
+    def __init__(self, tasks=()):
+        self.clear()
+        # Bulk build: fill the postings first and sort the words once
+        postings = self.postings
+        positions = self.positions
+        for task in tasks:
+            self.tasks[task.task_id] = task
+            positions.setdefault(task.task_id, len(positions))
+            for word in self._words(task):
+                ids = postings.get(word)
+                if ids is None:
+                    postings[word] = {task.task_id}
+                else:
+                    ids.add(task.task_id)
+        self.terms = sorted(postings)
+
+    def __len__(self):
+        return len(self.tasks)
+
+    @staticmethod
+    def _words(task):
+        return set(words(task.task)).union(words(task.project_id))
+
+    def add(self, task):
+        self.tasks[task.task_id] = task
+        self.positions.setdefault(task.task_id, len(self.positions))
+        for word in self._words(task):
+            ids = self.postings.get(word)
+            if ids is None:
+                ids = self.postings[word] = set()
+                bisect.insort(self.terms, word)
+            ids.add(task.task_id)
+
+    def remove(self, task):
+        if self.tasks.pop(task.task_id, None) is None:
+            return
+        for word in self._words(task):
+            ids = self.postings[word]
+            ids.discard(task.task_id)
+            if not ids:
+                del self.postings[word]
+                del self.terms[bisect.bisect_left(self.terms, word)]
+
+    def clear(self):
+        self.postings = {}
+        self.terms = []
+        self.tasks = {}
+        self.positions = {}
+
+    def prefix_ids(self, prefix):
+        """Ids of the tasks with a word starting with prefix"""
+        ids = set()
+        for index in range(bisect.bisect_left(self.terms, prefix), len(self.terms)):
+            term = self.terms[index]
+            if not term.startswith(prefix):
+                break
+            ids.update(self.postings[term])
+        return ids
+
+    def _has_phrase(self, task_id, phrase):
+        task = self.tasks[task_id]
+        return _contains(words(task.task), phrase) or _contains(words(task.project_id), phrase)
+
+    def search(self, query):
+        """Return the set of ids of the tasks matching every term of query
+
+        An empty query matches nothing; the caller decides whether that
+        means "show everything".
+        """
+        prefixes, phrases = parse_query(query)
+        if not prefixes and not phrases:
+            return set()
+        # Phrase words must match exactly; intersect the smallest sets first
+        sets = [self.postings.get(word, set()) for phrase in phrases for word in phrase]
+        sets += [self.prefix_ids(prefix) for prefix in prefixes]
+        sets.sort(key=len)
+        ids = set(sets[0])
+        for other in sets[1:]:
+            if not ids:
+                break
+            ids.intersection_update(other)
+        for phrase in phrases:
+            ids = {task_id for task_id in ids if self._has_phrase(task_id, phrase)}
+        return ids
+
+    def in_order(self, task_ids):
+        """Indexed tasks with the given ids, in the order they were added"""
+        return [self.tasks[task_id]
+                for task_id in sorted(task_ids, key=self.positions.__getitem__)]
@@ -0,0 +1,899 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+
+from tracker_metrics import count_io
+
+try:
+    import fcntl
+except ImportError:
+    # Windows
+    fcntl = None
+    import msvcrt
+
+# Task times are seconds since this moment in local wall-clock time; the
+# core imports it from here
+EPOCH = datetime(1970, 1, 1)
+
+
+def new_task_id():
+    """Return a new unique task id"""
+    return uuid.uuid4().hex
+
+
+def backfill_task_ids(tasks):
+    """Give tasks saved before ids existed an id; return how many were filled"""
+    filled = 0
+    for task in tasks:
+        if not task.get('task_id'):
+            task['task_id'] = new_task_id()
+            filled += 1
+    return filled
+
+
+def task_dict(task):
+    """Return a task as a plain dict, for records that are not already one"""
+    return task if isinstance(task, dict) else task.to_dict()
+
+
+def lock_file(f, blocking=True):
+    """Take an exclusive advisory lock on an open file; return False if busy"""
+    if fcntl is not None:
+        try:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+        except BlockingIOError:
+            return False
+        return True
+    f.seek(0)
+    while True:
+        try:
+            msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+            return True
+        except OSError:
+            if not blocking:
+                return False
+            # LK_LOCK gives up after ten seconds; keep waiting instead
+            time.sleep(0.01)
+
+
+def unlock_file(f):
+    if fcntl is not None:
+        fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+    else:
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+class StoreLock:
+    """Exclusive lock shared by every process using a data directory
+
+    Reentrant within a process, so a method holding it can call others that
+    take it too. Threads of one process are serialised by an RLock and
+    processes by an advisory lock on the lock file.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self._thread_lock = threading.RLock()
+        self._depth = 0
+        self._file = None
+
+    def __enter__(self):
+        self._thread_lock.acquire()
+        if self._depth == 0:
+            try:
+                if self._file is None:
+                    self._file = open(self.path, 'a+b')
+                lock_file(self._file)
+            except BaseException:
+                self._thread_lock.release()
+                raise
+        self._depth += 1
+        return self
+
+    def __exit__(self, *exc):
+        self._depth -= 1
+        if self._depth == 0:
+            unlock_file(self._file)
+        self._thread_lock.release()
+
+    def close(self):
+        with self._thread_lock:
+            if self._file is not None and self._depth == 0:
+                self._file.close()
+                self._file = None
+
+
+class TaskStore:
+    """Base class for task storage backends
+
+    Tasks are addressed by their 'task_id'; load() guarantees every task
+    it returns has one. Tasks passed in may be dicts or objects with a
+    to_dict() method, and load() always returns dicts.
+    """
+
+    def load(self):
+        """Return (completed_tasks, current_task) from storage"""
+        raise NotImplementedError
+
+    def add_task(self, task):
+        raise NotImplementedError
+
+    def add_tasks(self, tasks):
+        """Add many tasks, e.g. from an import"""
+        for task in tasks:
+            self.add_task(task)
+
+    def update_task(self, task):
+        raise NotImplementedError
+
+    def delete_task(self, task_id):
+        raise NotImplementedError
+
+    def delete_tasks(self, task_ids):
+        """Delete many tasks, e.g. once they are archived"""
+        for task_id in task_ids:
+            self.delete_task(task_id)
+
+    def clear(self):
+        raise NotImplementedError
+
+    def set_current(self, current):
+        raise NotImplementedError
+
+    def query(self, low=None, high=None, project=None):
+        """Ids of the stored tasks starting in [low, high) for a project, in order
+
+        Bounds are timestamps and each filter is optional. Returns None if
+        the backend has no index to answer from; callers then filter the
+        loaded tasks themselves.
+        """
+        return None
+
+    def apply(self, changes):
+        """Record a batch of (method name, args) changes
+
+        Backends override this to write the whole batch at once. Returns the
+        changes other processes saved since this one last looked, as journal
+        entries (see refresh()).
+        """
+        for action, args in changes:
+            getattr(self, action)(*args)
+        return []
+
+    def changed(self):
+        """Cheap check for whether another process has saved changes"""
+        return False
+
+    def refresh(self):
+        """Return the changes other processes saved since the last apply() or refresh()
+
+        Entries are journal-style dicts: add/update carry the task record,
+        delete a task_id, current the current task, and 'reload' the whole
+        store (tasks and current) when individual changes are not available.
+        """
+        return []
+
+    def needs_compaction(self):
+        return False
+
+    def prepare_compaction(self, tasks, current):
+        """Return a callable that compacts storage, or None if there is nothing to do"""
+        return None
+
+    def compact(self, tasks, current):
+        """Compact storage synchronously"""
+        write_snapshot = self.prepare_compaction(tasks, current)
+        if write_snapshot is not None:
+            write_snapshot()
+
+    def replace_all(self, tasks, current):
+        """Overwrite every stored task, e.g. after converting old records"""
+        self.compact(tasks, current)
+
+    def close(self):
+        pass
+
+
+def atomic_write(path, text):
+    """Atomically replace path with text, fsyncing before the rename"""
+    tmp_path = path.with_name(path.name + ".tmp")
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(text)
+        f.flush()
+        os.fsync(f.fileno())
+        count_io('write', f.tell())
+    os.replace(tmp_path, path)
+
+
+def journal_path(data_dir, generation):
+    return Path(data_dir) / f"tasks.journal.{generation}.jsonl"
+
+
+def journal_generations(data_dir):
+    """Return the generations of the journal files in a data directory, oldest first"""
+    generations = []
+    for path in Path(data_dir).glob("tasks.journal.*.jsonl"):
+        try:
+            generations.append(int(path.name.split('.')[2]))
+        except ValueError:
+            continue
+    return sorted(generations)
+
+
+def read_snapshot(path):
+    """Return (task records, current task, journal generation) from a snapshot"""
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+        count_io('read', f.tell())
+    return (data.get('completed_tasks', []), data.get('current_task', {}),
+            data.get('journal_generation', 0))
+
+
+def replay_entry(entry, tasks, current):
+    """Apply a single journal entry to tasks (by id) and return the current task"""
+    op = entry['op']
+    if op in ('add', 'update'):
+        task = entry['task']
+        tasks[task['task_id']] = task
+    elif op == 'delete':
+        tasks.pop(entry['task_id'], None)
+    elif op == 'clear':
+        tasks.clear()
+        current = {}
+    elif op == 'current':
+        current = entry['current']
+    return current
+
+
+class JournalStore(TaskStore):
+    """Snapshot plus append-only JSON Lines journal
+
+    Every mutation appends one line to the journal and fsyncs it, so a click
+    costs O(1) I/O. Once the journal grows past compact_threshold entries the
+    owner folds it into a fresh snapshot. The snapshot keeps the original
+    tasks.json layout, so existing files load (and migrate) unchanged.
+
+    Journals are numbered by generation (tasks.journal.<n>.jsonl) and a
+    snapshot records the generation whose journal starts after it. Starting
+    a compaction switches appends to the next generation straight away, so
+    the snapshot itself can be written on another thread while the app keeps
+    journaling; load() replays every journal at or after the snapshot's
+    generation, whichever step a crash interrupted.
+
+    Several processes may share a data directory. Writes and compactions
+    take an exclusive lock on tasks.lock, and before writing a process
+    first reads whatever the others appended since it last looked (its
+    offset into the journal is its version of the store), so no write is
+    based on stale state and no change is overwritten.
+    """
+
+    def __init__(self, data_dir, compact_threshold=500):
+        self.data_dir = Path(data_dir)
+        self.snapshot_file = self.data_dir / "tasks.json"
+        self.compact_threshold = compact_threshold
+        self.generation = 0
+        self.journal_entries = 0
+        self._journal = None
+        # Entries collected by apply() for one combined write
+        self._batch = None
+        self.lock = StoreLock(self.data_dir / "tasks.lock")
+        # Bytes of the current journal already read or written by this
+        # process; a longer file means another process appended to it
+        self.offset = 0
+        # Entries from other processes not yet handed to the caller
+        self.external = []
+
+    def journal_file(self, generation):
+        return journal_path(self.data_dir, generation)
+
+    def _journal_generations(self):
+        return journal_generations(self.data_dir)
+
+    def _journal_size(self, generation):
+        try:
+            return self.journal_file(generation).stat().st_size
+        except FileNotFoundError:
+            return 0
+
+    def has_data(self):
+        """Whether a snapshot or journal exists in the data directory"""
+        return self.snapshot_file.exists() or bool(self._journal_generations())
+
+    def load(self):
+        """Read the snapshot, then replay journal entries written after it"""
+        with self.lock:
+            self.external = []
+            return self._load()
+
+    def _load(self):
+        self._close_journal()
+        tasks = {}
+        current = {}
+        backfilled = 0
+        snapshot_generation = 0
+        if self.snapshot_file.exists():
+            completed, current, snapshot_generation = read_snapshot(self.snapshot_file)
+            backfilled = backfill_task_ids(completed)
+            tasks = {task['task_id']: task for task in completed}
+
+        self.journal_entries = 0
+        generations = [generation for generation in self._journal_generations()
+                       if generation >= snapshot_generation]
+        for generation in generations:
+            current = self._replay_file(self.journal_file(generation), tasks, current,
+                                        active=generation == generations[-1])
+        self.generation = generations[-1] if generations else snapshot_generation
+        self.offset = self._journal_size(self.generation)
+
+        tasks = list(tasks.values())
+        if backfilled:
+            # Persist ids handed out to tasks saved before ids existed
+            self.compact(tasks, current)
+        return tasks, current
+
+    def _replay_file(self, path, tasks, current, active=False):
+        """Replay one journal file into tasks and return the current task"""
+        with open(path, 'r', encoding='utf-8') as f:
+            lines = f.readlines()
+            count_io('read', f.tell())
+        for number, line in enumerate(lines, 1):
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                if number == len(lines) and active:
+                    # A torn final line from a crash mid-append; cut it off
+                    # in place (other processes may hold the file open) so
+                    # later appends start on a line of their own
+                    os.truncate(path, os.path.getsize(path) - len(line.encode('utf-8')))
+                # Anything after a bad line was written by other processes
+                # and is kept, as _read_entries does
+                continue
+            current = replay_entry(entry, tasks, current)
+            self.journal_entries += 1
+        return current
+
+    def _read_entries(self, generation, offset):
+        """Return (entries, new offset) for a journal from offset onwards
+
+        A final line without its newline is still being written and is left
+        for the next read.
+        """
+        with open(self.journal_file(generation), 'rb') as f:
+            f.seek(offset)
+            data = f.read()
+        count_io('read', len(data))
+        end = data.rfind(b'\n') + 1
+        entries = []
+        for line in data[:end].splitlines():
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            entries.append(entry)
+        return entries, offset + end
+
+    def _catch_up(self):
+        """Read what other processes wrote since this one last looked
+
+        Must be called with the lock held. Returns the new journal entries,
+        or a single 'reload' entry if another process compacted away a
+        journal before this one had read all of it.
+        """
+        newer = [generation for generation in self._journal_generations()
+                 if generation > self.generation]
+        if not self.journal_file(self.generation).exists():
+            if self.offset or newer:
+                tasks, current = self._load()
+                return [{'op': 'reload', 'tasks': tasks, 'current': current}]
+            return []
+        entries = []
+        if self._journal_size(self.generation) > self.offset:
+            entries, self.offset = self._read_entries(self.generation, self.offset)
+        if newer:
+            self._close_journal()
+            for generation in newer:
+                read, self.offset = self._read_entries(generation, 0)
+                entries.extend(read)
+            self.generation = newer[-1]
+            self.journal_entries = len(read)
+        else:
+            self.journal_entries += len(entries)
+        # With the lock held nobody is mid-append, so bytes after the last
+        # newline are a torn write from a process that crashed; cut them off
+        # before this process appends after them
+        if self._journal_size(self.generation) > self.offset:
+            os.truncate(self.journal_file(self.generation), self.offset)
+        return entries
+
+    def changed(self):
+        """Whether another process wrote since the last apply() or refresh()
+
+        Only stats the current journal and looks for the next one.
+        """
+        try:
+            size = self.journal_file(self.generation).stat().st_size
+        except FileNotFoundError:
+            return bool(self.offset) or bool(self._journal_generations())
+        return size != self.offset or self.journal_file(self.generation + 1).exists()
+
+    def refresh(self):
+        with self.lock:
+            self.external.extend(self._catch_up())
+            external, self.external = self.external, []
+        return external
+
+    def _append(self, entry):
+        if self._batch is not None:
+            self._batch.append(entry)
+        else:
+            with self.lock:
+                self.external.extend(self._catch_up())
+                self._write_entries([entry])
+
+    def _write_entries(self, entries):
+        with self.lock:
+            if self._journal is None:
+                self._journal = open(self.journal_file(self.generation), 'a', encoding='utf-8')
+            data = "".join(json.dumps(entry, separators=(',', ':')) + "\n" for entry in entries)
+            self._journal.write(data)
+            self._journal.flush()
+            os.fsync(self._journal.fileno())
+            self.journal_entries += len(entries)
+            # json.dumps escapes non-ASCII, so characters are bytes
+            self.offset += len(data)
+            count_io('journal', len(data))
+
+    def apply(self, changes):
+        """Append a batch of changes with a single write and fsync
+
+        Returns the entries other processes wrote since the last call, read
+        under the same lock just before writing.
+        """
+        with self.lock:
+            self.external.extend(self._catch_up())
+            self._batch = []
+            try:
+                super().apply(changes)
+                entries = self._batch
+            finally:
+                self._batch = None
+            if entries:
+                self._write_entries(entries)
+            external, self.external = self.external, []
+        return external
+
+    def add_task(self, task):
+        self._append({'op': 'add', 'task': task_dict(task)})
+
+    def update_task(self, task):
+        self._append({'op': 'update', 'task': task_dict(task)})
+
+    def delete_task(self, task_id):
+        self._append({'op': 'delete', 'task_id': task_id})
+
+    def clear(self):
+        self._append({'op': 'clear'})
+
+    def set_current(self, current):
+        self._append({'op': 'current', 'current': current})
+
+    def needs_compaction(self):
+        return self.journal_entries >= self.compact_threshold
+
+    def prepare_compaction(self, tasks, current):
+        """Switch to a new journal and return the snapshot writer for the old state
+
+        The returned callable does the slow part (serialising and fsyncing
+        the snapshot) and is safe to run on a worker thread. tasks must not
+        grow or shrink while it runs; edits to individual tasks are fine
+        because the new journal records them again.
+
+        tasks is only current if no other process wrote since the caller
+        last merged; otherwise nothing is compacted (None is returned) and
+        those entries come back from the next apply() or refresh().
+        """
+        with self.lock:
+            self.external.extend(self._catch_up())
+            if self.external:
+                return None
+            return self._start_generation(tasks, current)
+
+    def _start_generation(self, tasks, current):
+        # Created at once, so other processes stop appending to the old one
+        self._close_journal()
+        self.generation = max([self.generation] + self._journal_generations()) + 1
+        self.journal_file(self.generation).touch()
+        self.journal_entries = 0
+        self.offset = 0
+        generation = self.generation
+        tasks = list(tasks)
+
+        def write_snapshot():
+            data = json.dumps({
+                'completed_tasks': [task_dict(task) for task in tasks],
+                'current_task': current,
+                'journal_generation': generation
+            }, separators=(',', ':'))
+            with self.lock:
+                generations = self._journal_generations()
+                if generations and generations[-1] > generation:
+                    # Another process compacted after this one started
+                    return
+                atomic_write(self.snapshot_file, data)
+                # Journals folded into this snapshot are no longer needed,
+                # except the last one, whose tail other processes may not
+                # have read yet
+                for old in generations:
+                    if old < generation - 1:
+                        try:
+                            self.journal_file(old).unlink()
+                        except OSError:
+                            # Still open elsewhere (Windows); the next
+                            # compaction removes it
+                            pass
+
+        return write_snapshot
+
+    def replace_all(self, tasks, current):
+        with self.lock:
+            self.external = []
+            self._start_generation(tasks, current)()
+
+    def _close_journal(self):
+        if self._journal is not None:
+            self._journal.close()
+            self._journal = None
+
+    def close(self):
+        self._close_journal()
+        self.lock.close()
+
+
+class SqliteStore(TaskStore):
+    """SQLite task store keyed by task id
+
+    The full task record is kept as JSON, so the rest of the app sees the
+    same dicts as with the journal store. Its project and start time are
+    also kept in indexed columns, which answer query() for date range and
+    project filters without reading every row. The database runs in WAL
+    mode and is seeded from tasks.json (and any pending journal) the first
+    time it is opened.
+
+    Every write also logs (op, task_id) to a changes table. Its sequence
+    number is the store's version: a process remembers the last one it has
+    seen and, inside the same write transaction that takes SQLite's lock,
+    reads the changes other processes made since then.
+    """
+
+    SCHEMA_VERSION = 1
+
+    # Entries kept in the changes table; a process further behind reloads
+    CHANGE_LOG_SIZE = 10000
+
+    INSERT = "INSERT INTO tasks (task_id, project_id, start_ts, data) VALUES (?, ?, ?, ?)"
+
+    def __init__(self, data_dir):
+        self.data_dir = Path(data_dir)
+        self.db_file = self.data_dir / "tasks.sqlite3"
+        self.conn = sqlite3.connect(str(self.db_file))
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self._in_transaction = False
+        # Last change seen and changes from other processes not yet returned
+        self.seen = 0
+        self.external = []
+        self.data_version = None
+        self._migrate()
+
+    @contextmanager
+    def _transaction(self):
+        """Commit on exit, unless already inside an apply() batch
+
+        The outermost transaction takes the write lock up front and first
+        catches up with other processes' changes.
+        """
+        if self._in_transaction:
+            yield
+            return
+        self._in_transaction = True
+        try:
+            with self.conn:
+                self.conn.execute("BEGIN IMMEDIATE")
+                self.external.extend(self._catch_up())
+                yield
+                self.seen = self._last_change()
+        finally:
+            self._in_transaction = False
+        self.data_version = self._data_version()
+
+    def _log(self, op, task_id=None):
+        self.conn.execute("INSERT INTO changes (op, task_id) VALUES (?, ?)", (op, task_id))
+
+    def _last_change(self):
+        return self.conn.execute("SELECT COALESCE(MAX(seq), 0) FROM changes").fetchone()[0]
+
+    def _data_version(self):
+        # Changes whenever another connection commits
+        return self.conn.execute("PRAGMA data_version").fetchone()[0]
+
+    def _catch_up(self):
+        """Return journal-style entries for changes made since self.seen"""
+        rows = self.conn.execute(
+            "SELECT seq, op, task_id FROM changes WHERE seq > ? ORDER BY seq",
+            (self.seen,)).fetchall()
+        if not rows:
+            return []
+        seen, self.seen = self.seen, rows[-1][0]
+        # A gap after seen means the log was pruned before this process
+        # read it
+        if rows[0][0] > seen + 1 or any(op == 'reload' for _, op, _ in rows):
+            tasks, current = self._read_all()
+            return [{'op': 'reload', 'tasks': tasks, 'current': current}]
+        records = self._records({task_id for _, op, task_id in rows
+                                 if op in ('add', 'update')})
+        entries = []
+        for _, op, task_id in rows:
+            if op in ('add', 'update'):
+                if task_id in records:
+                    entries.append({'op': op, 'task': records[task_id]})
+            elif op == 'delete':
+                entries.append({'op': 'delete', 'task_id': task_id})
+            elif op == 'clear':
+                entries.append({'op': 'clear'})
+            elif op == 'current':
+                entries.append({'op': 'current', 'current': self._read_current()})
+        return entries
+
+    def _records(self, task_ids):
+        """Current records of the given tasks, by id"""
+        task_ids = list(task_ids)
+        records = {}
+        for index in range(0, len(task_ids), 500):
+            chunk = task_ids[index:index + 500]
+            for task_id, data in self.conn.execute(
+                    f"SELECT task_id, data FROM tasks WHERE task_id IN "
+                    f"({','.join('?' * len(chunk))})", chunk):
+                records[task_id] = json.loads(data)
+        return records
+
+    def changed(self):
+        return self._data_version() != self.data_version
+
+    def refresh(self):
+        with self.conn:
+            # A read transaction, so the log and the rows agree
+            self.conn.execute("BEGIN")
+            self.external.extend(self._catch_up())
+        self.data_version = self._data_version()
+        external, self.external = self.external, []
+        return external
+
+    def apply(self, changes):
+        """Record a batch of changes in one transaction
+
+        Returns the changes other processes made since the last call.
+        """
+        with self._transaction():
+            super().apply(changes)
+            self.conn.execute("DELETE FROM changes WHERE seq <= ?",
+                              (self._last_change() - self.CHANGE_LOG_SIZE,))
+        count_io('sqlite', 0)
+        external, self.external = self.external, []
+        return external
+
+    def _migrate(self):
+        """Create the schema, importing tasks.json on first run"""
+        if self.conn.execute("PRAGMA user_version").fetchone()[0]:
+            return
+        with self.conn:
+            self.conn.execute("BEGIN IMMEDIATE")
+            # Another process may have created it while this one waited
+            if self.conn.execute("PRAGMA user_version").fetchone()[0]:
+                return
+            for statement in """
+                CREATE TABLE tasks (
+                    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                    task_id TEXT NOT NULL UNIQUE,
+                    project_id TEXT,
+                    start_ts INTEGER,
+                    data TEXT NOT NULL
+                );
+                CREATE INDEX tasks_start ON tasks (start_ts);
+                CREATE INDEX tasks_project ON tasks (project_id, start_ts);
+                CREATE TABLE meta (
+                    key TEXT PRIMARY KEY,
+                    value TEXT
+                );
+                CREATE TABLE changes (
+                    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                    op TEXT NOT NULL,
+                    task_id TEXT
+                )
+            """.split(';'):
+                self.conn.execute(statement)
+            legacy = JournalStore(self.data_dir)
+            if legacy.has_data():
+                tasks, current = legacy.load()
+                legacy.close()
+                self.conn.executemany(self.INSERT, (self._row(task) for task in tasks))
+                self._write_current(current)
+            self.conn.execute(f"PRAGMA user_version = {self.SCHEMA_VERSION}")
+
+    def _row(self, task):
+        task = task_dict(task)
+        return task['task_id'], task.get('project_id'), task.get('start'), json.dumps(task)
+
+    def _write_current(self, current):
+        self.conn.execute(
+            "INSERT OR REPLACE INTO meta (key, value) VALUES ('current_task', ?)",
+            (json.dumps(current),))
+
+    def load(self):
+        with self.conn:
+            # One read transaction, so the tasks match the version recorded
+            self.conn.execute("BEGIN")
+            tasks, current = self._read_all()
+            self.seen = self._last_change()
+        self.data_version = self._data_version()
+        self.external = []
+        return tasks, current
+
+    def _read_all(self):
+        tasks = [json.loads(data) for (data,) in
+                 self.conn.execute("SELECT data FROM tasks ORDER BY seq")]
+        return tasks, self._read_current()
+
+    def _read_current(self):
+        row = self.conn.execute(
+            "SELECT value FROM meta WHERE key = 'current_task'").fetchone()
+        return json.loads(row[0]) if row else {}
+
+    def query(self, low=None, high=None, project=None):
+        clauses = []
+        params = []
+        if project:
+            clauses.append("project_id = ?")
+            params.append(project)
+        if low is not None:
+            clauses.append("start_ts >= ?")
+            params.append(low)
+        if high is not None:
+            clauses.append("start_ts < ?")
+            params.append(high)
+        where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+        return [task_id for (task_id,) in self.conn.execute(
+            f"SELECT task_id FROM tasks{where} ORDER BY seq", params)]
+
+    def add_task(self, task):
+        row = self._row(task)
+        with self._transaction():
+            self.conn.execute(self.INSERT, row)
+            self._log('add', row[0])
+
+    def add_tasks(self, tasks):
+        rows = [self._row(task) for task in tasks]
+        with self._transaction():
+            self.conn.executemany(self.INSERT, rows)
+            self.conn.executemany("INSERT INTO changes (op, task_id) VALUES ('add', ?)",
+                                  (row[:1] for row in rows))
+
+    def update_task(self, task):
+        row = self._row(task)
+        with self._transaction():
+            updated = self.conn.execute(
+                "UPDATE tasks SET project_id = ?, start_ts = ?, data = ? WHERE task_id = ?",
+                row[1:] + row[:1]).rowcount
+            if not updated:
+                # Deleted by another process since this one read it; the
+                # local edit wins, as when the journal replays it
+                self.conn.execute(self.INSERT, row)
+            self._log('update', row[0])
+
+    def delete_task(self, task_id):
+        with self._transaction():
+            self.conn.execute("DELETE FROM tasks WHERE task_id = ?", (task_id,))
+            self._log('delete', task_id)
+
+    def delete_tasks(self, task_ids):
+        rows = [(task_id,) for task_id in task_ids]
+        with self._transaction():
+            self.conn.executemany("DELETE FROM tasks WHERE task_id = ?", rows)
+            self.conn.executemany("INSERT INTO changes (op, task_id) VALUES ('delete', ?)",
+                                  rows)
+
+    def clear(self):
+        with self._transaction():
+            self.conn.execute("DELETE FROM tasks")
+            self._write_current({})
+            self._log('clear')
+
+    def set_current(self, current):
+        with self._transaction():
+            self._write_current(current)
+            self._log('current')
+
+    def replace_all(self, tasks, current):
+        with self._transaction():
+            self.conn.execute("DELETE FROM tasks")
+            self.conn.executemany(self.INSERT, (self._row(task) for task in tasks))
+            self._write_current(current)
+            self._log('reload')
+        self.external = []
+
+    def close(self):
+        self.conn.close()
+
+
+def read_data_dir(data_dir):
+    """Return (task records, current task) saved in a data directory, read-only
+
+    Unlike TaskStore.load() nothing is locked, written or migrated, so
+    folders owned by other people (or by a tracker that is running) can be
+    read safely. Tasks saved before ids existed come back without a
+    'task_id', and unreadable journal lines are skipped. A folder with a
+    SQLite store is read from that, otherwise from its snapshot and
+    journals. Archived months are not included.
+    """
+    data_dir = Path(data_dir)
+    db_file = data_dir / "tasks.sqlite3"
+    if db_file.exists():
+        return _read_database(db_file)
+    tasks = {}
+    current = {}
+    snapshot_generation = 0
+    snapshot_file = data_dir / "tasks.json"
+    if snapshot_file.exists():
+        completed, current, snapshot_generation = read_snapshot(snapshot_file)
+        # Journal entries never refer to tasks without an id
+        tasks = {task.get('task_id') or ('legacy', index): task
+                 for index, task in enumerate(completed)}
+    for generation in journal_generations(data_dir):
+        if generation < snapshot_generation:
+            continue
+        with open(journal_path(data_dir, generation), 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                current = replay_entry(entry, tasks, current)
+    return list(tasks.values()), current
+
+
+def _read_database(db_file):
+    # An immutable database is read without locks or a -shm file, but also
+    # without its WAL, which only exists while the owner has it open; then
+    # a read-only connection shares the owner's
+    wal = db_file.with_name(db_file.name + "-wal").exists()
+    conn = sqlite3.connect(f"{db_file.as_uri()}?{'mode=ro' if wal else 'immutable=1'}",
+                           uri=True)
+    try:
+        tasks = [json.loads(data) for (data,) in
+                 conn.execute("SELECT data FROM tasks ORDER BY seq")]
+        row = conn.execute("SELECT value FROM meta WHERE key = 'current_task'").fetchone()
+    finally:
+        conn.close()
+    return tasks, json.loads(row[0]) if row else {}
+
+
+STORE_BACKENDS = {
+    'journal': JournalStore,
+    'sqlite': SqliteStore,
+}
+
+
+def open_store(data_dir, backend=None):
+    """Open the task store selected by backend or $WORK_TRACKER_STORE"""
+    backend = backend or os.environ.get('WORK_TRACKER_STORE', 'journal')
+    try:
+        store_class = STORE_BACKENDS[backend]
+    except KeyError:
+        raise ValueError(f"Unknown task store backend: {backend}")
+    return store_class(data_dir)
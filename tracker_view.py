@@ -0,0 +1,164 @@
+import tkinter as tk
+
+
+class VirtualTaskList:
+    """Show a window of a long task list in a ttk.Treeview
+
+    Only the rows that fit in the tree (height rows) are materialized as
+    Treeview items; the scrollbar, mouse wheel, arrow keys and page buttons
+    move that window over the full list of task ids. Rows are pulled from
+    get_task(task_id) as they scroll into view, so Tk startup and memory do
+    not depend on the size of the history.
+    """
+
+    def __init__(self, tree, scrollbar, get_task, row_values, on_change=None):
+        self.tree = tree
+        self.scrollbar = scrollbar
+        self.get_task = get_task
+        self.row_values = row_values
+        self.on_change = on_change
+        self.height = int(tree.cget('height'))
+        self.task_ids = []
+        self.offset = 0
+        self.selected = set()
+
+        self.scrollbar.configure(command=self.yview)
+        self.tree.bind('<Button-1>', self._on_click, add='+')
+        self.tree.bind('<<TreeviewSelect>>', self._remember_selection, add='+')
+        self.tree.bind('<MouseWheel>', self._on_mousewheel, add='+')
+        self.tree.bind('<Button-4>', lambda e: self.scroll(-3), add='+')
+        self.tree.bind('<Button-5>', lambda e: self.scroll(3), add='+')
+        self.tree.bind('<Up>', lambda e: self._on_arrow(-1), add='+')
+        self.tree.bind('<Down>', lambda e: self._on_arrow(1), add='+')
+        self.tree.bind('<Prior>', lambda e: self.page(-1), add='+')
+        self.tree.bind('<Next>', lambda e: self.page(1), add='+')
+
+    def __len__(self):
+        return len(self.task_ids)
+
+    def set_rows(self, task_ids, show_end=False):
+        """Replace the list of task ids backing the view"""
+        self.task_ids = list(task_ids)
+        self.selected.intersection_update(self.task_ids)
+        if show_end:
+            self.offset = self._max_offset()
+        self.render()
+
+    def append(self, task_id):
+        """Add a task to the end of the list and bring it into view"""
+        self.task_ids.append(task_id)
+        self.offset = self._max_offset()
+        self.render()
+
+    def extend(self, task_ids):
+        """Add tasks to the end of the list without jumping to them
+
+        The view only follows the new rows if it was showing the end.
+        """
+        at_end = self.offset >= self._max_offset()
+        self.task_ids.extend(task_ids)
+        if at_end:
+            self.offset = self._max_offset()
+        self.render()
+
+    def remove(self, task_ids):
+        """Drop tasks from the list in one pass"""
+        removed = set(task_ids)
+        self.task_ids = [task_id for task_id in self.task_ids if task_id not in removed]
+        self.selected.difference_update(removed)
+        self.render()
+
+    def refresh(self, task_id):
+        """Redraw a single row if it is currently materialized"""
+        if self.tree.exists(task_id):
+            self.tree.item(task_id, values=self.row_values(self.get_task(task_id)))
+
+    def _max_offset(self):
+        return max(0, len(self.task_ids) - self.height)
+
+    def render(self):
+        """Materialize the rows of the current window"""
+        self.offset = min(max(0, self.offset), self._max_offset())
+        window = self.task_ids[self.offset:self.offset + self.height]
+        self.tree.delete(*self.tree.get_children())
+        for task_id in window:
+            self.tree.insert('', tk.END, iid=task_id,
+                             values=self.row_values(self.get_task(task_id)))
+        visible_selection = [task_id for task_id in window if task_id in self.selected]
+        self.tree.selection_set(visible_selection)
+
+        total = len(self.task_ids)
+        if total:
+            self.scrollbar.set(self.offset / total, (self.offset + len(window)) / total)
+        else:
+            self.scrollbar.set(0, 1)
+        if self.on_change:
+            self.on_change(self.offset, len(window), total)
+
+    def selection(self):
+        """Selected task ids in list order, including rows scrolled out of view"""
+        self._remember_selection()
+        return [task_id for task_id in self.task_ids if task_id in self.selected]
+
+    def select(self, task_ids):
+        """Make task_ids the whole selection"""
+        self.selected = set(task_ids)
+        self.tree.selection_set([task_id for task_id in self.tree.get_children()
+                                 if task_id in self.selected])
+
+    def _on_click(self, event):
+        # A plain click starts a new selection; Shift/Control extend it
+        if not event.state & 0x0005:
+            self.selected.clear()
+
+    def _remember_selection(self, event=None):
+        window = set(self.tree.get_children())
+        self.selected.difference_update(window)
+        self.selected.update(self.tree.selection())
+
+    def yview(self, *args):
+        """Scrollbar command: moveto FRACTION or scroll N units|pages"""
+        if args[0] == 'moveto':
+            self.offset = int(float(args[1]) * len(self.task_ids))
+            self.render()
+        elif args[0] == 'scroll':
+            amount = int(args[1])
+            if args[2] == 'pages':
+                self.page(amount)
+            else:
+                self.scroll(amount)
+
+    def scroll(self, rows):
+        self.offset += rows
+        self.render()
+        return 'break'
+
+    def page(self, pages):
+        return self.scroll(pages * self.height)
+
+    def first_page(self):
+        self.offset = 0
+        self.render()
+
+    def last_page(self):
+        self.offset = self._max_offset()
+        self.render()
+
+    def _on_mousewheel(self, event):
+        return self.scroll(-1 if event.delta > 0 else 1)
+
+    def _on_arrow(self, step):
+        """Move the window when the keyboard focus walks off its edge"""
+        focus = self.tree.focus()
+        children = self.tree.get_children()
+        if not children or focus not in children:
+            return None
+        at_edge = (step < 0 and focus == children[0]) or (step > 0 and focus == children[-1])
+        if not at_edge:
+            return None
+        self.scroll(step)
+        children = self.tree.get_children()
+        target = children[0] if step < 0 else children[-1]
+        self.tree.focus(target)
+        self.tree.selection_set(target)
+        return 'break'
@@ -1,59 +1,112 @@
-import tkinter as tk
-from tkinter import ttk, messagebox
-from datetime import datetime
-import openpyxl
-from openpyxl.styles import Font, Alignment, PatternFill
-import os
+import time
+
+# Taken before the heavier imports, so startup timing includes them
+STARTED = time.perf_counter()
+
 import json
-from pathlib import Path
+import os
+import sys
+import tkinter as tk
+from tkinter import ttk, messagebox, filedialog
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from datetime import date
+from tracker_core import (REPORT_FORMATS, ExternalChanges, TaskTracker, TrackerError,
+                          current_time, format_date, format_duration, format_time, parse_date,
+                          report_filename, report_user, task_matches)
+from tracker_metrics import METRICS, env_flag
+from tracker_search import has_terms, task_matches_query
+from tracker_view import VirtualTaskList
+
+# Idle time before queued changes are written, in milliseconds
+AUTOSAVE_DELAY = 500
+
+# Event-loop heartbeat period, and the lateness that counts as a stall, in ms
+HEARTBEAT_INTERVAL = 100
+STALL_THRESHOLD = 200
+
+# Pause in typing before the search box filters the task list, in ms
+SEARCH_DELAY = 250
+
+# Pause in typing before a project is suggested for the task, in ms
+SUGGEST_DELAY = 150
+
+# How often queued local API calls are run on the Tk thread, in ms
+API_POLL_INTERVAL = 50
+
+# How often to check for tasks saved by other instances or scripts, in ms
+WATCH_INTERVAL = 1000
+
+# How often old tasks are moved to the archive while the window is open, in ms
+ARCHIVE_INTERVAL = 24 * 3600 * 1000
+
+# UI callbacks timed by the instrumentation
+INSTRUMENTED_ACTIONS = ['load_tasks', 'start_task', 'complete_task', 'edit_selected_task',
+                        'delete_selected_task', 'clear_all_tasks', 'populate_treeview',
+                        'apply_project_suggestion', 'generate_report', 'import_tasks',
+                        'update_monthly_reports', 'autosave']
 
 class WorkTracker:
-    def __init__(self, root):
+    def __init__(self, root, data_dir=None):
         self.root = root
         self.root.title("Personal Work Tracker")
         self.root.geometry("900x500")
         
-        # Set up data directory
-        self.data_dir = Path.home() / "WorkTrackerData"
-        self.data_dir.mkdir(exist_ok=True)
-        self.tasks_file = self.data_dir / "tasks.json"
-        
-        # Project categories and their keywords
-        self.project_categories = {
-            "GSU meeting/Training": ["gsu", "meeting", "training"],
-            "Onboarding": ["onboard", "orientation"],
-            "Life Review": ["life", "review"],
-            "LASSI Review": ["lassi"],
-            "Recruitment": ["recruit", "admission"],
-            "Student": ["student"],
-            "Coaching": ["coach"],
-            "Tutoring": ["tutor"],
-            "Trio Project Assistance": ["trio", "project", "assist"],
-            "Administrative": ["admin", "paperwork", "documentation"],
-            "Trio Team Meeting": ["team", "meeting"],
-            "Work Assistance": ["work", "assist"],
-            "Group Coaching": ["group", "coach"],
-            "Cultural Events": ["cultural", "event"],
-            "Team Collaboration": ["collaboration", "collab"],
-            "Success Workshop": ["success", "workshop"],
-            "Trio Training": ["trio", "training"],
-            "Other": []
-        }
-        
-        # List to store all tasks
-        self.tasks = []
-        
-        # Current task tracking
-        self.current_task = None
-        self.current_start_time = None
-        self.current_date = None
-        self.current_project = None
+        # Domain model and storage live in the headless core
+        self.tracker = TaskTracker(data_dir)
+        self.project_categories = self.tracker.project_categories
+        
+        # Single worker thread for report exports and snapshot writes, so
+        # slow disk work never blocks the Tk mainloop
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        self.tracker.run_compaction = self.run_in_background
+        self.export_job = None
+
+        # Changes are saved in one batch once edits pause for AUTOSAVE_DELAY ms
+        self.tracker.defer_flush = self.schedule_autosave
+        self.autosave_after_id = None
+
+        # Tasks saved by other instances are merged in row by row
+        self.tracker.on_external_change = self.merge_external
+        self.watch_after_id = None
+
+        # Archived tasks listed by the current filter, by id, and whether a
+        # search left the archive out because no dates were set
+        self.archived_rows = {}
+        self.archive_skipped = False
+        
+        # Pending debounced project suggestion
+        self.suggest_after_id = None
+
+        # Opt-in instrumentation; the wrappers only check a flag while it is off
+        self.metrics = METRICS
+        self.metrics.instrument(self, INSTRUMENTED_ACTIONS)
+        self.metrics.instrument(self.tracker, ['flush', 'export_report'], prefix='tracker.')
+        self.heartbeat_due = None
+
+        # Local HTTP API, started from the API menu or WORK_TRACKER_API
+        self.api_server = None
+        self.api_calls = None
+        # What API calls changed since the window last showed it
+        self.api_changes = ExternalChanges()
         
         # Set up the GUI first
         self.setup_gui()
+        self.setup_menu()
+        if self.metrics.enabled:
+            self.start_metrics()
+        if env_flag("WORK_TRACKER_PROFILE"):
+            self.metrics.start_profile()
+            self.profile_var.set(True)
         
-        # Then load tasks and populate the treeview
-        self.load_tasks()
+        # Load tasks once the window has been drawn, so a long history
+        # never delays the first frame
+        self.startup_times = {}
+        self.current_task_label.config(text="Loading tasks...")
+        self.root.after_idle(self.on_first_frame)
+        
+        # Save pending changes and close the store when the window is closed
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
 
     def setup_gui(self):
         # Create main frame with padding
@@ -65,6 +118,8 @@ class WorkTracker:
         self.status_frame.grid(row=0, column=0, columnspan=3, sticky=(tk.W, tk.E), pady=(0, 10))
         self.current_task_label = ttk.Label(self.status_frame, text="No task in progress")
         self.current_task_label.pack(fill=tk.X)
+        self.totals_label = ttk.Label(self.status_frame, text="")
+        self.totals_label.pack(fill=tk.X)
         
         # Task Entry
         ttk.Label(self.main_frame, text="Current Task:").grid(row=1, column=0, sticky=tk.W, pady=5)
@@ -133,14 +188,52 @@ class WorkTracker:
         self.tree.column('End Time', width=120)
         self.tree.column('Duration', width=120)
         
-        # Add scrollbar
-        scrollbar = ttk.Scrollbar(tree_frame, orient=tk.VERTICAL, command=self.tree.yview)
-        self.tree.configure(yscrollcommand=scrollbar.set)
+        # Add scrollbar; it drives the virtual list rather than the tree itself
+        scrollbar = ttk.Scrollbar(tree_frame, orient=tk.VERTICAL)
+        self.task_list = VirtualTaskList(self.tree, scrollbar, self.get_task,
+                                         self.task_row, on_change=self.update_page_label)
         
         # Grid the treeview and scrollbar
         self.tree.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
         scrollbar.grid(row=0, column=1, sticky=(tk.N, tk.S))
         
+        # Date range filter and page navigation
+        nav_frame = ttk.Frame(tree_frame)
+        nav_frame.grid(row=1, column=0, columnspan=2, sticky=(tk.W, tk.E), pady=(5, 0))
+        ttk.Label(nav_frame, text="Search:").pack(side=tk.LEFT)
+        self.search_entry = ttk.Entry(nav_frame, width=20)
+        self.search_entry.pack(side=tk.LEFT, padx=2)
+        self.search_entry.bind('<KeyRelease>', self.schedule_search)
+        self.search_entry.bind('<Return>', lambda e: self.populate_treeview())
+        self.search_after_id = None
+        ttk.Label(nav_frame, text="From:").pack(side=tk.LEFT)
+        self.filter_from_entry = ttk.Entry(nav_frame, width=12)
+        self.filter_from_entry.pack(side=tk.LEFT, padx=2)
+        ttk.Label(nav_frame, text="To:").pack(side=tk.LEFT)
+        self.filter_to_entry = ttk.Entry(nav_frame, width=12)
+        self.filter_to_entry.pack(side=tk.LEFT, padx=2)
+        ttk.Label(nav_frame, text="(MM/DD/YYYY)").pack(side=tk.LEFT, padx=2)
+        ttk.Label(nav_frame, text="Project:").pack(side=tk.LEFT)
+        self.filter_project = ttk.Combobox(nav_frame, width=18, state="readonly",
+                                           values=["All"] + list(self.project_categories.keys()))
+        self.filter_project.set("All")
+        self.filter_project.pack(side=tk.LEFT, padx=2)
+        ttk.Button(nav_frame, text="Apply", 
+                  command=self.populate_treeview).pack(side=tk.LEFT, padx=2)
+        ttk.Button(nav_frame, text="Clear", 
+                  command=self.clear_date_filter).pack(side=tk.LEFT, padx=2)
+        
+        ttk.Button(nav_frame, text=">>", width=3, 
+                  command=self.task_list.last_page).pack(side=tk.RIGHT)
+        ttk.Button(nav_frame, text=">", width=3, 
+                  command=lambda: self.task_list.page(1)).pack(side=tk.RIGHT)
+        ttk.Button(nav_frame, text="<", width=3, 
+                  command=lambda: self.task_list.page(-1)).pack(side=tk.RIGHT)
+        ttk.Button(nav_frame, text="<<", width=3, 
+                  command=self.task_list.first_page).pack(side=tk.RIGHT)
+        self.page_label = ttk.Label(nav_frame, text="")
+        self.page_label.pack(side=tk.RIGHT, padx=5)
+        
         # Buttons at the bottom
         button_frame = ttk.Frame(self.main_frame)
         button_frame.grid(row=5, column=0, columnspan=3, pady=10)
@@ -150,56 +243,360 @@ class WorkTracker:
         ttk.Button(button_frame, text="Complete Task", 
                   command=self.complete_task).pack(side=tk.LEFT, padx=5)
         ttk.Button(button_frame, text="Generate Report", 
-                  command=self.generate_report).pack(side=tk.LEFT, padx=5)
+                  command=self.generate_report).pack(side=tk.LEFT, padx=(5, 2))
+        self.report_format = ttk.Combobox(button_frame, width=7, state="readonly",
+                                          values=REPORT_FORMATS)
+        self.report_format.set(REPORT_FORMATS[0])
+        self.report_format.pack(side=tk.LEFT, padx=(0, 5))
+        ttk.Button(button_frame, text="Update Monthly Reports", 
+                  command=self.update_monthly_reports).pack(side=tk.LEFT, padx=5)
+        ttk.Button(button_frame, text="Import Tasks", 
+                  command=self.import_tasks).pack(side=tk.LEFT, padx=5)
         ttk.Button(button_frame, text="Clear All Tasks", 
                   command=self.clear_all_tasks).pack(side=tk.LEFT, padx=5)
 
+    def on_first_frame(self):
+        """Record time to first frame, then load tasks and populate the treeview"""
+        self.root.update_idletasks()
+        self.startup_times['first_frame_ms'] = round((time.perf_counter() - STARTED) * 1000, 1)
+        self.load_tasks()
+        self.startup_times['tasks_loaded_ms'] = round((time.perf_counter() - STARTED) * 1000, 1)
+        self.report_startup()
+        if env_flag("WORK_TRACKER_API"):
+            self.start_api()
+
+    def report_startup(self):
+        """Log startup timings; WORK_TRACKER_STARTUP_REPORT prints them
+
+        With WORK_TRACKER_STARTUP_REPORT=exit the window closes straight
+        away, which is how tracker_bench measures a cold start.
+        """
+        self.metrics.record_startup(**self.startup_times)
+        report = os.environ.get("WORK_TRACKER_STARTUP_REPORT")
+        if report:
+            print(json.dumps(self.startup_times), file=sys.stderr, flush=True)
+            if report == "exit":
+                self.root.after(0, self.on_close)
+
+    def setup_menu(self):
+        menubar = tk.Menu(self.root)
+        diagnostics = tk.Menu(menubar, tearoff=0)
+        diagnostics.add_command(label="Show Diagnostics...", command=self.show_diagnostics)
+        diagnostics.add_separator()
+        self.metrics_var = tk.BooleanVar(value=self.metrics.enabled)
+        diagnostics.add_checkbutton(label="Record Metrics", variable=self.metrics_var,
+                                    command=self.toggle_metrics)
+        self.profile_var = tk.BooleanVar(value=False)
+        diagnostics.add_checkbutton(label="Profile (cProfile + tracemalloc)",
+                                    variable=self.profile_var, command=self.toggle_profile)
+        menubar.add_cascade(label="Diagnostics", menu=diagnostics)
+        api = tk.Menu(menubar, tearoff=0)
+        self.api_var = tk.BooleanVar(value=False)
+        api.add_checkbutton(label="Serve Local API", variable=self.api_var,
+                            command=self.toggle_api)
+        menubar.add_cascade(label="API", menu=api)
+        self.root.config(menu=menubar)
+
+    def start_api(self):
+        """Serve tracker_api on localhost; its calls run here on the Tk thread"""
+        from tracker_api import API_PORT, ApiServer, CallQueue
+
+        port = os.environ.get("WORK_TRACKER_API_PORT")
+        self.api_calls = CallQueue()
+        server = ApiServer(self.tracker, port=int(port) if port else API_PORT,
+                           submit=self.api_calls.submit,
+                           on_change=self.on_api_change,
+                           token=os.environ.get("WORK_TRACKER_API_TOKEN"))
+        try:
+            server.start()
+        except OSError as e:
+            self.api_calls = None
+            self.api_var.set(False)
+            messagebox.showerror("Error", f"Could not start the local API: {str(e)}")
+            return
+        self.api_server = server
+        self.api_var.set(True)
+        self.root.after(API_POLL_INTERVAL, self.poll_api)
+
+    def stop_api(self):
+        if self.api_server is not None:
+            self.api_server.stop()
+            self.api_server = None
+        # Calls still queued belong to requests the shutdown cancelled
+        self.api_calls = None
+        self.api_var.set(False)
+
+    def toggle_api(self):
+        if self.api_var.get():
+            self.start_api()
+        else:
+            self.stop_api()
+
+    def on_api_change(self, changes):
+        self.api_changes.added += changes.added
+        self.api_changes.current = self.api_changes.current or changes.current
+
+    def poll_api(self):
+        """Run queued API calls, then update the window once for all of them"""
+        if self.api_calls is None:
+            return
+        self.api_calls.run_pending()
+        if self.api_changes:
+            changes, self.api_changes = self.api_changes, ExternalChanges()
+            # Only the added rows are drawn, as for another instance's changes
+            changes.added = [task_id for task_id in changes.added
+                             if task_id in self.tracker.tasks]
+            self.merge_external(changes)
+        self.root.after(API_POLL_INTERVAL, self.poll_api)
+
+    def start_metrics(self):
+        """Turn on latency and I/O recording, the metrics log and stall detection"""
+        self.metrics.enabled = True
+        if self.metrics.log is None:
+            self.metrics.open_log(self.tracker.data_dir / "metrics.log")
+        if self.heartbeat_due is None:
+            self.heartbeat_due = time.perf_counter() + HEARTBEAT_INTERVAL / 1000
+            self.root.after(HEARTBEAT_INTERVAL, self.heartbeat)
+
+    def toggle_metrics(self):
+        if self.metrics_var.get():
+            self.start_metrics()
+        else:
+            self.metrics.enabled = False
+            self.metrics.close_log()
+
+    def heartbeat(self):
+        """Record a stall whenever the event loop runs this late"""
+        if not self.metrics.enabled:
+            self.heartbeat_due = None
+            return
+        now = time.perf_counter()
+        late = now - self.heartbeat_due
+        if late * 1000 >= STALL_THRESHOLD:
+            self.metrics.record_stall(late)
+        self.heartbeat_due = now + HEARTBEAT_INTERVAL / 1000
+        self.root.after(HEARTBEAT_INTERVAL, self.heartbeat)
+
+    def toggle_profile(self):
+        if self.profile_var.get():
+            self.metrics.start_profile()
+        else:
+            self.save_profile()
+
+    def save_profile(self):
+        try:
+            files = self.metrics.stop_profile(self.tracker.data_dir / "profiles")
+        except Exception as e:
+            messagebox.showerror("Error", f"Failed to save profile: {str(e)}")
+            return
+        if files:
+            messagebox.showinfo("Profile Saved", "\n".join(str(name) for name in files))
+
+    def show_diagnostics(self):
+        """Window with per-action latencies, I/O counters and stalls"""
+        window = tk.Toplevel(self.root)
+        window.title("Diagnostics")
+        window.geometry("620x380")
+
+        columns = ('calls', 'mean', 'p50', 'p95', 'max')
+        tree = ttk.Treeview(window, columns=columns, height=10)
+        tree.heading('#0', text='Action')
+        tree.column('#0', width=200)
+        for column, heading in zip(columns, ('Calls', 'Mean ms', 'p50 ms', 'p95 ms', 'Max ms')):
+            tree.heading(column, text=heading)
+            tree.column(column, width=80, anchor=tk.E)
+        tree.pack(fill=tk.BOTH, expand=True, padx=10, pady=(10, 5))
+        io_label = ttk.Label(window, text="", justify=tk.LEFT)
+        io_label.pack(fill=tk.X, padx=10)
+
+        def refresh():
+            if not window.winfo_exists():
+                return
+            summary = self.metrics.summary()
+            tree.delete(*tree.get_children())
+            for name, stats in summary['actions'].items():
+                tree.insert('', tk.END, text=name, values=(
+                    stats['count'], stats['mean_ms'], stats['p50_ms'], stats['p95_ms'],
+                    stats['max_ms']))
+            io = ", ".join(f"{kind}: {stats['count']} ops / {stats['bytes']:,} bytes"
+                           for kind, stats in summary['io'].items())
+            stalls = summary['stalls']
+            state = "recording" if self.metrics.enabled else "off (Diagnostics > Record Metrics)"
+            startup = self.startup_times
+            io_label.config(text=f"Metrics {state} since {summary['since']}\n"
+                                 f"Startup: first frame {startup.get('first_frame_ms')} ms, "
+                                 f"tasks loaded {startup.get('tasks_loaded_ms')} ms\n"
+                                 f"I/O: {io or 'none'}\n"
+                                 f"Event loop stalls over {STALL_THRESHOLD} ms: "
+                                 f"{stalls['count']} (longest {stalls['max_ms']} ms)")
+            window.after(1000, refresh)
+
+        def reset():
+            self.metrics.reset()
+
+        buttons = ttk.Frame(window)
+        buttons.pack(pady=5)
+        ttk.Button(buttons, text="Reset", command=reset).pack(side=tk.LEFT, padx=5)
+        ttk.Button(buttons, text="Close", command=window.destroy).pack(side=tk.LEFT, padx=5)
+        refresh()
+
     def load_tasks(self):
-        """Load tasks and current task status from JSON file"""
+        """Load tasks and current task status from the task store"""
         try:
-            if self.tasks_file.exists():
-                with open(self.tasks_file, 'r') as f:
-                    data = json.load(f)
-                    self.tasks = data.get('completed_tasks', [])
-                    current_task = data.get('current_task', {})
-                    if current_task:
-                        self.current_task = current_task.get('task')
-                        self.current_start_time = current_task.get('start_time')
-                        self.current_date = current_task.get('date')
-                        self.current_project = current_task.get('project')
-                        if self.current_project:
-                            self.project_id.set(self.current_project)
-                        self.update_current_task_display()
+            self.tracker.load()
+            if self.tracker.begin_session():
+                messagebox.showwarning(
+                    "Warning", "Work Tracker did not close cleanly last time.\n"
+                               "Tasks were restored from the last save; changes made "
+                               "just before it closed may be missing.")
+            if self.tracker.current_project:
+                self.project_id.set(self.tracker.current_project)
+            self.update_current_task_display()
             # After loading, populate the treeview
             self.populate_treeview()
         except Exception as e:
             messagebox.showerror("Error", f"Failed to load tasks: {str(e)}")
-            self.tasks = []
+            return
+        self.watch_after_id = self.root.after(WATCH_INTERVAL, self.watch_store)
+        self.root.after_idle(self.archive_old_tasks)
+        self.root.after_idle(self.build_search_index)
+
+    def build_search_index(self):
+        """Build the search index on the worker thread, so no search waits for it"""
+        build = self.tracker.prepare_search_index()
+        if build is not None:
+            self.run_in_background(build, on_done=self.finish_search_index)
+
+    def finish_search_index(self, future):
+        try:
+            built = future.result()
+        except Exception:
+            # The first search builds it instead
+            return
+        if not self.tracker.finish_search_index(built):
+            # Tasks changed while it was built (e.g. by the archive); try again
+            self.root.after_idle(self.build_search_index)
+
+    def archive_old_tasks(self):
+        """Move tasks older than the active period into the archive
+
+        The segments are written on the worker thread; this runs again
+        every ARCHIVE_INTERVAL, so a window left open keeps up too.
+        """
+        self.root.after(ARCHIVE_INTERVAL, self.archive_old_tasks)
+        try:
+            write_segments = self.tracker.prepare_archive()
+        except Exception as e:
+            messagebox.showerror("Error", f"Failed to archive old tasks: {str(e)}")
+            return
+        if write_segments is not None:
+            self.run_in_background(write_segments, on_done=self.finish_archive)
+
+    def finish_archive(self, future):
+        try:
+            written = future.result()
+        except Exception as e:
+            self.tracker.end_archive()
+            messagebox.showerror("Error", f"Failed to archive old tasks: {str(e)}")
+            return
+        try:
+            archived = self.apply_change('finish_archive', written)
+        except Exception as e:
+            messagebox.showerror("Error", f"Failed to archive old tasks: {str(e)}")
+            return
+        if archived:
+            self.populate_treeview()
+            self.update_totals_display()
+
+    def watch_store(self):
+        """Merge tasks other instances saved since the last look
 
-    def save_tasks(self):
-        """Save tasks and current task status to JSON file"""
+        store.changed() is a stat or a pragma, so polling costs next to
+        nothing while nobody else writes.
+        """
+        self.watch_after_id = None
         try:
-            data = {
-                'completed_tasks': self.tasks,
-                'current_task': {
-                    'task': self.current_task,
-                    'start_time': self.current_start_time,
-                    'date': self.current_date,
-                    'project': self.current_project
-                } if self.current_task else {}
-            }
-            with open(self.tasks_file, 'w') as f:
-                json.dump(data, f, indent=4)
+            if self.tracker.store.changed():
+                self.tracker.refresh()
+        except Exception as e:
+            messagebox.showerror("Error", f"Stopped watching for changes from other "
+                                          f"instances: {str(e)}")
+            return
+        self.watch_after_id = self.root.after(WATCH_INTERVAL, self.watch_store)
+
+    def merge_external(self, changes):
+        """Update the rows, totals and status touched by another instance"""
+        if changes.reloaded:
+            self.populate_treeview()
+        else:
+            shows = self.row_filter()
+            listed = set(self.task_list.task_ids) if changes.updated else ()
+            dropped = list(changes.deleted)
+            new = []
+            for task_id in changes.updated:
+                # An edit can move a task into or out of the filter
+                if not shows(self.tracker.tasks[task_id]):
+                    dropped.append(task_id)
+                elif task_id in listed:
+                    self.task_list.refresh(task_id)
+                else:
+                    new.append(task_id)
+            new += [task_id for task_id in changes.added if shows(self.tracker.tasks[task_id])]
+            if dropped:
+                self.task_list.remove(dropped)
+            if new:
+                self.task_list.extend(new)
+        if changes.current and self.tracker.current_project:
+            self.project_id.set(self.tracker.current_project)
+        self.update_current_task_display()
+
+    def apply_change(self, action, *args):
+        """Run a tracker change, reporting storage failures"""
+        try:
+            return getattr(self.tracker, action)(*args)
+        except TrackerError:
+            raise
         except Exception as e:
             messagebox.showerror("Error", f"Failed to save tasks: {str(e)}")
 
+    def schedule_autosave(self):
+        """Restart the idle timer for the write-behind autosave"""
+        if self.autosave_after_id is not None:
+            self.root.after_cancel(self.autosave_after_id)
+        self.autosave_after_id = self.root.after(AUTOSAVE_DELAY, self.autosave)
+
+    def autosave(self):
+        self.autosave_after_id = None
+        try:
+            self.tracker.flush()
+        except Exception as e:
+            messagebox.showerror("Error", f"Failed to save tasks: {str(e)}")
+
+    def run_in_background(self, func, *args, on_done=None):
+        """Run func on the worker thread and call on_done(future) on the Tk thread"""
+        future = self.executor.submit(func, *args)
+        self.watch_future(future, on_done or self.report_save_error)
+        return future
+
+    def watch_future(self, future, on_done):
+        """Poll a future from the mainloop until it finishes"""
+        if future.done():
+            on_done(future)
+        else:
+            self.root.after(100, self.watch_future, future, on_done)
+
+    def report_save_error(self, future):
+        error = future.exception()
+        if error is not None:
+            messagebox.showerror("Error", f"Failed to save tasks: {str(error)}")
+
     def show_context_menu(self, event):
         """Show right-click menu"""
         try:
             # Select row under mouse
             item = self.tree.identify_row(event.y)
             if item:
-                self.tree.selection_set(item)
+                self.task_list.select([item])
                 self.context_menu.post(event.x_root, event.y_root)
         finally:
             # Required to make menu disappear when clicking outside
@@ -207,94 +604,147 @@ class WorkTracker:
 
     def delete_selected_task(self):
         """Delete the selected task from both treeview and tasks list"""
-        selected_items = self.tree.selection()
+        # The list's selection includes rows scrolled out of the tree
+        selected_items = self.task_list.selection()
         if not selected_items:
             messagebox.showwarning("Warning", "Please select a task to delete")
             return
 
         if messagebox.askyesno("Confirm Delete", "Are you sure you want to delete this task?"):
-            for item in selected_items:
-                # Get values from the selected row
-                values = self.tree.item(item)['values']
-                
-                # Find and remove the task from self.tasks
-                for task in self.tasks[:]:  # Create a copy of the list to iterate over
-                    if (task['date'] == values[0] and 
-                        task['project_id'] == values[1] and 
-                        task['task'] == values[2] and 
-                        task['start_time'] == values[3] and 
-                        task['end_time'] == values[4]):
-                        self.tasks.remove(task)
-                        break
-                
-                # Remove from treeview
-                self.tree.delete(item)
+            # Item iids are task ids
+            self.apply_change('delete_tasks', selected_items)
             
-            # Save updated tasks
-            self.save_tasks()
+            # Remove from treeview
+            self.task_list.remove(selected_items)
+            for item in selected_items:
+                self.archived_rows.pop(item, None)
+            self.update_totals_display()
             messagebox.showinfo("Success", "Task deleted successfully")
 
     def populate_treeview(self):
-        """Populate treeview with loaded tasks"""
+        """Point the virtual task list at the tasks in the filter bar"""
+        if self.search_after_id is not None:
+            self.root.after_cancel(self.search_after_id)
+            self.search_after_id = None
         try:
-            # Clear existing items
-            for item in self.tree.get_children():
-                self.tree.delete(item)
-                
-            # Add tasks to treeview
-            for task in self.tasks:
-                self.tree.insert('', tk.END, values=(
-                    task['date'],
-                    task['project_id'],
-                    task['task'],
-                    task['start_time'],
-                    task['end_time'],
-                    task['duration']
-                ))
+            view_filter = self.view_filter()
+        except ValueError:
+            messagebox.showerror("Error", "Invalid date! Please use MM/DD/YYYY")
+            return
+        query = self.search_entry.get().strip()
+        try:
+            self.archived_rows = {}
+            # Searching every segment here would stall the window, so the
+            # archive is only searched back to the From date
+            self.archive_skipped = (has_terms(query) and view_filter[:2] == (None, None)
+                                    and bool(self.tracker.archive.months()))
+            if not any(view_filter) and not query:
+                task_ids = list(self.tracker.tasks)
+            else:
+                tasks = self.tracker.search(query, *view_filter)
+                task_ids = [task.task_id for task in tasks]
+                # Rows for tasks the filter found in the archive
+                self.archived_rows = {task.task_id: task for task in tasks
+                                      if task.task_id not in self.tracker.tasks}
+            self.task_list.set_rows(task_ids, show_end=True)
         except Exception as e:
             messagebox.showerror("Error", f"Failed to populate task list: {str(e)}")
 
+    def get_task(self, task_id):
+        task = self.tracker.tasks.get(task_id)
+        return task if task is not None else self.archived_rows[task_id]
+
+    def task_row(self, task):
+        """Values shown in the treeview for a task"""
+        return (
+            format_date(task.start),
+            task.project_id,
+            task.task,
+            format_time(task.start),
+            format_time(task.end),
+            format_duration(task.minutes_worked)
+        )
+
+    def row_filter(self):
+        """Return a check for whether a task belongs in the list as filtered"""
+        try:
+            view_filter = self.view_filter()
+        except ValueError:
+            view_filter = ()
+        query = self.search_entry.get()
+        return lambda task: (task_matches(task, *view_filter)
+                             and task_matches_query(task, query))
+
+    def view_filter(self):
+        """Return the (from, to, project) filter bar values, None where unset"""
+        start = self.filter_from_entry.get().strip()
+        end = self.filter_to_entry.get().strip()
+        project = self.filter_project.get()
+        start = parse_date(start) if start else None
+        end = parse_date(end) if end else None
+        return start, end, (project if project and project != "All" else None)
+
+    def schedule_search(self, event=None):
+        """Filter the task list once typing in the search box pauses"""
+        if self.search_after_id is not None:
+            self.root.after_cancel(self.search_after_id)
+        self.search_after_id = self.root.after(SEARCH_DELAY, self.populate_treeview)
+
+    def clear_date_filter(self):
+        self.search_entry.delete(0, tk.END)
+        self.filter_from_entry.delete(0, tk.END)
+        self.filter_to_entry.delete(0, tk.END)
+        self.filter_project.set("All")
+        self.populate_treeview()
+
+    def update_page_label(self, offset, shown, total):
+        if total:
+            text = f"Showing {offset + 1}-{offset + shown} of {total}"
+        else:
+            text = "No tasks"
+        if self.archive_skipped:
+            text += " (archive not searched; set From to include it)"
+        self.page_label.config(text=text)
+
     def set_current_time(self, entry_widget):
         """Set the current time in the entry widget"""
-        current_time = datetime.now().strftime("%I:%M %p")  # Changed to HH:MM AM/PM format
         entry_widget.delete(0, tk.END)
-        entry_widget.insert(0, current_time)
-
-    def validate_time(self, time_str):
-        """Validate time string in either HH:MM AM/PM or HH:MM:SS AM/PM format"""
-        time_formats = [
-            "%I:%M %p",     # 12-hour without seconds (e.g., "10:20 AM")
-            "%H:%M",         # 24-hour without seconds
-            "%I:%M:%S %p",  # 12-hour with seconds (e.g., "10:20:11 AM")
-            "%H:%M:%S"      # 24-hour with seconds
-        ]
-        
-        for time_format in time_formats:
-            try:
-                return datetime.strptime(time_str, time_format)
-            except ValueError:
-                continue
-        
-        raise ValueError("Invalid time format! Please use HH:MM AM/PM or HH:MM:SS AM/PM")
+        entry_widget.insert(0, current_time())
 
     def suggest_project(self, event=None):
-        task_text = self.task_entry.get().lower()
-        
-        # Check each project category for matching keywords
-        for project, keywords in self.project_categories.items():
-            if any(keyword in task_text for keyword in keywords):
-                self.project_id.set(project)
-                break
-        else:
-            # If no matches found, set to "Other"
-            self.project_id.set("Other")
+        """Debounce keystrokes so the project is only suggested once typing pauses"""
+        if self.suggest_after_id is not None:
+            self.root.after_cancel(self.suggest_after_id)
+        self.suggest_after_id = self.root.after(SUGGEST_DELAY, self.apply_project_suggestion)
+
+    def apply_project_suggestion(self):
+        self.suggest_after_id = None
+        matches = self.tracker.suggest_projects(self.task_entry.get())
+        self.project_id.set(matches[0] if matches else "Other")
+        # Offer the other matches at the top of the dropdown
+        others = [project for project in self.project_categories if project not in matches]
+        self.project_id['values'] = matches + others
+
+    def update_totals_display(self):
+        """Show today's and this week's totals from the rollups"""
+        rollups = self.tracker.rollups
+        today = date.today()
+        day_minutes = rollups.day_minutes(today)
+        week_minutes = rollups.week_minutes(today)
+        self.totals_label.config(
+            text=f"Today: {day_minutes // 60}h {day_minutes % 60:02d}m    "
+                 f"This week: {week_minutes // 60}h {week_minutes % 60:02d}m"
+        )
 
     def update_current_task_display(self):
         """Update the current task status display"""
-        if self.current_task:
-            status_text = (f"In Progress: {self.current_task}\n"
-                         f"Project: {self.current_project}\n"
-                         f"Started at: {self.current_start_time} on {self.current_date}")
+        self.update_totals_display()
+        tracker = self.tracker
+        if tracker.current_task:
+            status_text = (f"In Progress: {tracker.current_task}\n"
+                         f"Project: {tracker.current_project}\n"
+                         f"Started at: {format_time(tracker.current_start)} "
+                         f"on {format_date(tracker.current_start)}")
             self.current_task_label.config(
                 text=status_text,
                 foreground="green",
@@ -310,40 +760,15 @@ class WorkTracker:
             )
 
     def start_task(self):
-        # Check if there's already a task in progress
-        if self.current_task:
-            messagebox.showerror("Error", f"A task is already in progress: {self.current_task}\nPlease complete it first!")
-            return
-            
         task = self.task_entry.get().strip()
         start_time = self.start_time_entry.get().strip()
         project = self.project_id.get()
         
-        if not task:
-            messagebox.showerror("Error", "Please enter a task description!")
-            return
-            
-        if not start_time:
-            messagebox.showerror("Error", "Please enter start time!")
-            return
-            
-        if not project:
-            messagebox.showerror("Error", "Please select a Project ID!")
-            return
-            
         try:
-            self.validate_time(start_time)
-        except ValueError as e:
+            self.apply_change('start_task', task, start_time, project)
+        except TrackerError as e:
             messagebox.showerror("Error", str(e))
             return
-            
-        self.current_task = task
-        self.current_start_time = start_time
-        self.current_date = datetime.now().strftime("%m/%d/%Y")
-        self.current_project = project  # Save the current project
-        
-        # Save the current task status
-        self.save_tasks()
         
         # Update status display
         self.update_current_task_display()
@@ -351,65 +776,21 @@ class WorkTracker:
         messagebox.showinfo("Success", f"Task '{task}' started at {start_time}")
 
     def complete_task(self):
-        if not self.current_task:
-            messagebox.showerror("Error", "No task is currently running!")
-            return
-        
         # Get end time from entry if provided, otherwise use current time
         end_time = self.end_time_entry.get().strip()
-        if not end_time:
-            end_time = datetime.now().strftime("%I:%M %p")
-        else:
-            try:
-                self.validate_time(end_time)
-            except ValueError as e:
-                messagebox.showerror("Error", str(e))
-                return
-        
-        # Calculate duration
         try:
-            start_time_obj = self.validate_time(self.current_start_time)
-            end_time_obj = self.validate_time(end_time)
-            duration = end_time_obj - start_time_obj
-            duration_str = f"{duration.seconds // 3600:02d}:{(duration.seconds % 3600) // 60:02d}"
-        except ValueError as e:
-            messagebox.showerror("Error", f"Error calculating duration: {str(e)}")
+            task_info = self.apply_change('complete_task', end_time)
+        except TrackerError as e:
+            messagebox.showerror("Error", str(e))
+            return
+        if task_info is None:
             return
         
-        # Add to tasks list
-        task_info = {
-            'date': self.current_date,
-            'project_id': self.current_project,  # Use saved project
-            'task': self.current_task,
-            'task_id': '',  # Empty
-            'category': 'Administrative Task' if 'admin' in self.current_task.lower() else 'Other',
-            'start_time': self.current_start_time,
-            'end_time': end_time,
-            'duration': duration_str,
-            'breaks': '',  # Empty
-            'minutes_worked': '',  # Empty
-            'faculty_student_staff': ''  # Empty
-        }
-        self.tasks.append(task_info)
-        
-        # Save tasks to file
-        self.save_tasks()
-        
-        # Add to treeview
-        self.tree.insert('', tk.END, values=(
-            self.current_date,
-            self.current_project,  # Use saved project
-            self.current_task,
-            self.current_start_time,
-            end_time,
-            duration_str
-        ))
-        
-        # Reset current task and clear entries
-        self.current_task = None
-        self.current_start_time = None
-        self.current_date = None
-        self.current_project = None  # Clear current project
+        # Add to treeview if it falls inside the filter
+        if self.row_filter()(task_info):
+            self.task_list.append(task_info.task_id)
+        
+        # Clear entries
         self.task_entry.delete(0, tk.END)
         self.start_time_entry.delete(0, tk.END)
         self.end_time_entry.delete(0, tk.END)
@@ -420,9 +801,49 @@ class WorkTracker:
         
         messagebox.showinfo("Success", "Task completed!")
 
+    def import_tasks(self):
+        """Import a CSV, Excel or calendar file after a dry run the user confirms"""
+        path = filedialog.askopenfilename(
+            title="Import Tasks",
+            filetypes=[("Task histories", "*.csv *.xlsx *.xlsm *.ics *.json"),
+                       ("All files", "*.*")])
+        if not path:
+            return
+        self.current_task_label.config(text="Reading import file...")
+        # Parse on the worker thread; nothing is stored by a dry run
+        self.run_in_background(self.tracker.import_tasks, path, True,
+                               on_done=self.confirm_import)
+
+    def confirm_import(self, future):
+        self.update_current_task_display()
+        try:
+            result = future.result()
+        except Exception as e:
+            messagebox.showerror("Error", f"Failed to read import file: {str(e)}")
+            return
+        message = (f"{result.imported} new tasks, {result.duplicates} already known, "
+                   f"{len(result.rejects)} rejected.")
+        if result.rejects:
+            shown = "\n".join(f"{location}: {reason}"
+                               for location, reason in result.rejects[:10])
+            message += f"\n\nRejected rows:\n{shown}"
+            if len(result.rejects) > 10:
+                message += f"\n... and {len(result.rejects) - 10} more"
+        if not result.imported:
+            messagebox.showinfo("Import Tasks", message)
+            return
+        if not messagebox.askyesno("Import Tasks", f"{message}\n\nImport the new tasks?"):
+            return
+        # Tasks added while the file was being read are not imported twice
+        tasks = [task for task in result.tasks if task.task_id not in self.tracker.tasks]
+        self.apply_change('add_tasks', tasks)
+        self.populate_treeview()
+        self.update_totals_display()
+        messagebox.showinfo("Success", f"Imported {len(tasks)} tasks")
+
     def clear_all_tasks(self):
         """Clear all tasks from the treeview and storage"""
-        if not self.tasks:
+        if not self.tracker.has_tasks():
             messagebox.showinfo("Info", "No tasks to clear!")
             return
             
@@ -430,20 +851,10 @@ class WorkTracker:
                               "Are you sure you want to clear all tasks? This action cannot be undone!",
                               icon='warning'):
             # Clear treeview
-            for item in self.tree.get_children():
-                self.tree.delete(item)
-            
-            # Clear tasks list
-            self.tasks = []
+            self.task_list.set_rows([])
             
-            # Save empty task list
-            self.save_tasks()
-            
-            # Reset current task if any
-            self.current_task = None
-            self.current_start_time = None
-            self.current_date = None
-            self.current_project = None  # Clear current project
+            # Clear tasks, including any task in progress
+            self.apply_change('clear')
             
             # Clear entry fields
             self.task_entry.delete(0, tk.END)
@@ -458,14 +869,14 @@ class WorkTracker:
 
     def edit_selected_task(self):
         """Open edit dialog for selected task"""
-        selected_items = self.tree.selection()
+        selected_items = self.task_list.selection()
         if not selected_items:
             messagebox.showwarning("Warning", "Please select a task to edit")
             return
 
         # Get the selected task
         item = selected_items[0]
-        task_values = self.tree.item(item)['values']
+        task = self.get_task(item)
 
         # Create edit dialog
         edit_window = tk.Toplevel(self.root)
@@ -475,12 +886,12 @@ class WorkTracker:
         # Add fields
         ttk.Label(edit_window, text="Task:").grid(row=0, column=0, padx=5, pady=5)
         task_entry = ttk.Entry(edit_window, width=40)
-        task_entry.insert(0, task_values[2])
+        task_entry.insert(0, task.task)
         task_entry.grid(row=0, column=1, padx=5, pady=5)
 
         ttk.Label(edit_window, text="Project ID:").grid(row=1, column=0, padx=5, pady=5)
         project_combo = ttk.Combobox(edit_window, width=30, values=list(self.project_categories.keys()))
-        project_combo.set(task_values[1])
+        project_combo.set(task.project_id)
         project_combo.grid(row=1, column=1, padx=5, pady=5)
 
         # Time Entry Frames
@@ -490,131 +901,161 @@ class WorkTracker:
         ttk.Label(time_frame, text="Start Time:").pack(side=tk.LEFT, padx=5)
         start_time = ttk.Entry(time_frame, width=20)
         start_time.pack(side=tk.LEFT, padx=5)
-        start_time.insert(0, task_values[3])
+        start_time.insert(0, format_time(task.start))
 
         ttk.Label(time_frame, text="End Time:").pack(side=tk.LEFT, padx=5)
         end_time = ttk.Entry(time_frame, width=20)
         end_time.pack(side=tk.LEFT, padx=5)
-        end_time.insert(0, task_values[4])
+        end_time.insert(0, format_time(task.end))
 
         def save_changes():
-            # Validate times
-            try:
-                self.validate_time(start_time.get())
-                self.validate_time(end_time.get())
-            except ValueError as e:
-                messagebox.showerror("Error", f"Invalid time format: {str(e)}")
-                return
-
-            # Calculate new duration
             try:
-                start = self.validate_time(start_time.get())
-                end = self.validate_time(end_time.get())
-                duration = end - start
-                duration_str = f"{duration.seconds // 3600:02d}:{(duration.seconds % 3600) // 60:02d}"
-            except ValueError as e:
-                messagebox.showerror("Error", f"Error calculating duration: {str(e)}")
+                edited = self.apply_change('edit_task', item, task_entry.get(),
+                                           project_combo.get(), start_time.get(),
+                                           end_time.get())
+            except TrackerError as e:
+                messagebox.showerror("Error", str(e))
                 return
-
-            # Update task in self.tasks list
-            for task in self.tasks:
-                if (task['date'] == task_values[0] and 
-                    task['project_id'] == task_values[1] and 
-                    task['task'] == task_values[2]):
-                    
-                    task['task'] = task_entry.get()
-                    task['project_id'] = project_combo.get()
-                    task['start_time'] = start_time.get()
-                    task['end_time'] = end_time.get()
-                    task['duration'] = duration_str
-                    break
+            if item in self.archived_rows and edited is not None:
+                # The archive returns a new object for the rewritten task
+                self.archived_rows[item] = edited
 
             # Update treeview
-            self.tree.item(item, values=(
-                task_values[0],  # Keep original date
-                project_combo.get(),
-                task_entry.get(),
-                start_time.get(),
-                end_time.get(),
-                duration_str
-            ))
-
-            # Save changes to file
-            self.save_tasks()
-            
+            self.task_list.refresh(item)
+            self.update_totals_display()
+
             edit_window.destroy()
             messagebox.showinfo("Success", "Task updated successfully")
 
         # Add Save button
-        ttk.Button(edit_window, text="Save Changes", command=save_changes).grid(row=3, column=0, columnspan=2, pady=20)
+        ttk.Button(edit_window, text="Save Changes", command=self.metrics.timed("save_edit", save_changes)).grid(row=3, column=0, columnspan=2, pady=20)
 
     def generate_report(self):
-        if not self.tasks:
+        """Export the tasks in the current filter and search in the chosen report format"""
+        if self.export_job is not None:
+            messagebox.showinfo("Info", "A report is already being generated")
+            return
+        if not self.tracker.has_tasks():
             messagebox.showerror("Error", "No tasks to generate report!")
             return
+        try:
+            view_filter = self.view_filter()
+        except ValueError:
+            messagebox.showerror("Error", "Invalid date! Please use MM/DD/YYYY")
+            return
+        
+        # The matching tasks are copied so the worker never reads
+        # tracker.tasks while the UI is changing it; archived months are
+        # read by the worker
+        tasks, rows = self.tracker.report_tasks(self.search_entry.get(), *view_filter)
+        if not rows:
+            messagebox.showerror("Error", "No tasks match the current filter!")
+            return
             
-        wb = openpyxl.Workbook()
-        ws = wb.active
-        
-        # Add headers
-        headers = [
-            'Date', 
-            'Project ID', 
-            'Task ID', 
-            'Faculty Student or Staff', 
-            'Administrative Task or Other', 
-            'Start Time', 
-            'Breaks (minutes)', 
-            'End Time', 
-            'Minutes Worked'
-        ]
-        
-        for col, header in enumerate(headers, 1):
-            cell = ws.cell(row=1, column=col)
-            cell.value = header
-            cell.font = Font(bold=True)
-            cell.fill = PatternFill(start_color="CCE5FF", end_color="CCE5FF", fill_type="solid")
-            cell.alignment = Alignment(horizontal="center", wrap_text=True)
-        
-        # Add data
-        for row, task in enumerate(self.tasks, 2):
-            ws.cell(row=row, column=1).value = task['date']
-            ws.cell(row=row, column=2).value = task['project_id']
-            ws.cell(row=row, column=3).value = task['task_id']  # Empty
-            ws.cell(row=row, column=4).value = task['faculty_student_staff']  # Empty
-            ws.cell(row=row, column=5).value = task['category']
-            ws.cell(row=row, column=6).value = task['start_time']
-            ws.cell(row=row, column=7).value = task['breaks']  # Empty
-            ws.cell(row=row, column=8).value = task['end_time']
-            ws.cell(row=row, column=9).value = task['minutes_worked']  # Empty
-            
-            # Center align all columns
-            for col in range(1, 10):
-                ws.cell(row=row, column=col).alignment = Alignment(horizontal="center")
-        
-        # Set fixed column widths
-        column_widths = {
-            'A': 12,  # Date
-            'B': 20,  # Project ID
-            'C': 15,  # Task ID
-            'D': 25,  # Faculty Student or Staff
-            'E': 25,  # Administrative Task or Other
-            'F': 15,  # Start Time
-            'G': 15,  # Breaks
-            'H': 15,  # End Time
-            'I': 15   # Minutes Worked
-        }
-        
-        # Apply fixed widths
-        for col_letter, width in column_widths.items():
-            ws.column_dimensions[col_letter].width = width
-        
-        # Set row height for header
-        ws.row_dimensions[1].height = 30
-        
-        filename = f"Rohit_Work_Summary_{datetime.now().strftime('%m_%d_%Y')}.xlsx"
-        wb.save(filename)
-        messagebox.showinfo("Success", f"Report generated successfully!\nSaved as: {filename}")
+        # openpyxl is only imported the first time a report is generated
+        from tracker_reports import ExportJob, report_writer
+        report_format = self.report_format.get()
+        filename = report_filename(report_format=report_format)
+        self.export_job = ExportJob(self.executor, filename, tasks, total=rows,
+                                    writer=report_writer(report_format))
+        self.show_export_progress(self.export_job)
+
+    def update_monthly_reports(self):
+        """Rewrite the per-month work summaries whose tasks have changed"""
+        if self.export_job is not None:
+            messagebox.showinfo("Info", "A report is already being generated")
+            return
+        if not self.tracker.has_tasks():
+            messagebox.showerror("Error", "No tasks to generate report!")
+            return
+
+        def summary(written):
+            if not written:
+                return "Monthly reports are already up to date"
+            return "Monthly reports updated!\n" + "\n".join(
+                f"{count} tasks saved as: {filename}" for filename, count in written)
+
+        # Only the changed months are collected, as copies the worker can
+        # read; their archived tasks are read on the worker
+        directory = self.tracker.report_dir()
+        prefix = f"{report_user()}_Work_Summary"
+        digests, tasks, keep, rows = self.tracker.period_reports(directory, prefix)
+        from tracker_reports import ExportJob, write_period_reports
+        self.export_job = ExportJob(
+            self.executor, directory, tasks, total=rows,
+            writer=partial(write_period_reports, digests=digests, prefix=prefix, keep=keep))
+        self.show_export_progress(self.export_job, summary)
+
+    def show_export_progress(self, job, summary=None):
+        """Show a progress dialog for a running export
+
+        summary(result) gives the success message; by default it reports
+        the row count and filename.
+        """
+        from tracker_reports import ExportCancelled
+        dialog = tk.Toplevel(self.root)
+        dialog.title("Generating Report")
+        dialog.geometry("350x120")
+        dialog.transient(self.root)
+        
+        label = ttk.Label(dialog, text=f"Writing {job.total} tasks to {job.filename}")
+        label.pack(padx=10, pady=(10, 5))
+        progress = ttk.Progressbar(dialog, length=300, maximum=job.total, mode='determinate')
+        progress.pack(padx=10, pady=5)
+        cancel_button = ttk.Button(dialog, text="Cancel", command=job.cancel)
+        cancel_button.pack(pady=5)
+        dialog.protocol("WM_DELETE_WINDOW", job.cancel)
+
+        def poll():
+            if not job.done():
+                progress['value'] = job.rows_written
+                if job.cancelled:
+                    label.config(text="Cancelling...")
+                    cancel_button.state(['disabled'])
+                self.root.after(100, poll)
+                return
+            dialog.destroy()
+            self.export_job = None
+            try:
+                result = job.result()
+            except ExportCancelled:
+                messagebox.showinfo("Info", "Report generation cancelled")
+            except Exception as e:
+                messagebox.showerror("Error", f"Failed to generate report: {str(e)}")
+            else:
+                if summary is not None:
+                    messagebox.showinfo("Success", summary(result))
+                else:
+                    messagebox.showinfo("Success", f"Report generated successfully!\n"
+                                                   f"{result} tasks saved as: {job.filename}")
+
+        poll()
+
+    def on_close(self):
+        """Flush tracker state before the window goes away"""
+        if self.autosave_after_id is not None:
+            self.root.after_cancel(self.autosave_after_id)
+            self.autosave_after_id = None
+        if self.watch_after_id is not None:
+            self.root.after_cancel(self.watch_after_id)
+            self.watch_after_id = None
+        self.stop_api()
+        if self.export_job is not None:
+            # A report in progress (or monthly update) stops at its next
+            # progress check instead of holding up the shutdown below
+            self.export_job.cancel()
+        try:
+            # Flush first, so a compaction it starts still has the worker
+            self.tracker.flush()
+            self.executor.shutdown(wait=True)
+            self.tracker.close()
+        except Exception as e:
+            messagebox.showerror("Error", f"Failed to save tasks: {str(e)}")
+        finally:
+            if self.metrics.profiling:
+                self.save_profile()
+            self.metrics.close_log()
+            self.root.destroy()
 
 def main():
     root = tk.Tk()
@@ -2,16 +2,21 @@
 
 block_cipher = None
 
+# Modules the tracker never imports; keeping them out shrinks the bundle
+# that a one-file build unpacks on every launch
+EXCLUDES = ['IPython', 'PIL', 'matplotlib', 'pandas', 'scipy', 'pytest', 'setuptools',
+            'pydoc_data', 'lib2to3', 'test', 'xmlrpc', 'tkinter.test']
+
 a = Analysis(
     ['work_tracker.py'],
     pathex=[],
     binaries=[],
     datas=[],
-    hiddenimports=['babel.numbers'],
+    hiddenimports=[],
     hookspath=[],
     hooksconfig={},
     runtime_hooks=[],
-    excludes=[],
+    excludes=EXCLUDES,
     win_no_prefer_redirects=False,
     win_private_assemblies=False,
     cipher=block_cipher,